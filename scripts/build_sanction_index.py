@@ -0,0 +1,29 @@
+import sys
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Ensure repo root is on sys.path so `import slis` works when running:
+#   python scripts/build_sanction_index.py
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+load_dotenv()
+
+
+def main() -> int:
+    from slis.db import SessionLocal
+    from slis.services.sanction_index import build_sanction_index
+
+    db = SessionLocal()
+    try:
+        path = build_sanction_index(db)
+    finally:
+        db.close()
+
+    print(f"OK: sanction index ready at {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -11,6 +11,33 @@ sys.path.insert(0, str(REPO_ROOT))
 load_dotenv()
 
 
+def add_missing_columns(engine, metadata) -> list[str]:
+    """
+    `create_all` tidak menambah kolom baru ke tabel yang sudah ada.
+    Tambahkan kolom nullable yang belum ada (ALTER TABLE ... ADD COLUMN).
+    """
+    from sqlalchemy import inspect, text
+
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added: list[str] = []
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing or not column.nullable:
+                    continue
+                col_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f'ALTER TABLE {table.name} ADD COLUMN "{column.name}" {col_type}'))
+                added.append(f"{table.name}.{column.name}")
+            for index in table.indexes:
+                if any(f"{table.name}.{c.name}" in added for c in index.columns):
+                    index.create(conn, checkfirst=True)
+    return added
+
+
 def main() -> int:
     # Import engine (will fail fast if DATABASE_URL is missing)
     from slis.db import engine
@@ -19,6 +46,8 @@ def main() -> int:
     from slis import models
 
     models.Base.metadata.create_all(bind=engine)
+    for name in add_missing_columns(engine, models.Base.metadata):
+        print(f"OK: column added {name}")
     print("OK: database schema created/verified")
     return 0
 
@@ -1,3 +1,5 @@
+import os
+
 from celery import Celery
 from config import Config
 
@@ -12,6 +14,14 @@ celery_app = Celery(
 # (opsional) set queue default
 celery_app.conf.task_default_queue = "default"
 
+# Task screening memakai acks_late (resume dari checkpoint bila worker mati).
+# Visibility timeout broker Redis harus lebih lama dari job terpanjang, kalau
+# tidak message dikirim ulang ke worker lain saat job masih berjalan.
+celery_app.conf.broker_transport_options = {
+    "visibility_timeout": int(os.getenv("SLIS_TASK_VISIBILITY_TIMEOUT", str(12 * 3600))),
+}
+celery_app.conf.worker_prefetch_multiplier = 1
+
 
 @celery_app.task(name="slis.run_screening_task")
 def run_screening_task(job_id: int) -> None:
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+
+
+def save_array(directory: Path, name: str, arr: np.ndarray) -> None:
+    np.save(directory / f"{name}.npy", np.ascontiguousarray(arr), allow_pickle=False)
+
+
+def load_array(directory: Path, name: str, mmap: bool = True) -> np.ndarray:
+    return np.load(directory / f"{name}.npy", mmap_mode="r" if mmap else None, allow_pickle=False)
+
+
+class StringColumn(Sequence[Any]):
+    """Kolom string ter-packed (UTF-8 blob + offsets) yang bisa di-mmap read-only.
+
+    String di-decode hanya saat diakses, sehingga kolom 500k nama tidak perlu
+    dimaterialisasi jadi list Python di setiap proses. Nilai None disimpan
+    lewat mask `valid`.
+    """
+
+    def __init__(self, offsets: np.ndarray, data: np.ndarray, valid: np.ndarray) -> None:
+        self.offsets = offsets
+        self.data = data
+        self.valid = valid
+
+    @classmethod
+    def from_values(cls, values: Iterable[str | None]) -> "StringColumn":
+        encoded: list[bytes] = []
+        valid: list[bool] = []
+        for v in values:
+            valid.append(v is not None)
+            encoded.append(str(v).encode("utf-8") if v is not None else b"")
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        return cls(offsets, data, np.asarray(valid, dtype=bool))
+
+    def __len__(self) -> int:
+        return int(len(self.offsets) - 1)
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        if not self.valid[i]:
+            return None
+        return self.data[self.offsets[i] : self.offsets[i + 1]].tobytes().decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def non_empty(self, rows: np.ndarray) -> np.ndarray:
+        """Mask (vektor) baris `rows` yang bukan None dan bukan string kosong."""
+        rows = np.asarray(rows, dtype=np.int64)
+        return self.valid[rows] & (self.offsets[rows + 1] > self.offsets[rows])
+
+    def save(self, directory: Path, name: str) -> None:
+        save_array(directory, f"{name}.offsets", self.offsets)
+        save_array(directory, f"{name}.data", self.data)
+        save_array(directory, f"{name}.valid", self.valid)
+
+    @classmethod
+    def load(cls, directory: Path, name: str, mmap: bool = True) -> "StringColumn":
+        return cls(
+            load_array(directory, f"{name}.offsets", mmap),
+            load_array(directory, f"{name}.data", mmap),
+            load_array(directory, f"{name}.valid", mmap),
+        )
+
+
+class ChainedStrings(Sequence[Any]):
+    """Gabungan beberapa kolom string sebagai satu sequence read-only (tanpa copy).
+
+    Dipakai untuk tabel nama matcher: nama utama entity diikuti alias, tanpa
+    menyimpan ulang kolom nama utama.
+    """
+
+    def __init__(self, *parts: Sequence[Any]) -> None:
+        self.parts = parts
+        self._ends: list[int] = []
+        total = 0
+        for part in parts:
+            total += len(part)
+            self._ends.append(total)
+
+    def __len__(self) -> int:
+        return self._ends[-1] if self._ends else 0
+
+    def __getitem__(self, i):  # type: ignore[override]
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        i = int(i)
+        if i < 0:
+            i += len(self)
+        start = 0
+        if i >= 0:
+            for part, end in zip(self.parts, self._ends):
+                if i < end:
+                    return part[i - start]
+                start = end
+        raise IndexError(i)
+
+    def __iter__(self):
+        for part in self.parts:
+            yield from part
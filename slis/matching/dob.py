@@ -1,20 +1,29 @@
+import os
 import re
-from typing import Dict, Any, List
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 
+# (year, month, day); None = tidak ada / tidak terbaca
+DobParts = Tuple[Optional[int], Optional[int], Optional[int]]
+# Entry tahun DOB sanksi (Australia): (min, max, is_range); tahun tunggal -> (y, y, False)
+YearEntry = Tuple[int, int, bool]
 
-def parse_dob(dob_string: str) -> Dict[str, Any]:
-    """
-    Mengekstrak tahun, bulan, dan hari dari string DOB.
-    Support format:
-    - YYYY
-    - YYYY-MM
-    - YYYY-MM-DD
-    - Format Indonesia (20 Juli 1985, dsb)
-    - Delimiter: -, /, ., spasi
-    """
-    if not isinstance(dob_string, str) or not dob_string.strip():
-        return {'year': None, 'month': None, 'day': None}
+NO_DOB: DobParts = (None, None, None)
+
+# Ukuran cache LRU parser DOB (jumlah string unik per proses).
+DOB_CACHE_SIZE = max(1, int(os.getenv("SLIS_DOB_CACHE_SIZE", "100000")))
+
+_DOB_SPLIT_RE = re.compile(r'[-/.\s]')
+_YEAR_RE = re.compile(r'\d{4}')
+
+
+def is_flexible_year_source(source_list: Any) -> bool:
+    """Sumber dengan DOB berupa daftar/rentang tahun (Australia)."""
+    return "Australia" in str(source_list)
 
+
+@lru_cache(maxsize=DOB_CACHE_SIZE)
+def _parse_dob_parts(dob_string: str) -> DobParts:
     dob_string = dob_string.lower()
     dob_string = (
         dob_string.replace('januari', '01')
@@ -31,7 +40,7 @@ def parse_dob(dob_string: str) -> Dict[str, Any]:
         .replace('desember', '12')
     )
 
-    parts = re.split(r'[-/.\s]', dob_string.strip())
+    parts = _DOB_SPLIT_RE.split(dob_string.strip())
     year = month = day = None
 
     for part in parts:
@@ -45,98 +54,138 @@ def parse_dob(dob_string: str) -> Dict[str, Any]:
         elif 1 <= value <= 31 and day is None:
             day = value
 
-    return {'year': year, 'month': month, 'day': day}
+    return year, month, day
 
 
-def get_years_from_sanction_dob(dob_string: str) -> List[Dict[str, Any]]:
+def parse_dob_parts(dob_string: Any) -> DobParts:
     """
-    Mengambil daftar tahun atau rentang tahun dari string DOB sanksi (Australia).
-    Contoh:
-    - "1980-1985" -> [{'min': 1980, 'max': 1985, 'type': 'range'}]
-    - "1980, 1985" -> [{'year': 1980, 'type': 'single'}, {'year': 1985, 'type': 'single'}]
+    Versi tuple (year, month, day) dari `parse_dob`, di-memoize per string
+    (LRU `SLIS_DOB_CACHE_SIZE`) karena DOB transaksi/sanksi banyak berulang.
     """
     if not isinstance(dob_string, str) or not dob_string.strip():
-        return []
+        return NO_DOB
+    return _parse_dob_parts(dob_string)
+
 
+def parse_dob(dob_string: str) -> Dict[str, Any]:
+    """
+    Mengekstrak tahun, bulan, dan hari dari string DOB.
+    Support format:
+    - YYYY
+    - YYYY-MM
+    - YYYY-MM-DD
+    - Format Indonesia (20 Juli 1985, dsb)
+    - Delimiter: -, /, ., spasi
+    """
+    year, month, day = parse_dob_parts(dob_string)
+    return {'year': year, 'month': month, 'day': day}
+
+
+@lru_cache(maxsize=DOB_CACHE_SIZE)
+def _parse_sanction_years(dob_string: str) -> Tuple[YearEntry, ...]:
     dob_string = dob_string.strip().replace(',', '-')
-    potential_years = re.findall(r'\d{4}', dob_string)
-    year_data = []
+    potential_years = _YEAR_RE.findall(dob_string)
+    year_data: List[YearEntry] = []
 
     i = 0
     while i < len(potential_years):
         year1 = int(potential_years[i])
         if i + 1 < len(potential_years):
             year2 = int(potential_years[i + 1])
-            if re.search(f"{year1}-{year2}", dob_string) or re.search(f"{year2}-{year1}", dob_string):
-                year_data.append({
-                    'min': min(year1, year2),
-                    'max': max(year1, year2),
-                    'type': 'range'
-                })
+            if f"{year1}-{year2}" in dob_string or f"{year2}-{year1}" in dob_string:
+                year_data.append((min(year1, year2), max(year1, year2), True))
                 i += 2
                 continue
 
-        year_data.append({'year': year1, 'type': 'single'})
+        year_data.append((year1, year1, False))
         i += 1
 
-    unique_year_data = []
-    seen = set()
-    for entry in year_data:
-        key = tuple(sorted(entry.items()))
-        if key not in seen:
-            unique_year_data.append(entry)
-            seen.add(key)
+    return tuple(dict.fromkeys(year_data))
 
-    return unique_year_data
 
+def parse_sanction_years(dob_string: Any) -> Tuple[YearEntry, ...]:
+    """Versi tuple ter-memoize dari `get_years_from_sanction_dob` (urutan & dedup sama)."""
+    if not isinstance(dob_string, str) or not dob_string.strip():
+        return ()
+    return _parse_sanction_years(dob_string)
 
-def calculate_dob_score_flexible(
-    customer_dob_str: str,
-    sanction_dob_str: str,
-    source_list: str
+
+def get_years_from_sanction_dob(dob_string: str) -> List[Dict[str, Any]]:
+    """
+    Mengambil daftar tahun atau rentang tahun dari string DOB sanksi (Australia).
+    Contoh:
+    - "1980-1985" -> [{'min': 1980, 'max': 1985, 'type': 'range'}]
+    - "1980, 1985" -> [{'year': 1980, 'type': 'single'}, {'year': 1985, 'type': 'single'}]
+    """
+    return [
+        {'min': lo, 'max': hi, 'type': 'range'} if is_range else {'year': lo, 'type': 'single'}
+        for lo, hi, is_range in parse_sanction_years(dob_string)
+    ]
+
+
+def calculate_dob_score_parsed(
+    customer_dob: DobParts,
+    sanction_dob: DobParts,
+    sanction_years: Sequence[YearEntry] = (),
+    flexible_years: bool = False,
 ):
     """
-    Menghitung skor DOB:
-    - Untuk Australia: year range -> Full Match = 100
-    - Untuk lainnya:
-        - Full match (Y, M, D)  = 100
-        - Year & Month match    = 75
-        - Year-only match       = 50
-        - No match              = 0
+    `calculate_dob_score_flexible` untuk DOB yang sudah di-parse
+    (`parse_dob_parts` / `parse_sanction_years`, mis. dari index sanction).
+    `flexible_years` = `is_flexible_year_source(source_list)`.
     Return: (score, description)
     """
-    customer_dob_parsed = parse_dob(customer_dob_str)
-    cust_year = customer_dob_parsed['year']
+    cust_year, cust_month, cust_day = customer_dob
 
     if cust_year is None:
         return 0, "No Customer DOB"
 
     # Logika Australia (fleksibel)
-    if "Australia" in str(source_list):
-        sanction_years = get_years_from_sanction_dob(sanction_dob_str)
+    if flexible_years:
         if not sanction_years:
             return 0, "No Sanction DOB / Unparsable (Australia)"
 
-        for entry in sanction_years:
-            if entry['type'] == 'single' and entry['year'] == cust_year:
+        for lo, hi, is_range in sanction_years:
+            if not is_range and lo == cust_year:
                 return 100, "Full Match (Australia - Single Year)"
-            elif entry['type'] == 'range' and entry['min'] <= cust_year <= entry['max']:
-                return 100, f"Full Match (Australia - Range: {entry['min']}-{entry['max']})"
+            elif is_range and lo <= cust_year <= hi:
+                return 100, f"Full Match (Australia - Range: {lo}-{hi})"
 
         return 0, "No Match (Australia)"
 
-    p2 = parse_dob(sanction_dob_str)
-    sanction_year = p2['year']
+    sanction_year, sanction_month, sanction_day = sanction_dob
 
     if sanction_year is None or cust_year != sanction_year:
         return 0, "No Match"
 
-    has_month1, has_month2 = customer_dob_parsed['month'] is not None, p2['month'] is not None
-    if not has_month1 or not has_month2 or customer_dob_parsed['month'] != p2['month']:
+    if cust_month is None or sanction_month is None or cust_month != sanction_month:
         return 50, "Year Match"
 
-    has_day1, has_day2 = customer_dob_parsed['day'] is not None, p2['day'] is not None
-    if not has_day1 or not has_day2 or customer_dob_parsed['day'] != p2['day']:
+    if cust_day is None or sanction_day is None or cust_day != sanction_day:
         return 75, "Year & Month Match"
 
     return 100, "Full Match"
+
+
+def calculate_dob_score_flexible(
+    customer_dob_str: str,
+    sanction_dob_str: str,
+    source_list: str
+):
+    """
+    Menghitung skor DOB:
+    - Untuk Australia: year range -> Full Match = 100
+    - Untuk lainnya:
+        - Full match (Y, M, D)  = 100
+        - Year & Month match    = 75
+        - Year-only match       = 50
+        - No match              = 0
+    Return: (score, description)
+    """
+    customer_dob = parse_dob_parts(customer_dob_str)
+    if customer_dob[0] is None:
+        return 0, "No Customer DOB"
+
+    if is_flexible_year_source(source_list):
+        return calculate_dob_score_parsed(customer_dob, NO_DOB, parse_sanction_years(sanction_dob_str), True)
+    return calculate_dob_score_parsed(customer_dob, parse_dob_parts(sanction_dob_str))
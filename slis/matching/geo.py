@@ -1,4 +1,10 @@
-from typing import Dict, Any, List
+import os
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+
+from rapidfuzz import fuzz, process
+
+from .utils import country_key
 
 
 COUNTRY_DATA = [
@@ -252,14 +258,122 @@ REGIONAL_BLOCS = {
     ]
 }
 
+# --- 3b. KODE INTEGER & BITSET ---
+# Kode negara = posisi di COUNTRY_DATA + 1 (0 = tidak dikenal); high-risk &
+# blok regional jadi bitset int atas kode tsb, dihitung sekali saat import.
+COUNTRY_CODES = {c['code']: i + 1 for i, c in enumerate(COUNTRY_DATA)}
+_ISO2_BY_CODE: List[str | None] = [None] + [c['code'] for c in COUNTRY_DATA]
+_CODE_BY_KEY = {k: COUNTRY_CODES[iso2] for k, iso2 in NORMALIZED_MAP.items()}
+
+
+def _bitset(iso2_codes) -> int:
+    mask = 0
+    for iso2 in iso2_codes:
+        mask |= 1 << COUNTRY_CODES[iso2]
+    return mask
+
+
+HIGH_RISK_MASK = _bitset(HIGH_RISK_JURISDICTIONS)
+BLOC_MASKS = {name: _bitset(members) for name, members in REGIONAL_BLOCS.items()}
+_BLOC_BY_CODE: List[str | None] = [
+    next((name for name, mask in BLOC_MASKS.items() if mask >> code & 1), None)
+    for code in range(len(_ISO2_BY_CODE))
+]
+
+# Key tanpa spasi/tanda baca ("I.D.", "United-States") & kandidat fallback fuzzy.
+# Kode ISO-2/ISO-3 terlalu pendek untuk fuzzy, jadi hanya key >= 4 karakter.
+_CODE_BY_COMPACT_KEY = {country_key(k): code for k, code in _CODE_BY_KEY.items()}
+_FUZZY_KEYS = [k for k in _CODE_BY_COMPACT_KEY if len(k) >= 4]
+
+# Skor minimal (RapidFuzz ratio 0-100) fallback fuzzy nama negara; 0 = nonaktif.
+COUNTRY_FUZZY_CUTOFF = float(os.getenv("SLIS_COUNTRY_FUZZY_CUTOFF", "90"))
+# Hit fuzzy ditolak bila negara lain berskor dalam selisih ini (ambigu, mis. "austrlia").
+COUNTRY_FUZZY_MARGIN = float(os.getenv("SLIS_COUNTRY_FUZZY_MARGIN", "5"))
+# Jumlah string negara mentah unik yang di-cache kodenya.
+COUNTRY_CACHE_SIZE = max(1, int(os.getenv("SLIS_COUNTRY_CACHE_SIZE", "10000")))
+
+
 # --- 4. FUNGSI UTAMA ---
 
+@lru_cache(maxsize=COUNTRY_CACHE_SIZE)
+def _country_code(input_str: str) -> int:
+    clean_input = input_str.lower().strip()
+    code = _CODE_BY_KEY.get(clean_input)
+    if code is not None:
+        return code
+    compact = country_key(clean_input)
+    code = _CODE_BY_COMPACT_KEY.get(compact)
+    if code is not None:
+        return code
+    if COUNTRY_FUZZY_CUTOFF > 0 and len(compact) >= 4:
+        return _fuzzy_country_code(compact)
+    return 0
+
+
+def _fuzzy_country_code(compact: str) -> int:
+    """
+    Fallback fuzzy khusus typo ringan; 0 bila tidak yakin. Key terbaik harus
+    sepanjang query +-1 karakter dan bukan prefix/perpanjangan query (nama
+    terpotong/berimbuhan seperti "dominican" -> "dominica" atau "nigeri"
+    bukan typo), dan tidak ada negara lain dengan skor dalam
+    `COUNTRY_FUZZY_MARGIN` dari skor terbaik.
+    """
+    hits = process.extract(
+        compact,
+        _FUZZY_KEYS,
+        scorer=fuzz.ratio,
+        limit=8,
+        score_cutoff=max(0.0, COUNTRY_FUZZY_CUTOFF - COUNTRY_FUZZY_MARGIN),
+    )
+    if not hits or hits[0][1] < COUNTRY_FUZZY_CUTOFF:
+        return 0
+    best_key, best_score = hits[0][0], hits[0][1]
+    if abs(len(best_key) - len(compact)) > 1 or best_key.startswith(compact) or compact.startswith(best_key):
+        return 0
+    code = _CODE_BY_COMPACT_KEY[best_key]
+    for key, score, _ in hits[1:]:
+        if _CODE_BY_COMPACT_KEY[key] != code and score >= best_score - COUNTRY_FUZZY_MARGIN:
+            return 0
+    return code
+
+
+def country_code(input_str: Any) -> int:
+    """
+    Kode integer negara dari input apapun (nama EN/ID, ISO-2/ISO-3, beda
+    tanda baca, typo ringan via fuzzy); 0 = tidak dikenal. Ter-cache per string.
+    """
+    if not isinstance(input_str, str):
+        return 0
+    return _country_code(input_str)
+
+
+def canonicalize_country(input_str: Any) -> str | None:
+    """ISO-2 kanonik dari input negara apapun (lihat `country_code`); None bila tidak dikenal."""
+    return _ISO2_BY_CODE[country_code(input_str)]
+
+
+def canonicalize_country_series(values):
+    """Versi kolom (pandas Series) dari `canonicalize_country`, sekali per nilai unik."""
+    iso2_of = {v: canonicalize_country(v) for v in values.dropna().unique()}
+    return values.map(iso2_of).astype(object).where(values.notna(), None)
+
+
+def country_match_key(input_str: Any, iso2: str | None = None) -> str:
+    """
+    Key pembanding citizenship/country: ISO-2 (`iso2` yang sudah tersimpan,
+    atau hasil `canonicalize_country`), fallback `country_key` untuk nilai
+    yang bukan negara dikenal; "" = kosong. Idempoten.
+    """
+    return iso2 or canonicalize_country(input_str) or country_key(input_str)
+
+
+def is_high_risk_code(code: int) -> bool:
+    return bool(HIGH_RISK_MASK >> code & 1)
+
+
 def get_iso2_code(input_str: str) -> str | None:
     """Konversi input apapun (nama/kode) ke ISO-2 code."""
-    if not isinstance(input_str, str):
-        return None
-    clean_input = input_str.lower().strip()
-    return NORMALIZED_MAP.get(clean_input)
+    return canonicalize_country(input_str)
 
 def get_country_display(input_str: str) -> str:
     """Mengambil nama display cantik dari input apapun."""
@@ -270,68 +384,44 @@ def get_country_display(input_str: str) -> str:
 
 def get_country_bloc(input_str: str) -> str | None:
     """Cek blok regional berdasarkan input."""
-    iso2 = get_iso2_code(input_str)
-    if not iso2:
-        return None
-        
-    for bloc_name, members in REGIONAL_BLOCS.items():
-        if iso2 in members:
-            return bloc_name
-    return None
+    return _BLOC_BY_CODE[country_code(input_str)]
 
-def generate_geographic_insights(customer: Dict[str, Any], sanction: Dict[str, Any]) -> List[str]:
+
+@lru_cache(maxsize=4096)
+def geographic_insights_for_codes(c_cit: int, c_res: int, c_pob: int, s_cit: int) -> Tuple[str, ...]:
     """
-    Menghasilkan insight geografis dengan pencocokan pintar (Bilingual & Multi-format).
+    Insight geografis untuk kode negara (`country_code`) customer
+    (citizenship, residence, place of birth) dan citizenship sanksi.
+    Di-memoize: kombinasi kode yang muncul di satu job sangat sedikit.
     """
     insights = []
 
-    # Ambil input mentah
-    raw_c_cit = customer.get("Citizenship")
-    raw_c_res = customer.get("Country_of_Residence")
-    raw_c_pob = customer.get("Place_of_Birth")
-    raw_s_cit = sanction.get("Citizenship")
-
-    # Konversi ke ISO-2
-    iso_c_cit = get_iso2_code(raw_c_cit)
-    iso_c_res = get_iso2_code(raw_c_res)
-    iso_c_pob = get_iso2_code(raw_c_pob)
-
-    # Display Names (untuk pesan error yg enak dibaca)
-    disp_c_cit = get_country_display(raw_c_cit)
-    disp_c_res = get_country_display(raw_c_res)
-    disp_s_cit = get_country_display(raw_s_cit)
-
     # 1. High Risk Check (Citizenship)
-    if iso_c_cit in HIGH_RISK_JURISDICTIONS:
+    if is_high_risk_code(c_cit):
         insights.append(
-            f"⚠️ *Yurisdiksi Berisiko Tinggi:* Kewarganegaraan nasabah ({disp_c_cit}) "
+            f"⚠️ *Yurisdiksi Berisiko Tinggi:* Kewarganegaraan nasabah ({DISPLAY_MAP[_ISO2_BY_CODE[c_cit]]}) "
             f"masuk dalam daftar pemantauan risiko tinggi."
         )
 
-    
-    if iso_c_res in HIGH_RISK_JURISDICTIONS:
+    if is_high_risk_code(c_res):
         insights.append(
-            f"⚠️ *Yurisdiksi Berisiko Tinggi:* Lokasi tempat tinggal/transaksi ({disp_c_res}) "
+            f"⚠️ *Yurisdiksi Berisiko Tinggi:* Lokasi tempat tinggal/transaksi ({DISPLAY_MAP[_ISO2_BY_CODE[c_res]]}) "
             f"masuk dalam daftar pemantauan risiko tinggi."
         )
 
-    
-    c_bloc = get_country_bloc(raw_c_cit)
-    s_bloc = get_country_bloc(raw_s_cit)
-    
-    if c_bloc and s_bloc and c_bloc == s_bloc:
+    c_bloc = _BLOC_BY_CODE[c_cit]
+    if c_bloc and c_bloc == _BLOC_BY_CODE[s_cit]:
         insights.append(
-            f"ℹ️ *Kedekatan Regional:* Nasabah ({disp_c_cit}) dan entitas sanksi "
-            f"({disp_s_cit}) berasal dari kawasan regional yang sama ({c_bloc})."
+            f"ℹ️ *Kedekatan Regional:* Nasabah ({DISPLAY_MAP[_ISO2_BY_CODE[c_cit]]}) dan entitas sanksi "
+            f"({DISPLAY_MAP[_ISO2_BY_CODE[s_cit]]}) berasal dari kawasan regional yang sama ({c_bloc})."
         )
 
-    
-    
-    risk_hits = set()
-    for iso in [iso_c_cit, iso_c_res, iso_c_pob]:
-        if iso and iso in HIGH_RISK_JURISDICTIONS:
-            risk_hits.add(DISPLAY_MAP.get(iso))
-            
+    # Urutan negara mengikuti citizenship, residence, place of birth
+    risk_hits = [
+        DISPLAY_MAP[_ISO2_BY_CODE[code]]
+        for code in dict.fromkeys((c_cit, c_res, c_pob))
+        if is_high_risk_code(code)
+    ]
     if len(risk_hits) >= 2:
         countries_str = ", ".join(risk_hits)
         insights.append(
@@ -339,4 +429,18 @@ def generate_geographic_insights(customer: Dict[str, Any], sanction: Dict[str, A
             f"({countries_str})."
         )
 
-    return insights
\ No newline at end of file
+    return tuple(insights)
+
+
+def generate_geographic_insights(customer: Dict[str, Any], sanction: Dict[str, Any]) -> List[str]:
+    """
+    Menghasilkan insight geografis dengan pencocokan pintar (Bilingual & Multi-format).
+    """
+    return list(
+        geographic_insights_for_codes(
+            country_code(customer.get("Citizenship")),
+            country_code(customer.get("Country_of_Residence")),
+            country_code(customer.get("Place_of_Birth")),
+            country_code(sanction.get("Citizenship")),
+        )
+    )
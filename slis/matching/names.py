@@ -3,7 +3,10 @@ import os
 import warnings
 from typing import Any, Sequence
 
-from rapidfuzz import fuzz, distance
+import numpy as np
+from rapidfuzz import fuzz, distance, process
+
+from .ngram import NgramIndex, idf_weight
 
 try:
     import cudf  # type: ignore
@@ -17,35 +20,47 @@ except Exception:  # pragma: no cover
 
 NOISE_TITLES_RE = re.compile(r"\b(pt|cv|mr|mrs|haji|hj)\b", re.IGNORECASE)
 
+# Bobot blend stage-2 (JW 60% + TokenSort 40%)
+JW_WEIGHT = 0.60
+SORT_WEIGHT = 0.40
+
+# Batas matriks dense (query x union kandidat) relatif terhadap jumlah pasangan asli.
+# Di atas ini scoring dilakukan per baris query agar tidak menghitung pasangan sia-sia.
+_DENSE_FACTOR = 4
+
 
 class HybridNameIndex:
     """Index untuk 2-stage matching: filtering cepat (GPU cuDF bila ada) lalu scoring presisi (CPU RapidFuzz).
 
     Backend dipilih dari:
-    - env `SLIS_MATCHER_BACKEND`: 'auto' | 'cudf' | 'pandas'
-    - jika 'auto': pakai cuDF bila tersedia, fallback ke pandas.
+    - env `SLIS_MATCHER_BACKEND`: 'auto' | 'cudf' | 'ngram' | 'pandas'
+    - jika 'auto': pakai cuDF bila tersedia, fallback ke inverted index n-gram (CPU).
+    - 'pandas' tetap tersedia sebagai scan `str.contains` (legacy).
     """
 
     def __init__(
         self,
         name_norms: Sequence[str],
         backend: str | None = None,
+        ngram_index: NgramIndex | None = None,
     ) -> None:
-        self._names: list[str] = list(name_norms)
+        # Sequence apa adanya (mis. StringColumn ter-mmap); list hanya dibuat bila backend butuh.
+        self._names: Sequence[str] = name_norms
         selected = (backend or os.getenv("SLIS_MATCHER_BACKEND", "auto")).lower().strip()
 
-        if selected not in {"auto", "cudf", "pandas"}:
+        if selected not in {"auto", "cudf", "ngram", "pandas"}:
             selected = "auto"
 
         self._df = None
         self._series = None
+        self._ngram: NgramIndex | None = ngram_index
 
         if selected == "cudf" and cudf is None:
             raise RuntimeError("SLIS_MATCHER_BACKEND=cudf but cuDF is not installed/available")
 
         if selected in {"auto", "cudf"} and cudf is not None:
             try:
-                self._df = cudf.DataFrame({"name_norm": self._names})
+                self._df = cudf.DataFrame({"name_norm": list(self._names)})
                 # Force a tiny GPU interaction early so driver/runtime mismatch surfaces here.
                 _ = self._df["name_norm"].str.len().head(1).to_pandas()
                 self.backend = "cudf"
@@ -56,14 +71,20 @@ class HybridNameIndex:
                         f"cuDF backend requested but failed to initialize ({type(e).__name__}: {e})"
                     ) from e
                 warnings.warn(
-                    f"cuDF backend unavailable ({type(e).__name__}: {e}); falling back to pandas.",
+                    f"cuDF backend unavailable ({type(e).__name__}: {e}); falling back to ngram.",
                     RuntimeWarning,
                 )
 
-        self.backend = "pandas"
-        if pd is None:
-            raise RuntimeError("pandas is required for CPU matching backend")
-        self._series = pd.Series(self._names, dtype="string")
+        if selected == "pandas":
+            self.backend = "pandas"
+            if pd is None:
+                raise RuntimeError("pandas is required for CPU matching backend")
+            self._series = pd.Series(list(self._names), dtype="string")
+            return
+
+        self.backend = "ngram"
+        if self._ngram is None:
+            self._ngram = NgramIndex.build(self._names)
 
     def filter_indices(
         self,
@@ -73,13 +94,18 @@ class HybridNameIndex:
         length_ratio: float | None = None,
         prefix_len: int = 0,
     ) -> list[int]:
-        """Stage-1 filter kandidat (GPU cuDF bila tersedia, fallback pandas).
+        """Stage-1 filter kandidat (GPU cuDF bila tersedia, fallback n-gram index CPU).
 
         Konsep mengikuti HybridMatcher:
         - Split query menjadi token
         - Skip token < 3 chars
         - Gunakan substring token[:4] untuk `contains` (OR)
         - Jika tidak ada token valid -> return []
+        - Bila kandidat > `max_candidates`: ranking menurut jumlah IDF pattern
+          yang cocok, ambil teratas (seri -> index terkecil), hasil terurut index
+
+        Backend 'ngram' mengembalikan kandidat yang sama dengan scan `contains`
+        (lihat `NgramIndex`), tanpa scan linear per token.
         """
 
         q = (query_norm or "").strip()
@@ -98,20 +124,18 @@ class HybridNameIndex:
                     raise RuntimeError("cuDF dataframe not initialized")
 
                 col = self._df["name_norm"]
-                mask = None
+                score = None
 
                 # Menggunakan substring matching (4 huruf pertama) agar typo lolos filter.
-                for t in tokens:
-                    if len(t) < 3: continue  # Skip kata terlalu pendek
-
-                    # Ambil 4 huruf pertama (atau full token jika <4)
-                    search_pat = t[:4]
-
+                # Skor kandidat = jumlah IDF pattern yang cocok (pattern langka bobot besar).
+                for search_pat in dict.fromkeys(t[:4] for t in tokens if len(t) >= 3):
                     # GPU contains (substring match)
                     m = col.str.contains(search_pat, regex=False)
-                    mask = m if mask is None else (mask | m)
-                if mask is None:
+                    part = m.astype("float64") * idf_weight(int(m.sum()), len(col))
+                    score = part if score is None else score + part
+                if score is None:
                     return []
+                mask = score > 0
 
                 # Length filter optional
                 if q_len > 0 and length_ratio is not None:
@@ -119,50 +143,64 @@ class HybridNameIndex:
                     allowed = int(max(1, q_len * float(length_ratio)))
                     mask = mask & ((lens - q_len).abs() <= allowed)
 
-                filtered = self._df[mask]
-                
-                # [TUNING] Pastikan kandidat cukup banyak untuk CPU Scoring
-                if max_candidates and max_candidates > 0:
-                    filtered = filtered.head(int(max_candidates))
-                
-                return filtered.index.to_pandas().tolist()
+                filtered = cudf.DataFrame({"score": score[mask]})
+                filtered["row"] = filtered.index
+
+                # [TUNING] Pastikan kandidat cukup banyak untuk CPU Scoring; yang dibuang = IDF terendah
+                if max_candidates and max_candidates > 0 and len(filtered) > int(max_candidates):
+                    filtered = filtered.sort_values(["score", "row"], ascending=[False, True]).head(int(max_candidates))
+
+                return sorted(filtered["row"].to_pandas().tolist())
 
             except Exception as e:
                 warnings.warn(
-                    f"cuDF filtering failed ({type(e).__name__}: {e}); switching to pandas backend.",
+                    f"cuDF filtering failed ({type(e).__name__}: {e}); switching to ngram backend.",
                     RuntimeWarning,
                 )
-                self.backend = "pandas"
-                if pd is None:
-                    raise RuntimeError("pandas is required for CPU matching backend")
-                self._series = pd.Series(self._names, dtype="string")
+                self.backend = "ngram"
+                if self._ngram is None:
+                    self._ngram = NgramIndex.build(self._names)
+
+        if self.backend == "ngram":
+            if self._ngram is None:
+                self._ngram = NgramIndex.build(self._names)
+            patterns = [t[:4] for t in tokens if len(t) >= 3]
+            if not patterns:
+                return []
+            idx = self._ngram.lookup(
+                patterns,
+                max_candidates=max_candidates,
+                q_len=q_len,
+                length_ratio=length_ratio,
+            )
+            return idx.tolist()
 
         # pandas backend (CPU Fallback)
         if self._series is None:
             if pd is None:
                 raise RuntimeError("pandas is required for CPU matching backend")
-            self._series = pd.Series(self._names, dtype="string")
+            self._series = pd.Series(list(self._names), dtype="string")
         s = self._series
-        mask = None
-        for t in tokens:
-            if len(t) < 3:
-                continue
-            search_pat = t[:4]
-            m = s.str.contains(search_pat, regex=False, na=False)
-            mask = m if mask is None else (mask | m)
+        score = None
+        for search_pat in dict.fromkeys(t[:4] for t in tokens if len(t) >= 3):
+            m = s.str.contains(search_pat, regex=False, na=False).astype(bool)
+            part = m.astype("float64") * idf_weight(int(m.sum()), len(s))
+            score = part if score is None else score + part
 
-        if mask is None:
+        if score is None:
             return []
+        mask = score > 0
 
         if q_len > 0 and length_ratio is not None:
             lens = s.str.len().fillna(0)
             allowed = int(max(1, q_len * float(length_ratio)))
             mask = mask & (lens.sub(q_len).abs() <= allowed)
 
-        idx = s[mask].index
-        if max_candidates and max_candidates > 0:
-            idx = idx[: int(max_candidates)]
-        return idx.astype(int).tolist()
+        rows = s[mask].index.to_numpy(dtype=np.int64)
+        if max_candidates and max_candidates > 0 and len(rows) > int(max_candidates):
+            scores = score[mask].to_numpy(dtype=np.float64)
+            rows = np.sort(rows[np.lexsort((rows, -scores))[: int(max_candidates)]])
+        return rows.tolist()
 
 
 def normalize_name(name: str) -> str:
@@ -190,6 +228,22 @@ def normalize_name(name: str) -> str:
     return name
 
 
+def normalize_name_series(names: "pd.Series") -> "pd.Series":
+    """
+    Versi vektor (pandas `.str`) dari `normalize_name` untuk satu kolom penuh.
+    Hasil identik per elemen; nilai non-string menjadi "".
+    """
+    if pd is None:
+        raise RuntimeError("pandas is required for normalize_name_series")
+
+    is_str = names.map(lambda v: isinstance(v, str))
+    s = names.where(is_str, "").astype(object).str.lower().str.strip()
+    s = s.str.replace(r"[^a-z0-9\s]", "", regex=True)
+    s = s.str.replace(NOISE_TITLES_RE, "", regex=True)
+    s = s.str.replace(r"\s+", " ", regex=True).str.strip()
+    return s
+
+
 class HybridMatcher:
     """Hybrid matcher untuk name matching (GPU filter + CPU scoring).
 
@@ -209,8 +263,39 @@ class HybridMatcher:
             s["__norm_name"] = norm
             self.sanction_norms.append(norm)
 
+        self.name_owner: np.ndarray | None = None
         self.index = HybridNameIndex(self.sanction_norms)
 
+    @classmethod
+    def from_normed(
+        cls,
+        name_norms: Sequence[str],
+        ngram_index: NgramIndex | None = None,
+        name_owner: np.ndarray | None = None,
+    ) -> "HybridMatcher":
+        """Bangun matcher dari nama yang sudah dinormalisasi (mis. index ter-mmap).
+
+        Tidak ada dict per sanction; caller memetakan `index` hasil match ke
+        metadata miliknya sendiri.
+
+        `name_owner[i]` = pemilik (mis. baris entity) nama ke-i, untuk tabel
+        nama yang berisi beberapa nama per pemilik (alias). Stage-1/2 bekerja
+        per nama; hasil `best_match_*` / `top_k_*` memakai `index` = pemilik
+        dengan skor nama (alias) terbaik, dan top-K berisi pemilik unik.
+        """
+        matcher = cls.__new__(cls)
+        matcher.sanctions = []
+        matcher.sanction_norms = name_norms  # type: ignore[assignment]
+        matcher.name_owner = name_owner
+        matcher.index = HybridNameIndex(name_norms, ngram_index=ngram_index)
+        return matcher
+
+    def owner_of(self, name_idx: int) -> int:
+        """Pemilik (index hasil match) untuk index nama `name_idx`."""
+        if self.name_owner is None:
+            return int(name_idx)
+        return int(self.name_owner[name_idx])
+
     def stage1_gpu_filter(self, query_norm: str) -> list[int]:
         return self.index.filter_indices(query_norm)
 
@@ -224,17 +309,234 @@ class HybridMatcher:
             "sort": round(float(sort_score), 2),
         }
 
-    def best_match_normed(self, query_norm: str, threshold: float = 70.0) -> dict[str, Any] | None:
+    def score_batch_normed(
+        self,
+        queries_norm: Sequence[str],
+        candidate_lists: Sequence[Sequence[int]] | None = None,
+        score_cutoff: float = 0.0,
+        workers: int = -1,
+    ) -> dict[str, np.ndarray]:
+        """Stage-2 scoring untuk satu chunk query sekaligus (RapidFuzz `cdist`).
+
+        `candidate_lists[i]` = kandidat stage-1 untuk query ke-i (default: hasil
+        `stage1_gpu_filter`). Return dict berisi matriks (n_query x max_kandidat):
+        - `candidates`: index sanction (padding -1)
+        - `final`, `jw`, `sort`: skor yang sudah di-round 2 desimal (padding 0)
+
+        Pasangan dengan skor final < `score_cutoff` bernilai 0.
+        """
+        queries = [q or "" for q in queries_norm]
+        if candidate_lists is None:
+            candidate_lists = [self.stage1_gpu_filter(q) if q else [] for q in queries]
+
+        n = len(queries)
+        cand_arrays = [np.asarray(c, dtype=np.int64) for c in candidate_lists]
+        width = max((len(c) for c in cand_arrays), default=0)
+
+        cand = np.full((n, width), -1, dtype=np.int64)
+        jw = np.zeros((n, width), dtype=np.float64)
+        srt = np.zeros((n, width), dtype=np.float64)
+        for i, c in enumerate(cand_arrays):
+            cand[i, : len(c)] = c
+
+        total_pairs = int(sum(len(c) for c in cand_arrays))
+        if total_pairs:
+            union = np.unique(np.concatenate(cand_arrays))
+            if n * len(union) <= _DENSE_FACTOR * total_pairs:
+                # Satu cdist untuk seluruh chunk, lalu ambil kolom milik tiap query
+                choices = [self.sanction_norms[int(j)] for j in union]
+                jw_all, srt_all = _blend_components_cdist(queries, choices, score_cutoff, workers)
+                for i, c in enumerate(cand_arrays):
+                    if len(c):
+                        cols = np.searchsorted(union, c)
+                        jw[i, : len(c)] = jw_all[i, cols]
+                        srt[i, : len(c)] = srt_all[i, cols]
+            else:
+                for i, c in enumerate(cand_arrays):
+                    if not len(c) or not queries[i]:
+                        continue
+                    choices = [self.sanction_norms[int(j)] for j in c]
+                    jw_row, srt_row = _blend_components_cdist([queries[i]], choices, score_cutoff, workers)
+                    jw[i, : len(c)] = jw_row[0]
+                    srt[i, : len(c)] = srt_row[0]
+
+        final = (JW_WEIGHT * jw) + (SORT_WEIGHT * srt)
+        final = np.round(final, 2)
+        if score_cutoff > 0:
+            below = final < score_cutoff
+            final[below] = 0.0
+            jw[below] = 0.0
+            srt[below] = 0.0
+        final[cand < 0] = 0.0
+
+        return {
+            "candidates": cand,
+            "final": final,
+            "jw": np.round(jw, 2),
+            "sort": np.round(srt, 2),
+        }
+
+    def name_lengths(self) -> np.ndarray:
+        """Panjang (karakter) tiap nama sanction; dari n-gram index bila ada."""
+        lengths = getattr(self, "_name_lengths", None)
+        if lengths is None:
+            ngram = getattr(self.index, "_ngram", None)
+            if ngram is not None and len(ngram) == len(self.sanction_norms):
+                lengths = ngram.lengths
+            else:
+                lengths = np.fromiter((len(s or "") for s in self.sanction_norms), dtype=np.int32, count=len(self.sanction_norms))
+            self._name_lengths = lengths
+        return lengths
+
+    def score_upper_bounds(self, query_norm: str, candidates: Sequence[int]) -> np.ndarray:
+        """Batas atas skor final tiap kandidat, hanya dari panjang nama (lihat `_score_upper_bound`)."""
+        cand = np.asarray(candidates, dtype=np.int64)
+        if not len(cand):
+            return np.empty(0, dtype=np.float64)
+        return _score_upper_bound(len(query_norm), self.name_lengths()[cand])
+
+    def best_match_batch_normed(
+        self,
+        queries_norm: Sequence[str],
+        threshold: float = 70.0,
+        workers: int = -1,
+    ) -> list[dict[str, Any] | None]:
+        """Versi batch dari `best_match_normed` (hasil sama, satu `cdist` per chunk).
+
+        Kandidat yang batas atas skornya di bawah `threshold` dibuang sebelum `cdist`.
+        """
+        if not queries_norm:
+            return []
+        candidate_lists = []
+        for q in queries_norm:
+            cand = np.asarray(self.stage1_gpu_filter(q) if q else [], dtype=np.int64)
+            if len(cand):
+                cand = cand[self.score_upper_bounds(q, cand) >= threshold]
+            candidate_lists.append(cand)
+        batch = self.score_batch_normed(
+            queries_norm,
+            candidate_lists=candidate_lists,
+            score_cutoff=float(threshold),
+            workers=workers,
+        )
+        final = batch["final"]
+        results: list[dict[str, Any] | None] = [None] * len(queries_norm)
+        if final.shape[1] == 0:
+            return results
+
+        valid = (batch["candidates"] >= 0) & (final >= threshold) & (final > 0.0)
+        masked = np.where(valid, final, -np.inf)
+        best_cols = np.argmax(masked, axis=1)
+        for i, col in enumerate(best_cols):
+            if not valid[i, col]:
+                continue
+            results[i] = {
+                "index": self.owner_of(batch["candidates"][i, col]),
+                "scores": {
+                    "final": float(final[i, col]),
+                    "jw": float(batch["jw"][i, col]),
+                    "sort": float(batch["sort"][i, col]),
+                },
+            }
+        return results
+
+    def top_k_batch_normed(
+        self,
+        queries_norm: Sequence[str],
+        k: int = 10,
+        threshold: float = 70.0,
+        candidate_lists: Sequence[Sequence[int]] | None = None,
+        workers: int = -1,
+    ) -> list[list[dict[str, Any]]]:
+        """K match terbaik per query (skor final >= threshold).
+
+        Tiap elemen = list {"index", "scores"} (format `best_match_batch_normed`)
+        urut skor final menurun, seri -> index terkecil; `k=1` memberi
+        `[best_match]`. Seleksi per baris pakai `np.argpartition`, bukan sort penuh.
+        """
+        if not queries_norm:
+            return []
+        k = max(1, int(k))
+        if candidate_lists is None:
+            candidate_lists = [self.stage1_gpu_filter(q) if q else [] for q in queries_norm]
+        pruned = []
+        for q, cand in zip(queries_norm, candidate_lists):
+            cand = np.asarray(cand, dtype=np.int64)
+            if len(cand):
+                cand = cand[self.score_upper_bounds(q, cand) >= threshold]
+            pruned.append(cand)
+        batch = self.score_batch_normed(
+            queries_norm,
+            candidate_lists=pruned,
+            score_cutoff=float(threshold),
+            workers=workers,
+        )
+        final = batch["final"]
+        results: list[list[dict[str, Any]]] = [[] for _ in queries_norm]
+        if final.shape[1] == 0:
+            return results
+
+        valid = (batch["candidates"] >= 0) & (final >= threshold) & (final > 0.0)
+        masked = np.where(valid, final, -np.inf)
+        owners = None
+        if self.name_owner is not None:
+            owners = np.where(batch["candidates"] >= 0, self.name_owner[np.maximum(batch["candidates"], 0)], -1)
+        for i in range(len(queries_norm)):
+            for col in _top_k_columns(masked[i], k, None if owners is None else owners[i]):
+                results[i].append(
+                    {
+                        "index": self.owner_of(batch["candidates"][i, col]),
+                        "scores": {
+                            "final": float(final[i, col]),
+                            "jw": float(batch["jw"][i, col]),
+                            "sort": float(batch["sort"][i, col]),
+                        },
+                    }
+                )
+        return results
+
+    def top_k_normed(
+        self,
+        query_norm: str,
+        k: int = 10,
+        threshold: float = 70.0,
+        candidates: Sequence[int] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Versi satu query dari `top_k_batch_normed`; `candidates` default hasil stage-1."""
+        if not query_norm:
+            return []
+        return self.top_k_batch_normed(
+            [query_norm],
+            k=k,
+            threshold=threshold,
+            candidate_lists=None if candidates is None else [candidates],
+        )[0]
+
+    def best_match_normed(
+        self,
+        query_norm: str,
+        threshold: float = 70.0,
+        bounded: bool = True,
+    ) -> dict[str, Any] | None:
+        """Kandidat stage-1 dengan skor final tertinggi (>= threshold); seri -> index terkecil.
+
+        `bounded=True`: kandidat di-scan urut batas atas skor (dari panjang nama),
+        RapidFuzz diberi `score_cutoff` = max(threshold, skor terbaik sejauh ini),
+        dan scan berhenti begitu batas atas kandidat berikutnya tidak bisa
+        menyamai skor terbaik / threshold. Hasil sama dengan scan penuh.
+        """
         if not query_norm:
             return None
         candidate_indices = self.stage1_gpu_filter(query_norm)
+        if bounded:
+            return self._best_match_bounded(query_norm, candidate_indices, threshold)
+
         best_idx: int | None = None
         best_score = 0.0
         best_scores: dict[str, float] | None = None
 
         for idx in candidate_indices:
-            s_data = self.sanctions[idx]
-            scores = self.stage2_cpu_scoring(query_norm, str(s_data.get("__norm_name", "")))
+            scores = self.stage2_cpu_scoring(query_norm, self.sanction_norms[idx] or "")
             if scores["final"] >= threshold and scores["final"] > best_score:
                 best_score = float(scores["final"])
                 best_idx = int(idx)
@@ -244,11 +546,168 @@ class HybridMatcher:
             return None
 
         return {
-            "index": best_idx,
+            "index": self.owner_of(best_idx),
+            "scores": best_scores,
+        }
+
+    def _best_match_bounded(
+        self,
+        query_norm: str,
+        candidate_indices: Sequence[int],
+        threshold: float,
+    ) -> dict[str, Any] | None:
+        cand = np.asarray(candidate_indices, dtype=np.int64)
+        if not len(cand):
+            return None
+        bounds = self.score_upper_bounds(query_norm, cand)
+        order = np.lexsort((cand, -bounds))
+
+        best_idx: int | None = None
+        best_score = 0.0
+        best_scores: dict[str, float] | None = None
+
+        for pos in order:
+            # Seri dengan skor terbaik masih bisa menang (index lebih kecil) -> pembanding tidak strict
+            need = max(float(threshold), best_score)
+            if bounds[pos] < need:
+                break
+            idx = int(cand[pos])
+            scores = _blend_scores_with_cutoff(query_norm, self.sanction_norms[idx] or "", need)
+            if scores is None or scores["final"] < threshold or scores["final"] <= 0.0:
+                continue
+            if scores["final"] > best_score or (scores["final"] == best_score and best_idx is not None and idx < best_idx):
+                best_score = float(scores["final"])
+                best_idx = idx
+                best_scores = scores
+
+        if best_idx is None or best_scores is None:
+            return None
+
+        return {
+            "index": self.owner_of(best_idx),
             "scores": best_scores,
         }
 
 
+def _top_k_columns(scores: np.ndarray, k: int, owners: np.ndarray | None = None) -> np.ndarray:
+    """Posisi `k` skor tertinggi (nilai -inf = tidak valid), urut skor menurun lalu posisi.
+
+    Dengan `owners`, hanya posisi terbaik per pemilik yang dihitung (alias terbaik).
+    """
+    finite = np.flatnonzero(np.isfinite(scores))
+    if owners is not None:
+        ranked = finite[np.lexsort((finite, -scores[finite]))]
+        _, first = np.unique(owners[ranked], return_index=True)
+        return ranked[np.sort(first)][:k]
+    if len(finite) > k:
+        kth = -np.partition(-scores, k - 1)[k - 1]
+        above = np.flatnonzero(scores > kth)
+        ties = np.flatnonzero(scores == kth)[: k - len(above)]
+        finite = np.concatenate((above, ties))
+    return finite[np.lexsort((finite, -scores[finite]))]
+
+
+def _score_upper_bound(q_len: int, lengths: np.ndarray) -> np.ndarray:
+    """Batas atas skor final (0-100, sudah termasuk toleransi pembulatan) dari panjang nama saja.
+
+    - Jaro <= (m/|a| + m/|b| + 1) / 3 dengan m <= min(|a|, |b|); Winkler menambah
+      paling banyak 0.4 * (1 - Jaro) (prefix <= 4, bobot 0.1).
+    - TokenSort (Indel) <= 2 * min(|a|, |b|) / (|a| + |b|).
+
+    Berlaku untuk nama hasil `normalize_name` (spasi tunggal, tanpa spasi di
+    ujung) sehingga panjang string ter-sort token sama dengan panjang aslinya.
+    """
+    lb = lengths.astype(np.float64)
+    la = float(q_len)
+    if la <= 0:
+        return np.zeros(len(lb), dtype=np.float64)
+    mn = np.minimum(la, lb)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaro = np.where(lb > 0, (mn / la + mn / np.maximum(lb, 1.0) + 1.0) / 3.0, 0.0)
+        sort = np.where(lb > 0, 2.0 * mn / (la + lb), 0.0)
+    jw = jaro + 0.4 * (1.0 - jaro)
+    return (JW_WEIGHT * jw + SORT_WEIGHT * sort) * 100.0 + 0.01
+
+
+def _blend_scores_with_cutoff(query_norm: str, sanction_norm: str, score_cutoff: float) -> dict[str, float] | None:
+    """Skor seperti `stage2_cpu_scoring`, atau None bila skor final pasti < `score_cutoff`.
+
+    Cutoff JW diturunkan dengan asumsi TokenSort = 100, lalu cutoff TokenSort
+    dari JW yang sebenarnya; skor yang lolos identik dengan tanpa cutoff.
+    """
+    floor = max(float(score_cutoff) - 0.01, 0.0)  # toleransi pembulatan 2 desimal
+    jw_cutoff = max((floor - SORT_WEIGHT * 100.0) / JW_WEIGHT, 0.0) / 100.0
+    jw_score = distance.JaroWinkler.similarity(query_norm, sanction_norm, score_cutoff=jw_cutoff or None) * 100.0
+    if jw_cutoff and jw_score == 0.0:
+        return None
+    sort_cutoff = max((floor - JW_WEIGHT * jw_score) / SORT_WEIGHT, 0.0)
+    sort_score = float(fuzz.token_sort_ratio(query_norm, sanction_norm, score_cutoff=sort_cutoff or None))
+    if sort_cutoff and sort_score == 0.0:
+        return None
+    final_score = (0.60 * jw_score) + (0.40 * sort_score)
+    return {
+        "final": round(float(final_score), 2),
+        "jw": round(float(jw_score), 2),
+        "sort": round(float(sort_score), 2),
+    }
+
+
+def _blend_components_cdist(
+    queries: Sequence[str],
+    choices: Sequence[str],
+    score_cutoff: float = 0.0,
+    workers: int = -1,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Matriks JW (0-100) dan TokenSort (0-100) via `process.cdist`.
+
+    `score_cutoff` adalah batas skor final blend; diturunkan ke cutoff per
+    komponen (komponen lain diasumsikan 100) sehingga pasangan yang pasti
+    tidak lolos dibuang di dalam RapidFuzz tanpa mengubah skor yang lolos.
+    """
+    floor = max(float(score_cutoff) - 0.01, 0.0)  # toleransi pembulatan 2 desimal
+    jw_cutoff = max((floor - SORT_WEIGHT * 100.0) / JW_WEIGHT, 0.0) / 100.0
+    sort_cutoff = max((floor - JW_WEIGHT * 100.0) / SORT_WEIGHT, 0.0)
+
+    jw = process.cdist(
+        queries,
+        choices,
+        scorer=distance.JaroWinkler.similarity,
+        score_cutoff=jw_cutoff or None,
+        dtype=np.float64,
+        workers=workers,
+    )
+    srt = process.cdist(
+        queries,
+        choices,
+        scorer=fuzz.token_sort_ratio,
+        score_cutoff=sort_cutoff or None,
+        dtype=np.float64,
+        workers=workers,
+    )
+    return jw * 100.0, srt
+
+
+def calculate_advanced_name_score_cdist(
+    queries_norm: Sequence[str],
+    choices_norm: Sequence[str],
+    score_cutoff: float = 0.0,
+    workers: int = -1,
+) -> np.ndarray:
+    """
+    Versi matriks dari `calculate_advanced_name_score_normed`:
+    skor (len(queries) x len(choices)) blend 60% JW + 40% TokenSort.
+    Pasangan di bawah `score_cutoff` bernilai 0.
+    """
+    if not len(queries_norm) or not len(choices_norm):
+        return np.zeros((len(queries_norm), len(choices_norm)), dtype=np.float64)
+
+    jw, srt = _blend_components_cdist(queries_norm, choices_norm, score_cutoff, workers)
+    final = (JW_WEIGHT * jw) + (SORT_WEIGHT * srt)
+    if score_cutoff > 0:
+        final[final < score_cutoff] = 0.0
+    return final
+
+
 def calculate_advanced_name_score(
     name1: str,
     name2: str,
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from .columns import load_array, save_array
+
+# Alfabet hasil `normalize_name`: spasi (separator), a-z, 0-9. Karakter lain
+# dipetakan ke satu kode "other" sehingga hasil lookup menjadi superset.
+_SEP = 0
+_OTHER = 37
+_BASE = 38
+_GRAM_SIZES = (3, 4)
+
+_CHAR_CODES = np.full(128, _OTHER, dtype=np.int64)
+for _ch in " \t\n\r\x0b\x0c":
+    _CHAR_CODES[ord(_ch)] = _SEP
+for _i, _ch in enumerate("abcdefghijklmnopqrstuvwxyz0123456789", start=1):
+    _CHAR_CODES[ord(_ch)] = _i
+
+
+def _char_codes(text: str) -> np.ndarray:
+    """Kode karakter (0..37) untuk setiap codepoint dari `text`."""
+    cps = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.int64)
+    codes = np.full(cps.shape, _OTHER, dtype=np.int64)
+    ascii_mask = cps < 128
+    codes[ascii_mask] = _CHAR_CODES[cps[ascii_mask]]
+    return codes
+
+
+def gram_code(pattern: str) -> int | None:
+    """Encode pattern 3/4 karakter ke integer (None jika mengandung whitespace)."""
+    if len(pattern) not in _GRAM_SIZES:
+        return None
+    code = 0
+    mult = 1
+    for ch in pattern:
+        cp = ord(ch)
+        c = int(_CHAR_CODES[cp]) if cp < 128 else _OTHER
+        if c == _SEP:
+            return None
+        code += c * mult
+        mult *= _BASE
+    return code
+
+
+def idf_weight(doc_freq: int, n_docs: int) -> float:
+    """IDF (smoothed) sebuah pattern: makin jarang muncul di daftar nama, makin besar bobotnya."""
+    return math.log((n_docs + 1) / (doc_freq + 1)) + 1.0
+
+
+def _scored_union(parts: list[np.ndarray], weights: list[float]) -> tuple[np.ndarray, np.ndarray]:
+    """Union terurut dari `parts` + skor (jumlah bobot part yang memuat id)."""
+    merged, inverse = np.unique(np.concatenate(parts), return_inverse=True)
+    scores = np.bincount(
+        inverse,
+        weights=np.repeat(np.asarray(weights), [len(p) for p in parts]),
+        minlength=len(merged),
+    )
+    return merged, scores
+
+
+class NgramIndex:
+    """Inverted index karakter 3-gram + 4-gram untuk stage-1 filtering di CPU.
+
+    Setiap nama di-scan per token (split whitespace) dan semua substring
+    3 & 4 karakter disimpan sebagai posting list (CSR):
+    - `keys`     : kode gram terurut (int32)
+    - `offsets`  : batas posting per gram (int64, panjang len(keys) + 1)
+    - `postings` : id nama terurut per gram (int32)
+    - `lengths`  : panjang karakter tiap nama (int32) untuk length filter
+
+    Pattern `token[:4]` dari query menjadi satu lookup posting yang identik
+    dengan `str.contains(token[:4])` untuk nama hasil `normalize_name`.
+    Untuk nama dengan karakter di luar [a-z0-9 ] hasilnya superset (semua
+    karakter asing berbagi satu kode).
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        offsets: np.ndarray,
+        postings: np.ndarray,
+        lengths: np.ndarray,
+    ) -> None:
+        self.keys = keys
+        self.offsets = offsets
+        self.postings = postings
+        self.lengths = lengths
+
+    @classmethod
+    def build(cls, names: Sequence[str]) -> "NgramIndex":
+        n = len(names)
+        lengths = np.fromiter((len(s) for s in names), dtype=np.int32, count=n)
+        if n == 0:
+            return cls(
+                np.empty(0, dtype=np.int32),
+                np.zeros(1, dtype=np.int64),
+                np.empty(0, dtype=np.int32),
+                lengths,
+            )
+
+        # Semua nama digabung dengan separator sehingga gram tidak melewati batas nama.
+        codes = _char_codes(" ".join(names))
+        row_of = np.repeat(np.arange(n, dtype=np.int64), lengths.astype(np.int64) + 1)[: len(codes)]
+
+        pairs = []
+        for size in _GRAM_SIZES:
+            if len(codes) < size:
+                continue
+            span = len(codes) - size + 1
+            gram = np.zeros(span, dtype=np.int64)
+            valid = np.ones(span, dtype=bool)
+            mult = 1
+            for j in range(size):
+                part = codes[j : j + span]
+                valid &= part != _SEP
+                gram += part * mult
+                mult *= _BASE
+            # Kombinasi (gram, row) unik -> dedup gram berulang di satu nama
+            pairs.append(gram[valid] * n + row_of[:span][valid])
+
+        combined = np.concatenate(pairs) if pairs else np.empty(0, dtype=np.int64)
+        combined.sort()
+        if len(combined):
+            combined = combined[np.concatenate(([True], combined[1:] != combined[:-1]))]
+
+        gram_of = combined // n
+        postings = (combined % n).astype(np.int32)
+        if len(gram_of):
+            starts = np.flatnonzero(np.concatenate(([True], gram_of[1:] != gram_of[:-1])))
+        else:
+            starts = np.empty(0, dtype=np.int64)
+        keys = gram_of[starts]
+        offsets = np.empty(len(keys) + 1, dtype=np.int64)
+        offsets[:-1] = starts
+        offsets[-1] = len(postings)
+        return cls(keys.astype(np.int32), offsets, postings, lengths)
+
+    def __len__(self) -> int:
+        return int(len(self.lengths))
+
+    def save(self, directory: Path, prefix: str = "ngram") -> None:
+        for name in ("keys", "offsets", "postings", "lengths"):
+            save_array(directory, f"{prefix}.{name}", getattr(self, name))
+
+    @classmethod
+    def load(cls, directory: Path, prefix: str = "ngram", mmap: bool = True) -> "NgramIndex":
+        """Load index dari disk; dengan `mmap=True` semua array read-only & shared antar proses."""
+        return cls(
+            *(load_array(directory, f"{prefix}.{name}", mmap) for name in ("keys", "offsets", "postings", "lengths"))
+        )
+
+    def posting(self, pattern: str) -> np.ndarray:
+        """Posting list (id terurut) untuk satu pattern 3/4 karakter."""
+        code = gram_code(pattern)
+        if code is None or len(self.keys) == 0:
+            return self.postings[:0]
+        pos = int(np.searchsorted(self.keys, code))
+        if pos >= len(self.keys) or int(self.keys[pos]) != code:
+            return self.postings[:0]
+        return self.postings[self.offsets[pos] : self.offsets[pos + 1]]
+
+    def doc_freq(self, pattern: str) -> int:
+        """Jumlah nama yang mengandung `pattern` (panjang posting list)."""
+        return int(len(self.posting(pattern)))
+
+    def lookup(
+        self,
+        patterns: Sequence[str],
+        max_candidates: int | None = None,
+        q_len: int = 0,
+        length_ratio: float | None = None,
+    ) -> np.ndarray:
+        """Union posting list (OR) dari `patterns`, terurut menurut id.
+
+        Bila union lebih besar dari `max_candidates`, kandidat diranking menurut
+        jumlah IDF pattern yang dikandungnya (pattern umum seperti "muha" hampir
+        tidak menambah skor) dan diambil `max_candidates` teratas; skor seri
+        dimenangkan id terkecil. Document frequency = panjang posting list
+        (sebelum length filter), jadi tidak perlu statistik tambahan.
+
+        Posting diproses dari pattern paling langka (batas MaxScore): begitu
+        skor ke-`max_candidates` di union sementara melebihi jumlah bobot semua
+        pattern yang belum diproses, id di luar union tidak mungkin lagi masuk
+        hasil. Pattern sisanya hanya menambah skor kandidat yang sudah ada (cek
+        keanggotaan lewat `searchsorted`, tanpa menyalin posting list-nya).
+        """
+        limit = int(max_candidates) if max_candidates and max_candidates > 0 else None
+        allowed = None
+        if q_len > 0 and length_ratio is not None:
+            allowed = int(max(1, q_len * float(length_ratio)))
+
+        # Pattern paling langka (bobot terbesar) lebih dulu
+        postings = sorted((self.posting(pat) for pat in dict.fromkeys(patterns)), key=len)
+        n_docs = len(self)
+        pattern_weights = [idf_weight(len(ids), n_docs) for ids in postings]
+        # remaining[i] = skor maksimum yang masih bisa didapat id dari pattern i..akhir
+        remaining = np.cumsum(pattern_weights[::-1])[::-1].tolist() + [0.0]
+        parts: list[np.ndarray] = []
+        weights: list[float] = []
+        rest = len(postings)
+        total = 0
+        scored = None
+        for i, ids in enumerate(postings):
+            # Union dihitung hanya bila jumlah posting (batas atas union) sudah >= limit
+            if limit is not None and total >= limit:
+                merged, scores = _scored_union(parts, weights)
+                if len(merged) >= limit:
+                    kth = np.partition(scores, len(scores) - limit)[len(scores) - limit]
+                    # Toleransi float: urutan penjumlahan bobot berbeda antar backend
+                    if remaining[i] < kth - 1e-9:
+                        rest = i
+                        scored = (merged, scores)
+                        break
+            weight = pattern_weights[i]
+            if allowed is not None and len(ids):
+                ids = ids[np.abs(self.lengths[ids] - q_len) <= allowed]
+            if len(ids):
+                parts.append(ids)
+                weights.append(weight)
+                total += len(ids)
+
+        if not parts:
+            return np.empty(0, dtype=np.int32)
+        if len(parts) == 1 and rest == len(postings):
+            # Satu pattern: semua kandidat berskor sama -> id terkecil
+            return parts[0] if limit is None else parts[0][:limit]
+
+        if scored is None:
+            if limit is None:
+                return np.unique(np.concatenate(parts))
+            scored = _scored_union(parts, weights)
+        merged, scores = scored
+        if len(merged) <= limit:
+            return merged
+
+        # Pattern sisanya: hanya skor kandidat yang sudah ada
+        for ids, weight in zip(postings[rest:], pattern_weights[rest:]):
+            if not len(ids):
+                continue
+            pos = np.minimum(np.searchsorted(ids, merged), len(ids) - 1)
+            scores[ids[pos] == merged] += weight
+        top = np.lexsort((merged, -scores))[:limit]
+        return np.sort(merged[top])
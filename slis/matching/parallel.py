@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Iterator, Sequence
+
+logger = logging.getLogger(__name__)
+
+# Jumlah proses scoring di dalam satu task (0/1 = serial di proses task).
+# Dipilih bersama `SLIS_MATCHER_BACKEND`; worker di-fork sehingga matcher
+# (index mmap + list nama) dibagi copy-on-write, tidak di-pickle.
+MATCHER_PROCESSES = int(os.getenv("SLIS_MATCHER_PROCESSES", "0"))
+PARALLEL_CHUNK_SIZE = int(os.getenv("SLIS_MATCHER_PARALLEL_CHUNK", "500"))
+
+# Diisi sebelum fork; proses anak mewarisi referensi ini.
+_FORK_MATCHER: Any = None
+
+# Hasil compact per nama: (index, final, jw, sort); index -1 = tidak ada match.
+_NO_MATCH = (-1, 0.0, 0.0, 0.0)
+
+
+def _match_chunk(args: tuple[list[str], float]) -> list[tuple[int, float, float, float]]:
+    names, threshold = args
+    # workers=1: paralelisme sudah di level proses, hindari oversubscription thread
+    bests = _FORK_MATCHER.best_match_batch_normed(names, threshold=threshold, workers=1)
+    return [
+        (b["index"], b["scores"]["final"], b["scores"]["jw"], b["scores"]["sort"]) if b else _NO_MATCH
+        for b in bests
+    ]
+
+
+def _top_k_chunk(args: tuple[list[str], float, int]) -> list[list[tuple[int, float, float, float]]]:
+    names, threshold, k = args
+    hits = _FORK_MATCHER.top_k_batch_normed(names, k=k, threshold=threshold, workers=1)
+    return [[(h["index"], h["scores"]["final"], h["scores"]["jw"], h["scores"]["sort"]) for h in row] for row in hits]
+
+
+def _hit(idx: int, final: float, jw: float, srt: float) -> dict[str, Any]:
+    return {"index": idx, "scores": {"final": final, "jw": jw, "sort": srt}}
+
+
+def _can_fork_children() -> bool:
+    return "fork" in mp.get_all_start_methods()
+
+
+def _fork_context():
+    """
+    Context multiprocessing (start method fork) untuk pool scoring.
+
+    Proses pool Celery (prefork) bersifat daemonic dan `multiprocessing`
+    menolak membuat child di sana; context `billiard` (library pool Celery
+    sendiri) mengizinkannya, jadi dipakai di proses daemonic.
+    """
+    if not mp.current_process().daemon:
+        return mp.get_context("fork")
+    import billiard
+
+    return billiard.get_context("fork")
+
+
+class ParallelMatcher:
+    """
+    Pembungkus `HybridMatcher` dengan `best_match_batch_normed` /
+    `top_k_batch_normed` yang dipecah per chunk nama ke `ProcessPoolExecutor`
+    (start method fork, lihat `_fork_context`).
+
+    Proses utama tetap memegang DB write & progress; worker hanya menerima
+    list nama dan mengembalikan tuple compact.
+    """
+
+    def __init__(self, matcher, executor: ProcessPoolExecutor, chunk_size: int = PARALLEL_CHUNK_SIZE) -> None:
+        self.matcher = matcher
+        self.executor = executor
+        self.chunk_size = max(1, int(chunk_size))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.matcher, name)
+
+    def best_match_batch_normed(
+        self,
+        queries_norm: Sequence[str],
+        threshold: float = 70.0,
+        workers: int = -1,
+    ) -> list[dict[str, Any] | None]:
+        if len(queries_norm) <= self.chunk_size:
+            return self.matcher.best_match_batch_normed(queries_norm, threshold=threshold, workers=workers)
+
+        chunks = [
+            (list(queries_norm[i : i + self.chunk_size]), float(threshold))
+            for i in range(0, len(queries_norm), self.chunk_size)
+        ]
+        results: list[dict[str, Any] | None] = []
+        for part in self.executor.map(_match_chunk, chunks):
+            for idx, final, jw, srt in part:
+                results.append(None if idx < 0 else _hit(idx, final, jw, srt))
+        return results
+
+    def top_k_batch_normed(
+        self,
+        queries_norm: Sequence[str],
+        k: int = 10,
+        threshold: float = 70.0,
+        workers: int = -1,
+    ) -> list[list[dict[str, Any]]]:
+        if len(queries_norm) <= self.chunk_size:
+            return self.matcher.top_k_batch_normed(queries_norm, k=k, threshold=threshold, workers=workers)
+
+        chunks = [
+            (list(queries_norm[i : i + self.chunk_size]), float(threshold), int(k))
+            for i in range(0, len(queries_norm), self.chunk_size)
+        ]
+        results: list[list[dict[str, Any]]] = []
+        for part in self.executor.map(_top_k_chunk, chunks):
+            results.extend([_hit(*h) for h in row] for row in part)
+        return results
+
+
+@contextmanager
+def parallel_matcher(matcher, processes: int | None = None) -> Iterator[Any]:
+    """
+    Context manager: `ParallelMatcher` bila `SLIS_MATCHER_PROCESSES` > 1 dan
+    proses ini boleh fork, selain itu matcher asli (serial).
+    """
+    global _FORK_MATCHER
+    processes = MATCHER_PROCESSES if processes is None else int(processes)
+    if processes <= 1:
+        yield matcher
+        return
+    if not _can_fork_children():
+        logger.warning(
+            "SLIS_MATCHER_PROCESSES=%s diabaikan: platform ini tidak mendukung fork; scoring berjalan serial.",
+            processes,
+        )
+        yield matcher
+        return
+
+    _FORK_MATCHER = matcher
+    executor = ProcessPoolExecutor(max_workers=processes, mp_context=_fork_context())
+    try:
+        yield ParallelMatcher(matcher, executor)
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+        _FORK_MATCHER = None
@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+
+from .dob import DobParts
+
+# Kode skema bobot per pasangan = 2 * has_dob + has_citizenship
+SCHEME_NAMES = ("NAME_ONLY", "NAME_CITIZENSHIP", "NAME_DOB", "NAME_DOB_CITIZENSHIP")
+
+
+def scheme_codes(has_dob: np.ndarray, has_citizenship: np.ndarray) -> np.ndarray:
+    """Index ke `SCHEME_NAMES` / tabel bobot untuk setiap pasangan."""
+    return has_dob.astype(np.int8) * 2 + has_citizenship.astype(np.int8)
+
+
+def dob_scores_columnar(
+    customer_dob: DobParts,
+    dob_year: np.ndarray,
+    dob_month: np.ndarray,
+    dob_day: np.ndarray,
+) -> np.ndarray:
+    """
+    Skor DOB non-Australia (`calculate_dob_score_parsed`) untuk satu DOB
+    customer terhadap array DOB sanksi (-1 = tidak ada): 100 / 75 / 50 / 0.
+    """
+    scores = np.zeros(len(dob_year), dtype=np.float64)
+    year, month, day = customer_dob
+    if year is None:
+        return scores
+    year_ok = dob_year == year
+    scores[year_ok] = 50.0
+    if month is None:
+        return scores
+    month_ok = year_ok & (dob_month == month)
+    scores[month_ok] = 75.0
+    if day is None:
+        return scores
+    scores[month_ok & (dob_day == day)] = 100.0
+    return scores
+
+
+def weighted_final_scores(
+    name_scores: np.ndarray,
+    dob_scores: np.ndarray,
+    citizenship_scores: np.ndarray,
+    codes: np.ndarray,
+    weights: Sequence[tuple[float, float, float]],
+) -> np.ndarray:
+    """
+    Skor final per pasangan: w_name * name + w_dob * dob + w_cit * cit, dengan
+    (w_name, w_dob, w_cit) = `weights[code]`. Urutan operasi float sama dengan
+    versi skalar, dan komponen berbobot 0 tidak mengubah hasil, sehingga
+    nilainya identik dengan `combine_scores` / `compute_final_score`.
+    """
+    table = np.asarray(weights, dtype=np.float64)
+    w = table[codes]
+    return w[:, 0] * name_scores + w[:, 1] * dob_scores + w[:, 2] * citizenship_scores
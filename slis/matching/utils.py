@@ -1,3 +1,8 @@
+import re
+
+_COUNTRY_KEY_RE = re.compile(r"[^a-z0-9]")
+
+
 def normalize_and_compare(val1: str, val2: str) -> int:
     """
     Utility sederhana: bandingkan dua string (case-insensitive).
@@ -8,3 +13,10 @@ def normalize_and_compare(val1: str, val2: str) -> int:
     if not isinstance(val1, str) or not isinstance(val2, str) or not val1 or not val2:
         return 0
     return 100 if val1.strip().lower() == val2.strip().lower() else 0
+
+
+def country_key(value) -> str:
+    """Key pembanding citizenship/country: lowercase, hanya [a-z0-9] (ID, Indonesia -> id / indonesia)."""
+    if not value:
+        return ""
+    return _COUNTRY_KEY_RE.sub("", str(value).lower())
@@ -113,6 +113,8 @@ class SanctionEntity(Base):
 
     citizenship: Mapped[str | None] = mapped_column(Text)
     citizenship_normalized: Mapped[str | None] = mapped_column(Text)
+    # ISO-2 hasil `canonicalize_country(citizenship)` saat import
+    citizenship_iso2: Mapped[str | None] = mapped_column(String(2))
 
     country_of_birth: Mapped[str | None] = mapped_column(Text)
     country_of_residence: Mapped[str | None] = mapped_column(Text)
@@ -126,6 +128,9 @@ class SanctionEntity(Base):
     remarks: Mapped[str | None] = mapped_column(Text)
 
     is_active: Mapped[bool] = mapped_column(Boolean, default=True, nullable=False)
+    # Snapshot incremental yang menonaktifkan baris ini (hilang/berubah di file baru).
+    # Baris dengan penanda ini tidak ikut di-toggle bersama snapshot asalnya.
+    deactivated_by_snapshot_id: Mapped[int | None] = mapped_column(BigInteger, index=True)
     extra_data: Mapped[dict | None] = mapped_column(JSON)
 
     created_at: Mapped[datetime] = mapped_column(
@@ -217,11 +222,13 @@ class Transaction(Base):
     sender_name = Column(String(255), nullable=True)
     sender_name_normalized = Column(String(255), nullable=True)
     sender_country = Column(String(100), nullable=True)
+    sender_country_iso2 = Column(String(2), nullable=True)
     sender_dob = Column(String(50), nullable=True)
 
     receiver_name = Column(String(255), nullable=True)
     receiver_name_normalized = Column(String(255), nullable=True)
     receiver_country = Column(String(100), nullable=True)
+    receiver_country_iso2 = Column(String(2), nullable=True)
     receiver_dob = Column(String(50), nullable=True)
 
     amount = Column(Float, nullable=True)
@@ -232,6 +239,7 @@ class Transaction(Base):
 
     origin_city_code = Column(String(100), nullable=True)
     destination_country = Column(String(100), nullable=True)
+    destination_country_iso2 = Column(String(2), nullable=True)
     purpose_code = Column(String(255), nullable=True)
     frequency_raw = Column(String(50), nullable=True)
 
@@ -249,6 +257,10 @@ class Transaction(Base):
     )
 
 
+JOB_TYPE_FULL = "FULL"
+JOB_TYPE_DELTA = "DELTA"
+
+
 class ScreeningJob(Base):
     __tablename__ = "screening_job"
 
@@ -274,6 +286,16 @@ class ScreeningJob(Base):
 
     celery_task_id = Column(String(255), nullable=True)
 
+    # FULL: seluruh sanction aktif. DELTA: hanya entity dari snapshot > since_snapshot_id,
+    # hasilnya ditambahkan ke job induk (parent_job_id).
+    job_type = Column(String(20), default=JOB_TYPE_FULL, nullable=True)
+    since_snapshot_id = Column(Integer, nullable=True)
+    parent_job_id = Column(Integer, ForeignKey("screening_job.id"), nullable=True)
+
+    # Id transaksi terakhir yang hasilnya sudah ter-commit (ditulis di transaksi DB
+    # yang sama dengan flush hasil). Task yang dikirim ulang melanjutkan dari sini.
+    checkpoint_transaction_id = Column(Integer, nullable=True)
+
     # Relationships
     batch = relationship(
         "UploadBatch",
@@ -284,6 +306,72 @@ class ScreeningJob(Base):
         back_populates="job",
         cascade="all, delete-orphan",
     )
+    shards: Mapped[list["ScreeningJobShard"]] = relationship(
+        "ScreeningJobShard",
+        back_populates="job",
+        cascade="all, delete-orphan",
+    )
+    name_matches: Mapped[list["ScreeningNameMatch"]] = relationship(
+        "ScreeningNameMatch",
+        back_populates="job",
+        cascade="all, delete-orphan",
+    )
+
+
+class ScreeningJobShard(Base):
+    """
+    Satu shard job besar: transaksi batch dengan id di (after_id, upto_id].
+
+    Counter = kontribusi shard ke progress `screening_job` (di-commit bersama
+    hasil tiap chunk), supaya shard yang dikirim ulang bisa menarik kembali
+    kontribusinya sebelum screening ulang range-nya.
+    """
+
+    __tablename__ = "screening_job_shard"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("screening_job.id"), nullable=False, index=True)
+    after_id = Column(Integer, nullable=False)
+    upto_id = Column(Integer, nullable=False)
+
+    status = Column(String(50), default="PENDING")
+    processed_transactions = Column(Integer, default=0)
+    total_matches = Column(Integer, default=0)
+
+    job = relationship(
+        "ScreeningJob",
+        back_populates="shards",
+    )
+
+
+class ScreeningNameMatch(Base):
+    """
+    Staging hasil match per pasangan nama unik (nama, nama_normalized) satu job.
+
+    Di-fan-out ke `screening_result` dengan `INSERT ... SELECT` yang join ke
+    transaksi pada pasangan nama tsb (NULL disimpan sebagai ""); dihapus
+    setelah job selesai.
+    """
+
+    __tablename__ = "screening_name_match"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("screening_job.id"), nullable=False, index=True)
+    party_name = Column(String(255), nullable=False, default="")
+    party_name_normalized = Column(String(255), nullable=False, default="")
+
+    sanction_entity_id = Column(Integer, nullable=False)
+    sanction_source_id = Column(Integer, nullable=True)
+    name_score = Column(Float, nullable=True)
+    dob_score = Column(Float, nullable=True)
+    citizenship_score = Column(Float, nullable=True)
+    final_score = Column(Float, nullable=True)
+    geographic_insights = Column(JSON, nullable=True)
+
+    job = relationship(
+        "ScreeningJob",
+        back_populates="name_matches",
+    )
 
 
 class ScreeningResult(Base):
@@ -322,6 +410,9 @@ class ScreeningResult(Base):
     matched_dob_text = Column(String(255), nullable=True)
     matched_citizenship = Column(String(100), nullable=True)
 
+    # Provenance: id delta job yang menambahkan hasil ini (None = job itu sendiri)
+    delta_job_id = Column(Integer, nullable=True, index=True)
+
     created_at = Column(DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -3,7 +3,7 @@ from werkzeug.utils import secure_filename
 from datetime import datetime
 
 from slis.db import SessionLocal
-from slis.services.sanctions import import_sanction_file
+from slis.services.sanctions import SnapshotDependencyError, import_sanction_file, set_snapshot_active
 
 sanctions_bp = Blueprint("sanctions", __name__)
 
@@ -25,6 +25,7 @@ def import_sanction():
     filename = secure_filename(file.filename)
     version_label = request.form.get("version_label") or filename
     effective_date_str = request.form.get("effective_date")
+    incremental = str(request.form.get("incremental", "")).lower() in ("1", "true", "yes", "on")
 
     effective_date = None
     if effective_date_str:
@@ -35,22 +36,40 @@ def import_sanction():
 
     db = SessionLocal()
     try:
-        snapshot, _ = import_sanction_file(
+        snapshot, _, skipped = import_sanction_file(
             db=db,
             source_code=source_code,
             file_obj=file,
             filename=filename,
             version_label=version_label,
             effective_date=effective_date,
+            incremental=incremental,
         )
 
+        if skipped:
+            return jsonify(
+                {
+                    "status": "unchanged",
+                    "skipped": True,
+                    "message": "File identik dengan snapshot aktif; tidak ada yang di-import.",
+                    "snapshot_id": snapshot.id,
+                    "source_code": source_code,
+                    "raw_file_hash": snapshot.raw_file_hash,
+                    "diff": None,
+                }
+            )
+
         return jsonify(
             {
+                "status": "imported",
+                "skipped": False,
                 "snapshot_id": snapshot.id,
                 "source_code": source_code,
                 "version_label": snapshot.version_label,
                 "record_count": snapshot.record_count,
                 "raw_file_name": snapshot.raw_file_name,
+                "raw_file_hash": snapshot.raw_file_hash,
+                "diff": (snapshot.metadata_json or {}).get("diff"),
             }
         )
 
@@ -60,3 +79,35 @@ def import_sanction():
 
     finally:
         db.close()
+
+
+@sanctions_bp.route("/snapshots/<int:snapshot_id>/deactivate", methods=["POST"])
+def deactivate_snapshot(snapshot_id: int):
+    db = SessionLocal()
+    try:
+        snapshot = set_snapshot_active(db, snapshot_id, is_active=False)
+        return jsonify({"snapshot_id": snapshot.id, "is_active": snapshot.is_active})
+    except SnapshotDependencyError as e:
+        db.rollback()
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        db.rollback()
+        return jsonify({"error": str(e)}), 404
+    finally:
+        db.close()
+
+
+@sanctions_bp.route("/snapshots/<int:snapshot_id>/activate", methods=["POST"])
+def activate_snapshot(snapshot_id: int):
+    db = SessionLocal()
+    try:
+        snapshot = set_snapshot_active(db, snapshot_id, is_active=True)
+        return jsonify({"snapshot_id": snapshot.id, "is_active": snapshot.is_active})
+    except SnapshotDependencyError as e:
+        db.rollback()
+        return jsonify({"error": str(e)}), 409
+    except ValueError as e:
+        db.rollback()
+        return jsonify({"error": str(e)}), 404
+    finally:
+        db.close()
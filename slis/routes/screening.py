@@ -1,16 +1,24 @@
-from flask import Blueprint, request, jsonify
+import json
+import os
 from datetime import datetime, timezone
+from typing import Any, Iterator
+
+from flask import Blueprint, Response, request, jsonify, stream_with_context
 from celery.result import AsyncResult
 
 from slis.db import SessionLocal
 from slis.models import ScreeningJob, UploadBatch
 from slis.celery_app import celery_app
 
-from slis.services.screening import search_entities_bulk
+from slis.services.sanction_index import get_sanction_index
+from slis.services.screening import create_delta_jobs, search_bulk_queries, search_bulk_query, search_entities_bulk
 
 
 screening_bp = Blueprint("screening", __name__)
 
+# Jumlah query NDJSON yang di-buffer lalu di-score sekaligus di quick-search-stream
+STREAM_BATCH_SIZE = max(1, int(os.getenv("SLIS_QUICK_SEARCH_STREAM_BATCH", "200")))
+
 @screening_bp.route("/jobs", methods=["POST"])
 def create_screening_job():
    
@@ -58,6 +66,55 @@ def create_screening_job():
         db.close()
 
 
+@screening_bp.route("/jobs/delta", methods=["POST"])
+def create_delta_screening_jobs():
+    """
+    Re-screen batch lama hanya terhadap entity sanction baru/berubah.
+
+    Body: {"since_snapshot_id": int, "job_ids": [int, ...] (opsional), "created_by": str}
+    Hasil match ditambahkan ke job induk (screening_result.delta_job_id = id delta job).
+    """
+    data = request.get_json() or {}
+    since_snapshot_id = data.get("since_snapshot_id")
+    if since_snapshot_id is None:
+        return jsonify({"error": "since_snapshot_id is required"}), 400
+
+    db = SessionLocal()
+    try:
+        try:
+            jobs = create_delta_jobs(
+                db,
+                since_snapshot_id=int(since_snapshot_id),
+                job_ids=data.get("job_ids"),
+                created_by=data.get("created_by"),
+            )
+        except ValueError as e:
+            db.rollback()
+            return jsonify({"error": str(e)}), 404
+
+        created = []
+        for job in jobs:
+            async_result = celery_app.send_task(
+                "slis.run_screening_task",
+                args=[job.id],
+            )
+            job.celery_task_id = async_result.id
+            created.append(
+                {
+                    "job_id": job.id,
+                    "parent_job_id": job.parent_job_id,
+                    "batch_id": job.batch_id,
+                    "celery_task_id": async_result.id,
+                    "status": job.status,
+                }
+            )
+        db.commit()
+
+        return jsonify({"since_snapshot_id": int(since_snapshot_id), "jobs": created})
+    finally:
+        db.close()
+
+
 @screening_bp.route("/jobs/<int:job_id>/cancel", methods=["POST"])
 def cancel_screening_job(job_id: int):
     db = SessionLocal()
@@ -146,6 +203,10 @@ def get_screening_progress(job_id: int):
                 response["total"] = data.get('total', job.total_transactions)
                 response["percent"] = data.get('percent', job.progress_percentage)
                 response["matches"] = data.get('matches', job.total_matches)
+                if data.get('phase'):
+                    response["phase"] = data['phase']
+                    response["names_done"] = data.get('names_done')
+                    response["names_total"] = data.get('names_total')
             
             elif task.state == 'SUCCESS':
                 response["status"] = "SUCCESS"
@@ -187,4 +248,102 @@ def quick_search_bulk():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+class _InvalidQuery:
+    def __init__(self, error: str) -> None:
+        self.error = error
+
+
+def _iter_ndjson_queries(stream) -> Iterator[Any]:
+    """Query per baris NDJSON dibaca langsung dari body (tanpa buffer seluruh request)."""
+    for line_no, line in enumerate(iter(stream.readline, b""), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            yield _InvalidQuery(f"Invalid JSON at line {line_no}")
+
+
+def _stream_line(result: dict) -> str:
+    return json.dumps(result, ensure_ascii=False, default=str) + "\n"
+
+
+def _stream_batch(sanction_index, batch: list, thresholds: dict, limit: int) -> Iterator[str]:
+    """Score satu batch query sekaligus lalu satu baris NDJSON per query (urutan input)."""
+    try:
+        queries = [q for q in batch if isinstance(q, dict)]
+        scored = iter(search_bulk_queries(sanction_index, queries, thresholds, limit))
+    except Exception:
+        # Batch gagal -> score per query supaya error hanya menempel ke query penyebabnya
+        scored = None
+    for q in batch:
+        if isinstance(q, _InvalidQuery):
+            yield _stream_line({"request_id": None, "matches": [], "error": q.error})
+        elif not isinstance(q, dict):
+            yield _stream_line({"request_id": None, "matches": [], "error": "Query must be a JSON object"})
+        elif scored is not None:
+            yield _stream_line(next(scored))
+        else:
+            try:
+                yield _stream_line(search_bulk_query(sanction_index, q, thresholds, limit))
+            except Exception as e:
+                yield _stream_line({"request_id": q.get("id"), "matches": [], "error": str(e)})
+
+
+@screening_bp.route("/quick-search-stream", methods=["POST"])
+def quick_search_stream():
+    """
+    Bulk quick search streaming: query di-buffer per `SLIS_QUICK_SEARCH_STREAM_BATCH`
+    dan di-score sekaligus (`search_bulk_queries`); satu baris NDJSON hasil per
+    query dikirim begitu batch-nya selesai (memori tidak tumbuh dengan jumlah query).
+
+    Body: NDJSON (satu query `{"id", "name", "dob", "citizenship"}` per baris),
+    atau JSON array / `{"queries": [...], "threshold", "limit"}` bila
+    Content-Type `application/json`. `threshold` & `limit` juga bisa lewat query string.
+    """
+    options: dict = request.args
+    if request.is_json:
+        data = request.get_json(silent=True)
+        if isinstance(data, dict):
+            options = {**request.args.to_dict(), **data}
+            data = data.get("queries")
+        if not isinstance(data, list):
+            return jsonify({"error": "Body must be a JSON array or an object with a queries list"}), 400
+        queries: Any = iter(data)
+    else:
+        queries = _iter_ndjson_queries(request.stream)
+
+    try:
+        threshold = float(options.get("threshold", 60.0))
+        limit = int(options.get("limit", 10))
+    except (TypeError, ValueError):
+        return jsonify({"error": "threshold and limit must be numeric"}), 400
+
+    # Index aktif (ter-cache, mmap) di-resolve sekali; session tidak ditahan selama streaming
+    db = SessionLocal()
+    try:
+        sanction_index = get_sanction_index(db)
+    finally:
+        db.close()
+
+    thresholds = {"name": threshold - 10, "final": threshold}
+
+    def generate() -> Iterator[str]:
+        batch: list = []
+        for q in queries:
+            batch.append(q)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                yield from _stream_batch(sanction_index, batch, thresholds, limit)
+                batch = []
+        if batch:
+            yield from _stream_batch(sanction_index, batch, thresholds, limit)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-cache"},
+    )
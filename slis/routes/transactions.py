@@ -2,6 +2,7 @@ from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 
 from slis.db import SessionLocal
+from slis.models import Transaction
 from slis.services.transactions import create_transaction_batch
 
 transactions_bp = Blueprint("transactions", __name__)
@@ -25,7 +26,14 @@ def upload_transaction_txt():
         batch = create_transaction_batch(db, file, filename, created_by=created_by)
         
         sample_rows = []
-        for tx in batch.transactions[:5]:
+        sample_txs = (
+            db.query(Transaction)
+            .filter(Transaction.batch_id == batch.id)
+            .order_by(Transaction.id.asc())
+            .limit(5)
+            .all()
+        )
+        for tx in sample_txs:
             sample_rows.append(
                 {
                     "id": tx.id,
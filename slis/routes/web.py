@@ -86,15 +86,19 @@ def sanctions_upload():
             
             if file and file.filename != "":
                 try:
-                    _, count = import_sanction_file(
+                    _, count, skipped = import_sanction_file(
                         db=db,
                         source_code=source_code,
                         file_obj=file,
                         filename=file.filename,
                         version_label=request.form.get("version_label"),
-                        effective_date=None
+                        effective_date=None,
+                        incremental=bool(request.form.get("incremental")),
                     )
-                    flash(f"Sukses import {count} data sanction.", "success")
+                    if skipped:
+                        flash("File identik dengan snapshot aktif; tidak ada data yang di-import.", "info")
+                    else:
+                        flash(f"Sukses import {count} data sanction.", "success")
                     return redirect(url_for("web.index"))
                 except Exception as e:
                     db.rollback()
@@ -215,15 +219,19 @@ def sanctions_upload_reference():
                 return redirect(request.url)
 
             try:
-                _, count = import_sanction_file(
+                _, count, skipped = import_sanction_file(
                     db=db,
                     source_code=source_code,
                     file_obj=file,
                     filename=file.filename,
                     version_label=request.form.get("version_label"),
-                    effective_date=None
+                    effective_date=None,
+                    incremental=bool(request.form.get("incremental")),
                 )
-                flash(f"Sukses import {count} data sanction.", "success")
+                if skipped:
+                    flash("File identik dengan snapshot aktif; tidak ada data yang di-import.", "info")
+                else:
+                    flash(f"Sukses import {count} data sanction.", "success")
                 return redirect(url_for("web.index"))
             except Exception as e:
                 db.rollback()
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+from datetime import date, datetime
+from typing import Any, Callable, Iterable, Sequence
+
+from sqlalchemy import Table, insert
+from sqlalchemy.orm import Session
+
+from slis.models import ScreeningResult
+
+RESULT_FLUSH_SIZE = int(os.getenv("SLIS_RESULT_FLUSH_SIZE", "1000"))
+
+
+def _copy_text_value(val: Any) -> str:
+    """Encode satu nilai ke format COPY text (tab-delimited, NULL = \\N)."""
+    if val is None:
+        return "\\N"
+    if isinstance(val, bool):
+        return "t" if val else "f"
+    if isinstance(val, (dict, list)):
+        val = json.dumps(val, ensure_ascii=False)
+    elif isinstance(val, (datetime, date)):
+        val = val.isoformat()
+    elif isinstance(val, float):
+        val = repr(val)
+    else:
+        val = str(val)
+    return (
+        val.replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+def _supports_copy(db: Session) -> bool:
+    dialect = db.get_bind().dialect
+    return dialect.name == "postgresql" and dialect.driver == "psycopg2"
+
+
+def bulk_insert_rows(
+    db: Session,
+    table: Table,
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+) -> int:
+    """
+    Insert banyak baris (tuple urut `columns`) di transaksi session `db`.
+
+    - PostgreSQL (psycopg2): `COPY table (columns) FROM STDIN`
+    - Dialect lain (mis. SQLite untuk test): executemany via `INSERT`
+
+    Tidak commit; caller yang menentukan batas transaksi.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    if _supports_copy(db):
+        buf = io.StringIO()
+        for row in rows:
+            buf.write("\t".join(_copy_text_value(v) for v in row))
+            buf.write("\n")
+        buf.seek(0)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table.name} ({', '.join(columns)}) FROM STDIN",
+                buf,
+            )
+        finally:
+            cursor.close()
+    else:
+        db.execute(insert(table), [dict(zip(columns, row)) for row in rows])
+
+    return len(rows)
+
+
+class ScreeningResultSink:
+    """
+    Penampung hasil screening sebagai tuple, di-flush ke `screening_result`
+    dengan COPY (bukan `bulk_save_objects` ORM).
+
+    `add()` otomatis flush setiap `flush_size` baris (tanpa commit); panggil
+    `commit_chunk()` (atau `flush()` + `db.commit()`) di batas chunk.
+    """
+
+    COLUMNS = (
+        "job_id",
+        "transaction_id",
+        "sanction_entity_id",
+        "sanction_source_id",
+        "sanction_snapshot_id",
+        "target_role",
+        "target_name",
+        "target_name_normalized",
+        "target_country",
+        "sanction_name",
+        "sanction_name_normalized",
+        "sanction_dob_raw",
+        "sanction_citizenship",
+        "name_score",
+        "dob_score",
+        "citizenship_score",
+        "final_score",
+        "dob_match_type",
+        "weighting_scheme",
+        "weights_used",
+        "geographic_insights",
+        "matched_dob_text",
+        "matched_citizenship",
+        "delta_job_id",
+        "created_at",
+    )
+
+    def __init__(self, db: Session, flush_size: int | None = None) -> None:
+        self.db = db
+        self.flush_size = int(flush_size or RESULT_FLUSH_SIZE)
+        self.total_written = 0
+        self._rows: list[tuple] = []
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def add(self, **values: Any) -> None:
+        unknown = set(values) - set(self.COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown screening_result columns: {sorted(unknown)}")
+        values.setdefault("created_at", datetime.utcnow())
+        self._rows.append(tuple(values.get(c) for c in self.COLUMNS))
+        if len(self._rows) >= self.flush_size:
+            self.flush()
+
+    def flush(self) -> int:
+        if not self._rows:
+            return 0
+        written = bulk_insert_rows(self.db, ScreeningResult.__table__, self.COLUMNS, self._rows)
+        self.total_written += written
+        self._rows = []
+        return written
+
+    def commit_chunk(self, on_commit: Callable[[Session], None] | None = None) -> None:
+        """Flush + commit batas chunk; `on_commit(session)` ikut di transaksi yang sama."""
+        self.flush()
+        if on_commit is not None:
+            on_commit(self.db)
+        self.db.commit()
+
+    def close(self) -> None:
+        """Flush sisa baris dan commit (tidak ada worker di sink sinkron)."""
+        self.commit_chunk()
+
+    def abort(self) -> None:
+        """Buang baris yang belum di-flush (dipakai saat job gagal)."""
+        self._rows = []
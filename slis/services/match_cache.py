@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Sequence
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+# Tier 1: LRU per proses (dipakai bersama oleh semua job di worker yang sama)
+MATCH_CACHE_SIZE = int(os.getenv("SLIS_MATCH_CACHE_SIZE", "200000"))
+# Tier 2 (opsional): Redis, mis. broker Celery yang sudah jalan. Kosong = nonaktif.
+MATCH_CACHE_REDIS_URL = os.getenv("SLIS_MATCH_CACHE_REDIS_URL", "")
+MATCH_CACHE_TTL = int(os.getenv("SLIS_MATCH_CACHE_TTL", str(7 * 24 * 3600)))
+# Setelah error Redis, tier Redis dilewati selama sekian detik lalu dicoba lagi.
+MATCH_CACHE_REDIS_RETRY = float(os.getenv("SLIS_MATCH_CACHE_REDIS_RETRY", "60"))
+
+_REDIS_PREFIX = "slis:match"
+_MISSING = object()
+
+_lru_lock = threading.Lock()
+_lru: "OrderedDict[tuple[str, str, str], Any]" = OrderedDict()
+
+_redis_lock = threading.Lock()
+_redis_client: Any = None
+# time.monotonic() sampai kapan tier Redis dilewati (0 = aktif)
+_redis_retry_at = 0.0
+
+
+def _get_redis():
+    global _redis_client
+    if not MATCH_CACHE_REDIS_URL or redis is None or time.monotonic() < _redis_retry_at:
+        return None
+    if _redis_client is None:
+        with _redis_lock:
+            if _redis_client is None:
+                _redis_client = redis.Redis.from_url(MATCH_CACHE_REDIS_URL)
+    return _redis_client
+
+
+def _disable_redis(exc: Exception) -> None:
+    """Lewati tier Redis sementara (`MATCH_CACHE_REDIS_RETRY` detik) setelah error."""
+    global _redis_retry_at
+    _redis_retry_at = time.monotonic() + MATCH_CACHE_REDIS_RETRY
+    logger.warning(
+        "Match cache Redis tier dinonaktifkan %.0f detik: %s", MATCH_CACHE_REDIS_RETRY, exc
+    )
+
+
+def clear_match_cache() -> None:
+    """Kosongkan tier LRU proses ini (entry Redis kedaluwarsa sendiri via TTL)."""
+    with _lru_lock:
+        _lru.clear()
+
+
+class MatchCache:
+    """
+    Cache hasil `best_match_batch_normed` per nama ter-normalisasi.
+
+    Key = (nama normal, key index sanction, threshold nama[, top-K]). Karena
+    key index berubah setiap snapshot set aktif berubah, entry lama otomatis
+    tidak terpakai lagi; `index` di hasil selalu valid untuk index dengan key tsb.
+
+    `top_k` > 1: yang di-cache adalah list K match terbaik
+    (`top_k_batch_normed`), lewat `top_matches`.
+
+    Satu instance dibuat per job (counter hit/miss per job); storage-nya
+    dipakai bersama lintas job.
+    """
+
+    def __init__(self, index_key: str, threshold: float, top_k: int = 1) -> None:
+        self.index_key = index_key
+        self.top_k = max(1, int(top_k))
+        self.threshold = f"{float(threshold):g}"
+        self._variant = self.threshold if self.top_k == 1 else f"{self.threshold}:top{self.top_k}"
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+
+    def _redis_key(self, name_norm: str) -> str:
+        return f"{_REDIS_PREFIX}:{self.index_key}:{self._variant}:{name_norm}"
+
+    def _lru_get(self, name_norm: str) -> Any:
+        key = (self.index_key, self._variant, name_norm)
+        with _lru_lock:
+            value = _lru.get(key, _MISSING)
+            if value is not _MISSING:
+                _lru.move_to_end(key)
+            return value
+
+    def _lru_put(self, name_norm: str, value: Any) -> None:
+        if MATCH_CACHE_SIZE <= 0:
+            return
+        key = (self.index_key, self._variant, name_norm)
+        with _lru_lock:
+            _lru[key] = value
+            _lru.move_to_end(key)
+            while len(_lru) > MATCH_CACHE_SIZE:
+                _lru.popitem(last=False)
+
+    def _redis_get_many(self, names: Sequence[str]) -> dict[str, Any]:
+        client = _get_redis()
+        if client is None or not names:
+            return {}
+        try:
+            raw = client.mget([self._redis_key(n) for n in names])
+        except Exception as e:
+            _disable_redis(e)
+            return {}
+        return {n: json.loads(v) for n, v in zip(names, raw) if v is not None}
+
+    def _redis_put_many(self, values: dict[str, Any]) -> None:
+        client = _get_redis()
+        if client is None or not values:
+            return
+        try:
+            pipe = client.pipeline(transaction=False)
+            for name_norm, value in values.items():
+                pipe.set(self._redis_key(name_norm), json.dumps(value), ex=MATCH_CACHE_TTL)
+            pipe.execute()
+        except Exception as e:
+            _disable_redis(e)
+
+    def _cached(self, queries_norm: Sequence[str], compute: Callable[[list[str]], list[Any]]) -> list[Any]:
+        found: dict[str, Any] = {}
+        pending: list[str] = []
+        for name_norm in dict.fromkeys(queries_norm):
+            value = self._lru_get(name_norm)
+            if value is _MISSING:
+                pending.append(name_norm)
+            else:
+                found[name_norm] = value
+
+        if pending:
+            from_redis = self._redis_get_many(pending)
+            for name_norm, value in from_redis.items():
+                found[name_norm] = value
+                self._lru_put(name_norm, value)
+            self.redis_hits += len(from_redis)
+            pending = [n for n in pending if n not in from_redis]
+
+        if pending:
+            computed = dict(zip(pending, compute(pending)))
+            for name_norm, value in computed.items():
+                self._lru_put(name_norm, value)
+            self._redis_put_many(computed)
+            found.update(computed)
+
+        self.misses += len(pending)
+        self.hits += len(queries_norm) - len(pending)
+        return [found[n] for n in queries_norm]
+
+    def best_matches(self, matcher, queries_norm: Sequence[str]) -> list[dict[str, Any] | None]:
+        """
+        Sama dengan `matcher.best_match_batch_normed(queries_norm, threshold)`,
+        tapi nama yang sudah pernah di-match (di job mana pun) tidak di-score ulang.
+        """
+        if self.top_k != 1:
+            return [hits[0] if hits else None for hits in self.top_matches(matcher, queries_norm)]
+        return self._cached(
+            queries_norm,
+            lambda pending: matcher.best_match_batch_normed(pending, threshold=float(self.threshold)),
+        )
+
+    def top_matches(self, matcher, queries_norm: Sequence[str]) -> list[list[dict[str, Any]]]:
+        """List `top_k` match terbaik per nama (`[best]` / `[]` bila `top_k` = 1), ter-cache."""
+        if self.top_k == 1:
+            return [[best] if best else [] for best in self.best_matches(matcher, queries_norm)]
+        return self._cached(
+            queries_norm,
+            lambda pending: matcher.top_k_batch_normed(pending, k=self.top_k, threshold=float(self.threshold)),
+        )
+
+    def stats(self) -> dict[str, int]:
+        return {"hits": self.hits, "redis_hits": self.redis_hits, "misses": self.misses}
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+import logging
+import os
+import queue
+import threading
+from typing import Any, Callable, Iterator
+
+from sqlalchemy.orm import Session
+
+from slis.models import ScreeningResult
+from slis.services.bulk import ScreeningResultSink, bulk_insert_rows
+from slis.services.transactions import iter_transaction_chunks
+
+logger = logging.getLogger(__name__)
+
+# Kedalaman antrean pipeline (chunk yang boleh "in flight" per stage). 0 = sekuensial.
+PIPELINE_DEPTH = int(os.getenv("SLIS_PIPELINE_DEPTH", "0"))
+
+_END = object()
+_POLL_SECONDS = 0.1
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+def _put(q: "queue.Queue[Any]", item: Any, stop: threading.Event) -> bool:
+    """`put` dengan backpressure yang tetap bisa dibatalkan; False bila `stop` di-set."""
+    while not stop.is_set():
+        try:
+            q.put(item, timeout=_POLL_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+class TransactionChunkReader:
+    """
+    Stage 1: thread reader dengan session sendiri yang mem-prefetch chunk
+    transaksi (keyset pagination) ke antrean berukuran `depth`.
+
+    Dipakai sebagai iterator; `close()` menghentikan thread (mis. saat job
+    di-cancel) tanpa menunggu sisa batch terbaca.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_id: int,
+        depth: int,
+        **chunk_kwargs: Any,
+    ) -> None:
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(depth)))
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(session_factory, batch_id, chunk_kwargs),
+            name=f"slis-reader-{batch_id}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self, session_factory: Callable[[], Session], batch_id: int, chunk_kwargs: dict) -> None:
+        db = session_factory()
+        try:
+            for chunk in iter_transaction_chunks(db, batch_id, **chunk_kwargs):
+                # Akhiri transaksi baca setiap chunk (tidak menahan lock / idle-in-transaction)
+                db.commit()
+                if not _put(self._queue, chunk, self._stop):
+                    return
+            _put(self._queue, _END, self._stop)
+        except BaseException as e:
+            _put(self._queue, _Failure(e), self._stop)
+        finally:
+            db.close()
+
+    def __iter__(self) -> Iterator[list[Any]]:
+        while True:
+            item = self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failure):
+                raise item.exc
+            yield item
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+
+class PipelinedResultSink(ScreeningResultSink):
+    """
+    Stage 3: `ScreeningResultSink` yang menulis lewat thread writer dengan
+    session sendiri. `commit_chunk()` hanya meng-antre baris chunk (blok bila
+    antrean penuh = backpressure); writer menjalankan COPY + `on_commit` +
+    commit per chunk. Error writer dilempar ulang di thread pemanggil.
+    """
+
+    def __init__(
+        self,
+        db: Session,
+        session_factory: Callable[[], Session],
+        depth: int,
+    ) -> None:
+        super().__init__(db)
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, int(depth)))
+        self._stop = threading.Event()
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(session_factory,),
+            name="slis-writer",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _run(self, session_factory: Callable[[], Session]) -> None:
+        db = session_factory()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    if self._stop.is_set():
+                        return
+                    continue
+                if item is _END or self._stop.is_set():
+                    return
+                rows, on_commit = item
+                try:
+                    written = bulk_insert_rows(db, ScreeningResult.__table__, self.COLUMNS, rows)
+                    if on_commit is not None:
+                        on_commit(db)
+                    db.commit()
+                    self.total_written += written
+                except BaseException as e:
+                    db.rollback()
+                    self._error = e
+                    self._stop.set()
+                    return
+        finally:
+            db.close()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def flush(self) -> int:
+        # Tidak ada auto-flush di thread pemanggil: baris dikirim ke writer per chunk lewat commit_chunk()
+        return 0
+
+    def commit_chunk(self, on_commit: Callable[[Session], None] | None = None) -> None:
+        self._raise_if_failed()
+        rows, self._rows = self._rows, []
+        if rows or on_commit is not None:
+            if not _put(self._queue, (rows, on_commit), self._stop):
+                self._raise_if_failed()
+        # Session utama hanya dipakai untuk baca (cek cancel); jangan biarkan transaksinya terbuka
+        self.db.commit()
+
+    def close(self) -> None:
+        """Kirim sisa baris, tunggu writer selesai menulis semua chunk, lalu lempar error bila ada."""
+        if self._thread.is_alive():
+            if self._rows:
+                self.commit_chunk()
+            _put(self._queue, _END, self._stop)
+            self._thread.join()
+        self._raise_if_failed()
+
+    def abort(self) -> None:
+        """Hentikan writer tanpa menulis chunk yang masih di antrean."""
+        self._stop.set()
+        self._thread.join()
+
+
+def open_transaction_chunks(db: Session, session_factory, batch_id: int, depth: int = PIPELINE_DEPTH, **chunk_kwargs: Any):
+    """Sumber chunk transaksi: reader thread bila `depth` > 0, selain itu generator sinkron."""
+    if depth > 0:
+        return TransactionChunkReader(session_factory, batch_id, depth, **chunk_kwargs)
+    return iter_transaction_chunks(db, batch_id, **chunk_kwargs)
+
+
+def open_result_sink(db: Session, session_factory, depth: int = PIPELINE_DEPTH) -> ScreeningResultSink:
+    """Sink hasil: writer thread bila `depth` > 0, selain itu `ScreeningResultSink` sinkron."""
+    if depth > 0:
+        return PipelinedResultSink(db, session_factory, depth)
+    return ScreeningResultSink(db)
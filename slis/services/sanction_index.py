@@ -0,0 +1,498 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from slis.matching.dob import (
+    NO_DOB,
+    DobParts,
+    YearEntry,
+    is_flexible_year_source,
+    parse_dob_parts,
+    parse_sanction_years,
+)
+from slis.matching.columns import ChainedStrings, StringColumn, load_array, save_array
+from slis.matching.names import HybridMatcher, normalize_name
+from slis.matching.geo import country_match_key
+from slis.matching.ngram import NgramIndex
+from slis.models import (
+    JOB_TYPE_DELTA,
+    SanctionAlias,
+    SanctionEntity,
+    SanctionSnapshot,
+    SanctionSource,
+    ScreeningJob,
+)
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 5
+
+# Direktori bersama (volume yang sama untuk web & worker) tempat index sanction disimpan.
+SANCTION_INDEX_DIR = Path(
+    os.getenv(
+        "SLIS_SANCTION_INDEX_DIR",
+        str(Path(__file__).resolve().parents[2] / "instance" / "sanction_index"),
+    )
+)
+
+_INT_COLUMNS = ("id", "source_id", "snapshot_id")
+# DOB sanksi ter-parse sekali saat build (parser matching, -1 = tidak ada) dan
+# daftar tahun/rentang untuk sumber Australia dalam bentuk CSR per baris.
+_DOB_COLUMNS = ("dob_year", "dob_month", "dob_day")
+_DOB_YEAR_COLUMNS = ("dob_years_offsets", "dob_years_min", "dob_years_max", "dob_years_is_range", "dob_flexible")
+# Citizenship sebagai kode integer (0 = kosong) atas vocabulary `country_match_key`
+# (ISO-2 kanonik) untuk scoring kolumnar (perbandingan integer, bukan string per pasangan).
+_CODE_COLUMNS = ("citizenship_code",)
+_ARRAY_COLUMNS = _INT_COLUMNS + _DOB_COLUMNS + _DOB_YEAR_COLUMNS + _CODE_COLUMNS
+_STR_COLUMNS = (
+    "name",
+    "name_norm",
+    "match_norm",
+    "dob_raw",
+    "citizenship",
+    "citizenship_norm",
+    "source_code",
+)
+
+
+def active_snapshot_key(db: Session) -> str:
+    """Fingerprint sanction set aktif: hash dari id (+updated_at) snapshot aktif."""
+    rows = (
+        db.query(SanctionSnapshot.id, SanctionSnapshot.updated_at)
+        .filter(SanctionSnapshot.is_active.is_(True))
+        .order_by(SanctionSnapshot.id.asc())
+        .all()
+    )
+    payload = f"v{INDEX_FORMAT_VERSION}|" + ",".join(
+        f"{sid}:{updated.isoformat() if updated else ''}" for sid, updated in rows
+    )
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class SanctionIndex:
+    """Sanction list aktif dalam bentuk kolom (numpy/mmap) + matcher siap pakai.
+
+    Satu baris = satu `SanctionEntity` aktif (urut id). Kolom string disimpan
+    sebagai `StringColumn` dan kolom integer sebagai array numpy; saat di-load
+    dari disk semuanya di-mmap read-only sehingga N proses worker/gunicorn
+    berbagi page cache yang sama.
+
+    Alias (`SanctionAlias`) disimpan terpisah sebagai `alias_norm` (packed) +
+    `alias_owner` (baris entity, int32). Tabel nama matcher = nama utama semua
+    entity diikuti alias; `index` hasil match selalu baris entity (alias
+    terbaik per entity).
+    """
+
+    def __init__(
+        self,
+        key: str,
+        columns: dict[str, Any],
+        ngram: NgramIndex,
+        first_idx: np.ndarray,
+        alias_norm: StringColumn | None = None,
+        alias_owner: np.ndarray | None = None,
+        citizenship_keys: StringColumn | None = None,
+    ) -> None:
+        self.key = key
+        self.columns = columns
+        # citizenship_keys[code] = `country_match_key` untuk kode citizenship tsb (kode 0 = "")
+        self.citizenship_keys = citizenship_keys if citizenship_keys is not None else StringColumn.from_values([""])
+        self._citizenship_code_of: dict[str, int] | None = None
+        self.ngram = ngram
+        # first_idx[i] = baris pertama dengan match_norm yang sama (untuk dedup nama)
+        self.first_idx = first_idx
+        self.alias_norm = alias_norm if alias_norm is not None else StringColumn.from_values([])
+        self.alias_owner = alias_owner if alias_owner is not None else np.empty(0, dtype=np.int32)
+
+        name_owner = None
+        if len(self.alias_owner):
+            name_owner = np.concatenate((np.arange(len(self), dtype=np.int32), self.alias_owner.astype(np.int32)))
+        self.matcher = HybridMatcher.from_normed(
+            self.match_names(columns["match_norm"], self.alias_norm),
+            ngram_index=ngram,
+            name_owner=name_owner,
+        )
+
+    @staticmethod
+    def match_names(match_norm, alias_norm):
+        """Tabel nama untuk matcher/n-gram: nama utama lalu alias (tanpa copy)."""
+        return ChainedStrings(match_norm, alias_norm) if len(alias_norm) else match_norm
+
+    def __len__(self) -> int:
+        return int(len(self.columns["id"]))
+
+    @property
+    def alias_count(self) -> int:
+        return int(len(self.alias_owner))
+
+    @property
+    def unique_count(self) -> int:
+        return int(np.count_nonzero(self.first_idx == np.arange(len(self), dtype=self.first_idx.dtype)))
+
+    def is_first(self, idx: int) -> bool:
+        return int(self.first_idx[idx]) == int(idx)
+
+    def citizenship_code(self, value: Any, iso2: str | None = None) -> int:
+        """Kode citizenship untuk nilai query (0 = kosong, -1 = tidak ada di index)."""
+        key = country_match_key(value, iso2)
+        if not key:
+            return 0
+        if self._citizenship_code_of is None:
+            self._citizenship_code_of = {k: i for i, k in enumerate(self.citizenship_keys)}
+        return self._citizenship_code_of.get(key, -1)
+
+    def citizenship_key(self, idx: int) -> str:
+        """`country_match_key` citizenship baris `idx` ("" = kosong)."""
+        return self.citizenship_keys[int(self.columns["citizenship_code"][idx])]
+
+    def has_dob_raw(self, rows: np.ndarray) -> np.ndarray:
+        """Mask baris dengan `dob_raw` tidak kosong."""
+        return self.columns["dob_raw"].non_empty(rows)
+
+    def dob_parts(self, idx: int) -> DobParts:
+        """(year, month, day) DOB sanksi baris `idx` (hasil `parse_dob_parts`)."""
+        c = self.columns
+        parts = (int(c["dob_year"][idx]), int(c["dob_month"][idx]), int(c["dob_day"][idx]))
+        if parts == (-1, -1, -1):
+            return NO_DOB
+        return tuple(v if v >= 0 else None for v in parts)  # type: ignore[return-value]
+
+    def dob_years(self, idx: int) -> tuple[YearEntry, ...]:
+        """Daftar tahun/rentang DOB (hanya sumber Australia; lainnya kosong)."""
+        c = self.columns
+        start, end = int(c["dob_years_offsets"][idx]), int(c["dob_years_offsets"][idx + 1])
+        return tuple(
+            (int(lo), int(hi), bool(is_range))
+            for lo, hi, is_range in zip(
+                c["dob_years_min"][start:end], c["dob_years_max"][start:end], c["dob_years_is_range"][start:end]
+            )
+        )
+
+    def row(self, idx: int) -> dict[str, Any]:
+        """Metadata satu sanction entity (format dict yang dipakai screening job)."""
+        c = self.columns
+        snapshot_id = int(c["snapshot_id"][idx])
+        return {
+            "id": int(c["id"][idx]),
+            "source_id": int(c["source_id"][idx]),
+            "snapshot_id": snapshot_id if snapshot_id >= 0 else None,
+            "primary_name": c["name"][idx],
+            "name": c["name"][idx],
+            "name_norm": c["name_norm"][idx],
+            "match_norm": c["match_norm"][idx],
+            "dob_raw": c["dob_raw"][idx],
+            "citizenship": c["citizenship"][idx],
+            "citizenship_norm": c["citizenship_norm"][idx],
+            "source_code": c["source_code"][idx],
+        }
+
+    @classmethod
+    def from_db(
+        cls,
+        db: Session,
+        key: str | None = None,
+        limit: int | None = None,
+        since_snapshot_id: int | None = None,
+    ) -> "SanctionIndex":
+        """Load semua SanctionEntity aktif dalam satu query kolom (tanpa ORM object).
+
+        `since_snapshot_id`: hanya entity dari snapshot dengan id lebih besar
+        (entity baru/berubah sejak snapshot tsb; dipakai delta job).
+        """
+        key = key or active_snapshot_key(db)
+        if since_snapshot_id is not None:
+            key = f"{key}-since{int(since_snapshot_id)}"
+        if limit:
+            key = f"{key}-limit{int(limit)}"
+        q = (
+            db.query(
+                SanctionEntity.id,
+                SanctionEntity.source_id,
+                SanctionEntity.snapshot_id,
+                SanctionEntity.primary_name,
+                SanctionEntity.primary_name_normalized,
+                SanctionEntity.date_of_birth_raw,
+                SanctionEntity.citizenship,
+                SanctionEntity.citizenship_normalized,
+                SanctionEntity.citizenship_iso2,
+                SanctionSource.code,
+            )
+            .outerjoin(SanctionSource, SanctionEntity.source_id == SanctionSource.id)
+            .filter(SanctionEntity.is_active.is_(True))
+            .order_by(SanctionEntity.id.asc())
+        )
+        if since_snapshot_id is not None:
+            q = q.filter(SanctionEntity.snapshot_id > since_snapshot_id)
+        if limit:
+            q = q.limit(limit)
+
+        ids: list[int] = []
+        source_ids: list[int] = []
+        snapshot_ids: list[int] = []
+        values: dict[str, list[str | None]] = {name: [] for name in _STR_COLUMNS}
+        citizenship_iso2s: list[str | None] = []
+        for (
+            ent_id,
+            source_id,
+            snapshot_id,
+            primary_name,
+            primary_name_normalized,
+            dob_raw,
+            citizenship,
+            citizenship_normalized,
+            citizenship_iso2,
+            source_code,
+        ) in q.yield_per(10000):
+            match_norm = normalize_name(str(primary_name or ""))
+            ids.append(int(ent_id))
+            source_ids.append(int(source_id))
+            snapshot_ids.append(int(snapshot_id) if snapshot_id is not None else -1)
+            values["name"].append(primary_name)
+            values["name_norm"].append(primary_name_normalized or match_norm)
+            values["match_norm"].append(match_norm)
+            values["dob_raw"].append(dob_raw)
+            values["citizenship"].append(citizenship)
+            values["citizenship_norm"].append(
+                citizenship_normalized or (str(citizenship).lower().strip() if citizenship else None)
+            )
+            values["source_code"].append(source_code or "UNKNOWN")
+            citizenship_iso2s.append(citizenship_iso2)
+
+        columns: dict[str, Any] = {
+            "id": np.asarray(ids, dtype=np.int64),
+            "source_id": np.asarray(source_ids, dtype=np.int64),
+            "snapshot_id": np.asarray(snapshot_ids, dtype=np.int64),
+        }
+        for name in _STR_COLUMNS:
+            columns[name] = StringColumn.from_values(values[name])
+        columns.update(_dob_columns(values["dob_raw"], values["source_code"]))
+        citizenship_codes, citizenship_keys = _citizenship_codes(values["citizenship"], citizenship_iso2s)
+        columns["citizenship_code"] = citizenship_codes
+
+        first_seen: dict[str, int] = {}
+        first_idx = np.fromiter(
+            (first_seen.setdefault(norm, i) for i, norm in enumerate(values["match_norm"])),
+            dtype=np.int32,
+            count=len(ids),
+        )
+        alias_norm, alias_owner = _load_aliases(db, columns["id"], values["match_norm"], since_snapshot_id)
+        ngram = NgramIndex.build(cls.match_names(values["match_norm"], alias_norm))
+        return cls(key, columns, ngram, first_idx, alias_norm, alias_owner, citizenship_keys)
+
+    def save(self, directory: Path) -> None:
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in _ARRAY_COLUMNS:
+            save_array(directory, name, self.columns[name])
+        for name in _STR_COLUMNS:
+            self.columns[name].save(directory, name)
+        save_array(directory, "first_idx", self.first_idx)
+        self.alias_norm.save(directory, "alias_norm")
+        self.citizenship_keys.save(directory, "citizenship_keys")
+        save_array(directory, "alias_owner", self.alias_owner)
+        self.ngram.save(directory)
+        meta = {
+            "format_version": INDEX_FORMAT_VERSION,
+            "key": self.key,
+            "count": len(self),
+            "alias_count": self.alias_count,
+            "built_at": datetime.now(timezone.utc).isoformat(),
+        }
+        (directory / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True) -> "SanctionIndex":
+        meta = json.loads((directory / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("format_version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported sanction index format: {meta.get('format_version')}")
+        columns: dict[str, Any] = {name: load_array(directory, name, mmap) for name in _ARRAY_COLUMNS}
+        for name in _STR_COLUMNS:
+            columns[name] = StringColumn.load(directory, name, mmap)
+        return cls(
+            meta["key"],
+            columns,
+            NgramIndex.load(directory, mmap=mmap),
+            load_array(directory, "first_idx", mmap),
+            StringColumn.load(directory, "alias_norm", mmap),
+            load_array(directory, "alias_owner", mmap),
+            StringColumn.load(directory, "citizenship_keys", mmap),
+        )
+
+
+def _dob_columns(dob_raws: list[str | None], source_codes: list[str]) -> dict[str, np.ndarray]:
+    """Parse DOB sanksi sekali (parser ter-memoize, per string unik) ke array kolom."""
+    n = len(dob_raws)
+    parsed = np.full((n, 3), -1, dtype=np.int16)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    flexible = np.fromiter((is_flexible_year_source(code) for code in source_codes), dtype=bool, count=n)
+    years: list[YearEntry] = []
+    for i, dob_raw in enumerate(dob_raws):
+        if dob_raw:
+            dob_raw = str(dob_raw)
+            parsed[i] = [-1 if v is None else v for v in parse_dob_parts(dob_raw)]
+            if flexible[i]:
+                years.extend(parse_sanction_years(dob_raw))
+        offsets[i + 1] = len(years)
+    return {
+        "dob_year": parsed[:, 0].copy(),
+        "dob_month": parsed[:, 1].copy(),
+        "dob_day": parsed[:, 2].copy(),
+        "dob_years_offsets": offsets,
+        "dob_years_min": np.asarray([y[0] for y in years], dtype=np.int16),
+        "dob_years_max": np.asarray([y[1] for y in years], dtype=np.int16),
+        "dob_years_is_range": np.asarray([y[2] for y in years], dtype=bool),
+        "dob_flexible": flexible,
+    }
+
+
+def _citizenship_codes(
+    citizenships: list[str | None],
+    iso2s: list[str | None],
+) -> tuple[np.ndarray, StringColumn]:
+    """
+    Faktorisasi `country_match_key` citizenship -> (kode per baris, vocabulary;
+    kode 0 = ""). ISO-2 tersimpan dipakai langsung; entity lama (kolom ISO-2
+    masih NULL) di-canonicalize di sini.
+    """
+    code_of: dict[str, int] = {"": 0}
+    codes = np.fromiter(
+        (code_of.setdefault(country_match_key(v, iso2), len(code_of)) for v, iso2 in zip(citizenships, iso2s)),
+        dtype=np.int32,
+        count=len(citizenships),
+    )
+    return codes, StringColumn.from_values(list(code_of))
+
+
+def _load_aliases(
+    db: Session,
+    entity_ids: np.ndarray,
+    match_norms: list[str],
+    since_snapshot_id: int | None = None,
+) -> tuple[StringColumn, np.ndarray]:
+    """Alias entity di index dalam satu query -> (alias_norm, alias_owner).
+
+    Alias kosong setelah normalisasi, sama dengan nama utama, atau duplikat
+    untuk entity yang sama dilewati. Entity yang tidak ada di index (mis.
+    karena `limit`) diabaikan.
+    """
+    q = (
+        db.query(SanctionAlias.entity_id, SanctionAlias.alias_name)
+        .join(SanctionEntity, SanctionAlias.entity_id == SanctionEntity.id)
+        .filter(SanctionEntity.is_active.is_(True))
+        .order_by(SanctionAlias.entity_id.asc(), SanctionAlias.id.asc())
+    )
+    if since_snapshot_id is not None:
+        q = q.filter(SanctionEntity.snapshot_id > since_snapshot_id)
+
+    norms: list[str] = []
+    owners: list[int] = []
+    seen: set[tuple[int, str]] = set()
+    n = len(entity_ids)
+    for entity_id, alias_name in q.yield_per(10000):
+        row = int(np.searchsorted(entity_ids, int(entity_id)))
+        if row >= n or int(entity_ids[row]) != int(entity_id):
+            continue
+        norm = normalize_name(str(alias_name or ""))
+        if not norm or norm == match_norms[row] or (row, norm) in seen:
+            continue
+        seen.add((row, norm))
+        norms.append(norm)
+        owners.append(row)
+    return StringColumn.from_values(norms), np.asarray(owners, dtype=np.int32)
+
+
+def build_sanction_index(db: Session, key: str | None = None) -> Path:
+    """Build step: tulis index sanction aktif ke `SANCTION_INDEX_DIR/<key>/`.
+
+    Ditulis ke direktori sementara lalu di-rename (atomic), sehingga proses
+    lain tidak pernah membaca index setengah jadi. Index lama dihapus; proses
+    yang masih me-mmap file lama tetap aman (inode dilepas setelah unmap).
+    """
+    key = key or active_snapshot_key(db)
+    target = SANCTION_INDEX_DIR / key
+    if (target / "meta.json").exists():
+        return target
+
+    SANCTION_INDEX_DIR.mkdir(parents=True, exist_ok=True)
+    tmp = SANCTION_INDEX_DIR / f".tmp-{key}-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+
+    index = SanctionIndex.from_db(db, key=key)
+    index.save(tmp)
+    try:
+        os.rename(tmp, target)
+    except OSError:
+        # Proses lain sudah lebih dulu mem-publish index dengan key yang sama.
+        shutil.rmtree(tmp, ignore_errors=True)
+
+    for old in SANCTION_INDEX_DIR.iterdir():
+        if old.name != key and not old.name.startswith(".tmp-"):
+            shutil.rmtree(old, ignore_errors=True)
+
+    logger.info(
+        "Sanction index %s ditulis (%s entity, %s alias) ke %s", key, len(index), index.alias_count, target
+    )
+    return target
+
+
+def load_sanction_index(db: Session, key: str | None = None) -> SanctionIndex:
+    """Index sanction aktif, di-mmap dari disk (build dulu bila belum ada)."""
+    key = key or active_snapshot_key(db)
+    try:
+        path = build_sanction_index(db, key=key)
+        return SanctionIndex.load(path, mmap=True)
+    except OSError as e:
+        logger.warning("Sanction index tidak bisa disimpan di %s (%s); build in-memory.", SANCTION_INDEX_DIR, e)
+        return SanctionIndex.from_db(db, key=key)
+
+
+# Cache per proses: index + matcher tetap hangat antar request/job selama
+# snapshot set aktif tidak berubah.
+_cache_lock = threading.Lock()
+_cached_index: SanctionIndex | None = None
+
+
+def get_sanction_index(db: Session) -> SanctionIndex:
+    """Index sanction aktif dari cache proses.
+
+    Setiap panggilan hanya menjalankan probe versi (`active_snapshot_key`,
+    satu query kecil ke `sanction_snapshot`); index di-load ulang hanya bila
+    ada snapshot yang di-import / dinonaktifkan / di-update.
+    """
+    global _cached_index
+    key = active_snapshot_key(db)
+    cached = _cached_index
+    if cached is not None and cached.key == key:
+        return cached
+
+    with _cache_lock:
+        cached = _cached_index
+        if cached is not None and cached.key == key:
+            return cached
+        index = load_sanction_index(db, key=key)
+        _cached_index = index
+        return index
+
+
+def get_job_sanction_index(db: Session, job: ScreeningJob) -> SanctionIndex:
+    """Index untuk satu screening job: DELTA -> index kecil in-memory, lainnya index aktif ter-cache."""
+    if job.job_type == JOB_TYPE_DELTA:
+        return SanctionIndex.from_db(db, since_snapshot_id=job.since_snapshot_id or 0)
+    return get_sanction_index(db)
+
+
+def invalidate_sanction_index_cache() -> None:
+    """Buang index dari cache proses ini (dipanggil setelah import/deaktivasi snapshot)."""
+    global _cached_index
+    with _cache_lock:
+        _cached_index = None
@@ -1,13 +1,20 @@
 from __future__ import annotations
 
 import csv
+import hashlib
+import json
 from datetime import datetime
+from itertools import repeat
 from typing import IO, Dict, Any, Tuple, List
 
 import pandas as pd
+from sqlalchemy import or_, select
 from sqlalchemy.orm import Session
 
+from slis.matching.geo import canonicalize_country_series
 from slis.models import SanctionSource, SanctionSnapshot, SanctionEntity
+from slis.services.bulk import bulk_insert_rows
+from slis.services.sanction_index import invalidate_sanction_index_cache
 import re
 
 
@@ -20,6 +27,18 @@ def normalize_name(name: str | None) -> str | None:
     return name or None
 
 
+def normalize_name_series(names: pd.Series) -> pd.Series:
+    """Versi vektor dari `normalize_name` (input string; hasil kosong -> None)."""
+    s = names.astype(str).str.lower().str.strip()
+    s = s.str.replace(r"[^a-z0-9\s]", "", regex=True)
+    s = s.str.replace(r"\s+", " ", regex=True)
+    return _none_if_empty(s)
+
+
+def _none_if_empty(values: pd.Series) -> pd.Series:
+    return values.astype(object).where(values != "", None)
+
+
 def parse_dob(dob_str: str | None) -> Tuple[int | None, int | None, int | None]:
     """
     Versi simple parser DOB:
@@ -77,6 +96,204 @@ def _load_sanction_file_to_df(file_obj: IO[bytes], filename: str) -> pd.DataFram
     return df
 
 
+# Kolom data entity hasil mapping file (tanpa source/snapshot/timestamp).
+ENTITY_DATA_COLUMNS = (
+    "primary_name",
+    "primary_name_normalized",
+    "date_of_birth_raw",
+    "dob_year",
+    "dob_month",
+    "dob_day",
+    "citizenship",
+    "citizenship_normalized",
+    "citizenship_iso2",
+    "country_of_residence",
+    "country_of_birth",
+    "extra_data",
+)
+
+# Kolom yang menentukan "isi" satu baris untuk diff incremental.
+_ROW_HASH_COLUMNS = (
+    "primary_name",
+    "primary_name_normalized",
+    "date_of_birth_raw",
+    "citizenship",
+    "country_of_residence",
+    "country_of_birth",
+    "extra_data",
+)
+
+
+def _file_sha256(file_obj) -> str:
+    file_obj.seek(0)
+    h = hashlib.sha256()
+    while True:
+        block = file_obj.read(1 << 20)
+        if not block:
+            break
+        h.update(block.encode("utf-8") if isinstance(block, str) else block)
+    file_obj.seek(0)
+    return h.hexdigest()
+
+
+def _row_hashes(entities: pd.DataFrame) -> pd.Series:
+    """Hash 64-bit per baris (vektor) atas kolom `_ROW_HASH_COLUMNS` yang sudah dinormalisasi."""
+    frame = entities[list(_ROW_HASH_COLUMNS)].astype(object).copy()
+    frame["extra_data"] = [
+        json.dumps(v, sort_keys=True, ensure_ascii=False) for v in frame["extra_data"]
+    ]
+    return pd.util.hash_pandas_object(frame, index=False)
+
+
+def _build_entity_frame(df: pd.DataFrame, mapping: Dict[str, Any]) -> pd.DataFrame:
+    """
+    Terapkan column_mapping ke DataFrame file mentah (semua kolom string).
+
+    Hasil: satu baris per entity (baris tanpa nama dibuang) dengan kolom
+    `ENTITY_DATA_COLUMNS`, semua dihitung per kolom (vektor).
+    """
+    col_full_name = mapping.get("full_name")
+    col_dob = mapping.get("dob")
+    col_citizenship = mapping.get("citizenship")
+    col_country_of_res = mapping.get("country_of_residence")
+    col_country_of_birth = mapping.get("country_of_birth")
+
+    used_cols = {
+        c
+        for c in [
+            col_full_name,
+            col_dob,
+            col_citizenship,
+            col_country_of_res,
+            col_country_of_birth,
+        ]
+        if c
+    }
+
+    def _col(name: str | None) -> pd.Series:
+        if name and name in df.columns:
+            return df[name].astype(str).str.strip()
+        return pd.Series("", index=df.index, dtype=object)
+
+    full_names = _col(col_full_name)
+    keep = full_names != ""
+    df = df[keep]
+    full_names = full_names[keep]
+
+    dob_raw = _col(col_dob)
+    citizenship_raw = _col(col_citizenship)
+
+    # parse_dob cukup sekali per nilai unik (list besar banyak DOB berulang / kosong)
+    parsed_dob = {v: parse_dob(v) for v in dob_raw.unique() if v}
+    empty_dob = (None, None, None)
+    dob_parts = [parsed_dob.get(v, empty_dob) for v in dob_raw]
+
+    unused_cols = [c for c in df.columns if c not in used_cols]
+    extra = df[unused_cols].astype(object)
+
+    entities = pd.DataFrame(index=df.index)
+    entities["primary_name"] = full_names.astype(object)
+    entities["primary_name_normalized"] = normalize_name_series(full_names)
+    entities["date_of_birth_raw"] = _none_if_empty(dob_raw)
+    # dtype object (int / None): list berisi None akan jadi float64 + NaN bila
+    # dibiarkan pandas, dan COPY menolak "1980.0" / "nan" untuk kolom INTEGER
+    for i, c in enumerate(("dob_year", "dob_month", "dob_day")):
+        entities[c] = pd.Series([p[i] for p in dob_parts], index=df.index, dtype=object)
+    entities["citizenship"] = _none_if_empty(citizenship_raw)
+    entities["citizenship_normalized"] = normalize_name_series(citizenship_raw)
+    entities["citizenship_iso2"] = canonicalize_country_series(entities["citizenship"])
+    entities["country_of_residence"] = _none_if_empty(_col(col_country_of_res))
+    entities["country_of_birth"] = _none_if_empty(_col(col_country_of_birth))
+    entities["extra_data"] = extra.where(extra != "", None).to_dict("records")
+    return entities
+
+
+def _insert_entities(
+    db: Session,
+    entities: pd.DataFrame,
+    source_id: int,
+    snapshot_id: int,
+) -> int:
+    now = datetime.utcnow()
+    columns = ("source_id", "snapshot_id", *ENTITY_DATA_COLUMNS, "is_active", "created_at", "updated_at")
+    rows = zip(
+        repeat(source_id),
+        repeat(snapshot_id),
+        *(entities[c] for c in ENTITY_DATA_COLUMNS),
+        repeat(True),
+        repeat(now),
+        repeat(now),
+    )
+    return bulk_insert_rows(db, SanctionEntity.__table__, columns, rows)
+
+
+def _active_entity_frame(db: Session, source_id: int) -> pd.DataFrame:
+    """Entity aktif milik satu source (id, snapshot_id + kolom hash) untuk diff."""
+    q = (
+        db.query(
+            SanctionEntity.id,
+            SanctionEntity.snapshot_id,
+            *(getattr(SanctionEntity, c) for c in _ROW_HASH_COLUMNS),
+        )
+        .filter(
+            SanctionEntity.source_id == source_id,
+            SanctionEntity.is_active.is_(True),
+        )
+        .order_by(SanctionEntity.id.asc())
+    )
+    columns = ["id", "snapshot_id", *_ROW_HASH_COLUMNS]
+    return pd.DataFrame(list(q.yield_per(10000)), columns=columns, dtype=object)
+
+
+def diff_sanction_entities(
+    existing: pd.DataFrame,
+    incoming: pd.DataFrame,
+) -> Dict[str, Any]:
+    """
+    Diff multiset baris (berdasarkan row hash) antara entity aktif dan file baru.
+
+    Return dict:
+      - added_mask   : bool array per baris `incoming` yang perlu di-insert
+      - removed_ids  : id entity lama yang tidak ada lagi di file
+      - summary      : hitungan added / changed / removed / unchanged
+
+    Baris yang hilang dan muncul kembali dengan nama normal yang sama
+    dihitung sebagai "changed" (bukan added + removed).
+    """
+    new_hash = _row_hashes(incoming) if len(incoming) else pd.Series([], dtype="uint64")
+    old_hash = _row_hashes(existing) if len(existing) else pd.Series([], dtype="uint64")
+
+    # (hash, kemunculan ke-n) -> baris duplikat dipasangkan satu-satu
+    new_keys = pd.MultiIndex.from_arrays(
+        [new_hash.to_numpy(), new_hash.groupby(new_hash.to_numpy()).cumcount().to_numpy()]
+    )
+    old_keys = pd.MultiIndex.from_arrays(
+        [old_hash.to_numpy(), old_hash.groupby(old_hash.to_numpy()).cumcount().to_numpy()]
+    )
+    added_mask = ~new_keys.isin(old_keys)
+    removed_mask = ~old_keys.isin(new_keys)
+
+    added_norms = incoming["primary_name_normalized"].to_numpy()[added_mask]
+    removed_norms = existing["primary_name_normalized"].to_numpy()[removed_mask] if len(existing) else []
+    changed = int(pd.Series(added_norms, dtype=object).isin(set(removed_norms)).sum())
+
+    added = int(added_mask.sum())
+    removed = int(removed_mask.sum())
+    return {
+        "added_mask": added_mask,
+        "removed_ids": [int(i) for i in existing["id"].to_numpy()[removed_mask]] if len(existing) else [],
+        "removed_snapshot_ids": sorted(
+            {int(i) for i in existing["snapshot_id"].to_numpy()[removed_mask] if i is not None}
+        ) if len(existing) else [],
+        "summary": {
+            "added": added - changed,
+            "changed": changed,
+            "removed": max(removed - changed, 0),
+            "unchanged": int(len(incoming) - added),
+        },
+    }
+
+
 def import_sanction_file(
     db: Session,
     source_code: str,
@@ -84,13 +301,25 @@ def import_sanction_file(
     filename: str,
     version_label: str | None = None,
     effective_date: datetime | None = None,
-) -> Tuple[SanctionSnapshot, int]:
+    incremental: bool = False,
+) -> Tuple[SanctionSnapshot, int, bool]:
     """
     Import 1 file sanction list ke:
       - sanction_snapshot
       - sanction_entity
 
     Menggunakan mapping dari sanction_source.column_mapping.
+
+    Kolom di-proses secara vektor (tanpa iterrows / ORM object per baris)
+    lalu di-insert sekaligus dengan COPY (PostgreSQL).
+
+    `incremental=True`: file dibandingkan dengan entity aktif source ini.
+      - file identik (sha256 sama dengan snapshot aktif) -> di-skip
+        (tidak ada snapshot baru; return snapshot aktif tsb dengan skipped=True)
+      - hanya baris baru/berubah yang di-insert ke snapshot baru
+      - baris yang hilang dari file dinonaktifkan
+      - ringkasan diff disimpan di snapshot.metadata_json
+    Return (snapshot, jumlah entity yang di-insert, skipped).
     """
     
     source: SanctionSource | None = (
@@ -103,16 +332,28 @@ def import_sanction_file(
 
     mapping: Dict[str, Any] = source.column_mapping or {}
     col_full_name = mapping.get("full_name")
-    col_dob = mapping.get("dob")
-    col_citizenship = mapping.get("citizenship")
-    col_country_of_res = mapping.get("country_of_residence")
-    col_country_of_birth = mapping.get("country_of_birth")
 
     if not col_full_name:
         raise ValueError(
             "column_mapping.full_name is required for this source to import"
         )
 
+    file_hash = _file_sha256(file_obj)
+
+    if incremental:
+        same_file = (
+            db.query(SanctionSnapshot)
+            .filter(
+                SanctionSnapshot.source_id == source.id,
+                SanctionSnapshot.is_active.is_(True),
+                SanctionSnapshot.raw_file_hash == file_hash,
+            )
+            .order_by(SanctionSnapshot.id.desc())
+            .first()
+        )
+        if same_file is not None:
+            return same_file, 0, True
+
     df = _load_sanction_file_to_df(file_obj, filename)
 
     if col_full_name not in df.columns:
@@ -121,85 +362,160 @@ def import_sanction_file(
             f"Columns available: {list(df.columns)}"
         )
 
+    entities = _build_entity_frame(df, mapping)
+
+    metadata: Dict[str, Any] | None = None
+    removed_ids: List[int] = []
+    removed_snapshot_ids: List[int] = []
+    if incremental:
+        existing = _active_entity_frame(db, source.id)
+        diff = diff_sanction_entities(existing, entities)
+        entities = entities[diff["added_mask"]]
+        removed_ids = diff["removed_ids"]
+        removed_snapshot_ids = diff["removed_snapshot_ids"]
+        metadata = {
+            "mode": "incremental",
+            "file_rows": len(df),
+            "diff": diff["summary"],
+        }
+
     
     snapshot = SanctionSnapshot(
         source_id=source.id,
         version_label=version_label or filename,
         effective_date=effective_date.date() if isinstance(effective_date, datetime) else None,
-        record_count=len(df),
+        record_count=len(entities),
         is_active=True,
         raw_file_name=filename,
+        raw_file_hash=file_hash,
+        metadata_json=metadata,
     )
     db.add(snapshot)
     db.flush()
 
-    
-    used_cols = {
-    c
-    for c in [
-        col_full_name,
-        col_dob,
-        col_citizenship,
-        col_country_of_res,
-        col_country_of_birth,
-    ]
-    if c
-}
-
-    entities: List[SanctionEntity] = []
-
-    for _, row in df.iterrows():
-        
-        full_name_raw = str(row[col_full_name]).strip() if col_full_name in df.columns else ""
-        if not full_name_raw:
-            continue  
-
-        dob_raw = str(row[col_dob]).strip() if col_dob and col_dob in df.columns else ""
-        citizenship_raw = (
-            str(row[col_citizenship]).strip()
-            if col_citizenship and col_citizenship in df.columns
-            else ""
+    entity_count = _insert_entities(db, entities, source.id, snapshot.id)
+
+    if removed_ids:
+        now = datetime.utcnow()
+        for i in range(0, len(removed_ids), 1000):
+            (
+                db.query(SanctionEntity)
+                .filter(SanctionEntity.id.in_(removed_ids[i : i + 1000]))
+                .update(
+                    {
+                        SanctionEntity.is_active: False,
+                        SanctionEntity.deactivated_by_snapshot_id: snapshot.id,
+                        SanctionEntity.updated_at: now,
+                    },
+                    synchronize_session=False,
+                )
+            )
+        # Snapshot lama berubah isi -> bump updated_at (probe versi index sanction)
+        (
+            db.query(SanctionSnapshot)
+            .filter(SanctionSnapshot.id.in_(removed_snapshot_ids))
+            .update({SanctionSnapshot.updated_at: now}, synchronize_session=False)
         )
-        country_res_raw = (
-            str(row[col_country_of_res]).strip()
-            if col_country_of_res and col_country_of_res in df.columns
-            else ""
+
+    snapshot.record_count = entity_count
+    db.commit()
+    db.refresh(snapshot)
+
+    # Snapshot baru -> key index berubah; buang matcher hangat di proses ini.
+    invalidate_sanction_index_cache()
+
+    return snapshot, entity_count, False
+
+
+class SnapshotDependencyError(ValueError):
+    """Snapshot tidak boleh di-toggle karena snapshot incremental yang lebih baru bergantung padanya."""
+
+
+def _dependent_incremental_snapshot(db: Session, snapshot: SanctionSnapshot) -> SanctionSnapshot | None:
+    """Snapshot incremental aktif yang lebih baru pada source yang sama (diff-nya dihitung atas isi `snapshot`)."""
+    newer = (
+        db.query(SanctionSnapshot)
+        .filter(
+            SanctionSnapshot.source_id == snapshot.source_id,
+            SanctionSnapshot.id > snapshot.id,
+            SanctionSnapshot.is_active.is_(True),
         )
-        country_birth_raw = (
-            str(row[col_country_of_birth]).strip()
-            if col_country_of_birth and col_country_of_birth in df.columns
-            else ""
+        .order_by(SanctionSnapshot.id.asc())
+    )
+    for other in newer:
+        if (other.metadata_json or {}).get("mode") == "incremental":
+            return other
+    return None
+
+
+def set_snapshot_active(db: Session, snapshot_id: int, is_active: bool) -> SanctionSnapshot:
+    """
+    Aktifkan / nonaktifkan satu snapshot beserta entity-nya.
+
+    Konsisten dengan state per baris hasil import incremental:
+      - baris yang dinonaktifkan oleh diff snapshot lain yang masih aktif
+        (`deactivated_by_snapshot_id`) tidak ikut diaktifkan kembali;
+      - toggle snapshot incremental = rollback / redo diff-nya: baris yang
+        ia nonaktifkan diaktifkan lagi saat snapshot ini dinonaktifkan, dan
+        sebaliknya;
+      - snapshot yang menjadi dasar snapshot incremental aktif yang lebih
+        baru tidak bisa di-toggle (`SnapshotDependencyError`), karena isi list
+        saat ini tersebar di seluruh rantai tsb.
+
+    `updated_at` snapshot ikut di-bump agar probe versi index sanction
+    (`active_snapshot_key`) berubah di semua proses.
+    """
+    snapshot = db.get(SanctionSnapshot, snapshot_id)
+    if snapshot is None:
+        raise ValueError(f"sanction_snapshot id={snapshot_id} not found")
+    if bool(snapshot.is_active) == bool(is_active):
+        return snapshot
+
+    dependent = _dependent_incremental_snapshot(db, snapshot)
+    if dependent is not None:
+        raise SnapshotDependencyError(
+            f"sanction_snapshot id={snapshot_id} is part of the incremental chain of "
+            f"active snapshot id={dependent.id}; toggle snapshot id={dependent.id} first"
         )
 
-        dob_year, dob_month, dob_day = parse_dob(dob_raw if dob_raw else None)
-
-        row_dict = {c: (str(row[c]) if c in row and row[c] != "" else None) for c in df.columns}
-        extra_data = {k: v for k, v in row_dict.items() if k not in used_cols}
-
-        ent = SanctionEntity(
-            source_id=source.id,
-            snapshot_id=snapshot.id,
-            external_id=None,
-            primary_name=full_name_raw,
-            primary_name_normalized=normalize_name(full_name_raw),
-            date_of_birth_raw=dob_raw or None,
-            dob_year=dob_year,
-            dob_month=dob_month,
-            dob_day=dob_day,
-            citizenship=citizenship_raw or None,
-            citizenship_normalized=normalize_name(citizenship_raw) if citizenship_raw else None,
-            country_of_residence=country_res_raw or None,
-            country_of_birth=country_birth_raw or None,
-            extra_data=extra_data,
-            is_active=True,
+    now = datetime.utcnow()
+    snapshot.is_active = is_active
+    snapshot.updated_at = now
+
+    # Baris aktif <=> snapshot-nya aktif dan tidak di-supersede snapshot incremental yang aktif
+    active_snapshot_ids = select(SanctionSnapshot.id).where(SanctionSnapshot.is_active.is_(True))
+    own_rows = db.query(SanctionEntity).filter(SanctionEntity.snapshot_id == snapshot_id)
+    if is_active:
+        own_rows = own_rows.filter(
+            or_(
+                SanctionEntity.deactivated_by_snapshot_id.is_(None),
+                SanctionEntity.deactivated_by_snapshot_id.not_in(active_snapshot_ids),
+            )
         )
-        entities.append(ent)
+    own_rows.update(
+        {SanctionEntity.is_active: is_active, SanctionEntity.updated_at: now},
+        synchronize_session=False,
+    )
 
-    if entities:
-        db.bulk_save_objects(entities)
+    # Baris snapshot lain yang di-supersede diff snapshot ini (hanya dari snapshot yang masih aktif)
+    superseded = db.query(SanctionEntity).filter(
+        SanctionEntity.deactivated_by_snapshot_id == snapshot_id,
+        SanctionEntity.snapshot_id.in_(active_snapshot_ids),
+    )
+    superseded_snapshot_ids = {sid for (sid,) in superseded.with_entities(SanctionEntity.snapshot_id).distinct()}
+    superseded.update(
+        {SanctionEntity.is_active: not is_active, SanctionEntity.updated_at: now},
+        synchronize_session=False,
+    )
+    if superseded_snapshot_ids:
+        (
+            db.query(SanctionSnapshot)
+            .filter(SanctionSnapshot.id.in_(superseded_snapshot_ids))
+            .update({SanctionSnapshot.updated_at: now}, synchronize_session=False)
+        )
 
-    snapshot.record_count = len(entities)
     db.commit()
     db.refresh(snapshot)
 
-    return snapshot, len(entities)
+    invalidate_sanction_index_cache()
+    return snapshot
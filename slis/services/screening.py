@@ -1,35 +1,56 @@
 from __future__ import annotations
 
 from datetime import date, datetime, timezone
-from typing import List, Optional
+from typing import Any, Callable, Dict, List, Optional
 
+import heapq
 import logging
-import re
 
-import os
+import numpy as np
 
-from typing import List, Dict, Any, Optional
+import os
 
-from slis.matching.geo import generate_geographic_insights
+from slis.matching.geo import country_match_key, generate_geographic_insights
 
 DEV_FAST_MODE = os.getenv("SLIS_DEV_FAST_MODE", "0") == "1"
 DEV_MAX_TRANSACTIONS = int(os.getenv("SLIS_DEV_MAX_TRANSACTIONS", "20"))
 DEV_MAX_SANCTIONS = int(os.getenv("SLIS_DEV_MAX_SANCTIONS", "200"))
+# Jumlah hit sanction yang disimpan per pihak transaksi di screening job (1 = best match saja).
+JOB_TOP_K = max(1, int(os.getenv("SLIS_JOB_TOP_K", "1")))
+# Jumlah transaksi per statement INSERT ... SELECT fan-out (batas cek cancel & progress).
+FANOUT_CHUNK_SIZE = max(1, int(os.getenv("SLIS_FANOUT_CHUNK_SIZE", "5000")))
 
 
+from sqlalchemy import Integer, String, and_, func, insert, literal, or_, select
+
 from slis.models import (
+    JOB_TYPE_DELTA,
+    JOB_TYPE_FULL,
     ScreeningJob,
+    ScreeningNameMatch,
     ScreeningResult,
     Transaction,
     SanctionEntity,
 )
 
-from slis.matching.dob import calculate_dob_score_flexible
+from slis.matching.dob import (
+    NO_DOB,
+    calculate_dob_score_flexible,
+    calculate_dob_score_parsed,
+    is_flexible_year_source,
+    parse_dob_parts,
+)
+from slis.matching.parallel import parallel_matcher
+from slis.matching.scoring import dob_scores_columnar, scheme_codes, weighted_final_scores
 from slis.matching.names import (
-    HybridMatcher,
+    calculate_advanced_name_score_cdist,
     calculate_advanced_name_score_normed,
     normalize_name,
 )
+from slis.services.sanction_index import SanctionIndex, get_job_sanction_index, get_sanction_index
+from slis.services.transactions import distinct_party_names
+from slis.services.bulk import bulk_insert_rows
+from slis.services.match_cache import MatchCache
 
 
 logger = logging.getLogger(__name__)
@@ -40,12 +61,8 @@ def _normalize_name(name: Optional[str]) -> str:
     return normalize_name(name or "")
 
 def _normalize_country(value: Optional[str]) -> str:
-    """Normalisasi citizenship/country (ID, Indonesia -> id / indonesia)."""
-    if not value:
-        return ""
-    s = str(value).lower()
-    s = re.sub(r"[^a-z0-9]", "", s)
-    return s
+    """Key pembanding citizenship/country (ID, Indonesia -> ID; lihat `country_match_key`)."""
+    return country_match_key(value)
 
 
 def _parse_dob(value: Optional[str]) -> Optional[date]:
@@ -103,6 +120,23 @@ def get_sanction_name(s: SanctionEntity) -> str:
     return ""
 
 
+def _sanction_data_from_index(index: SanctionIndex, idx: int) -> Dict[str, Any]:
+    """Dict sanction (format `_match_single_entity`) dari satu baris SanctionIndex."""
+    row = index.row(idx)
+    return {
+        "id": row["id"],
+        "source_id": row["source_id"],
+        "name": row["name"],
+        "name_norm": row["match_norm"],
+        "dob_raw": row["dob_raw"],
+        "cit_raw": row["citizenship"],
+        "cit_norm": index.citizenship_key(idx),
+        "source": row["source_code"],
+        "dob_parts": index.dob_parts(idx),
+        "dob_years": index.dob_years(idx),
+    }
+
+
 def compute_name_score(name1: str | None, name2: str | None) -> float:
     """Skor nama (0–100) pakai RapidFuzz."""
     if not name1 or not name2:
@@ -159,7 +193,13 @@ def _match_single_entity(
     
     if q_dob and s_dob:
         q_dob_str = str(q_dob) if isinstance(q_dob, date) else q_dob
-        score, desc = calculate_dob_score_flexible(q_dob_str, s_dob, sanction_data.get("source"))
+        if "dob_parts" in sanction_data:
+            flexible_years = is_flexible_year_source(sanction_data.get("source"))
+            score, desc = calculate_dob_score_parsed(
+                parse_dob_parts(q_dob_str), sanction_data["dob_parts"], sanction_data["dob_years"], flexible_years
+            )
+        else:
+            score, desc = calculate_dob_score_flexible(q_dob_str, s_dob, sanction_data.get("source"))
         dob_score = float(score)
         dob_match_desc = desc
         has_dob = True
@@ -201,6 +241,257 @@ def _match_single_entity(
     }
 
 
+def result_job_ids(job: ScreeningJob) -> tuple[int, int | None]:
+    """(job_id, delta_job_id) untuk hasil screening: delta job menulis ke job induknya."""
+    if job.job_type == JOB_TYPE_DELTA and job.parent_job_id:
+        return job.parent_job_id, job.id
+    return job.id, None
+
+
+def add_delta_matches_to_parent(db, job: ScreeningJob, total_matches: int) -> None:
+    """Tambahkan jumlah match delta job ke total_matches job induk (tanpa commit)."""
+    if job.job_type != JOB_TYPE_DELTA or not job.parent_job_id or not total_matches:
+        return
+    (
+        db.query(ScreeningJob)
+        .filter(ScreeningJob.id == job.parent_job_id)
+        .update(
+            {ScreeningJob.total_matches: func.coalesce(ScreeningJob.total_matches, 0) + int(total_matches)},
+            synchronize_session=False,
+        )
+    )
+
+
+def create_delta_jobs(
+    db,
+    since_snapshot_id: int,
+    job_ids: list[int] | None = None,
+    created_by: str | None = None,
+) -> list[ScreeningJob]:
+    """
+    Buat delta job untuk job-job screening lama (tanpa enqueue).
+
+    Tiap delta job men-screen ulang batch job induknya, tapi hanya terhadap
+    entity sanction aktif dari snapshot dengan id > `since_snapshot_id`.
+    Default `job_ids`: job FULL terakhir yang selesai untuk setiap batch.
+    """
+    if job_ids:
+        parents = (
+            db.query(ScreeningJob)
+            .filter(ScreeningJob.id.in_(job_ids))
+            .order_by(ScreeningJob.id.asc())
+            .all()
+        )
+        missing = set(job_ids) - {j.id for j in parents}
+        if missing:
+            raise ValueError(f"screening_job id(s) not found: {sorted(missing)}")
+    else:
+        latest_ids = (
+            db.query(func.max(ScreeningJob.id))
+            .filter(
+                ScreeningJob.status.in_(("SUCCESS", "DONE")),
+                or_(ScreeningJob.job_type.is_(None), ScreeningJob.job_type == JOB_TYPE_FULL),
+            )
+            .group_by(ScreeningJob.batch_id)
+        )
+        parents = (
+            db.query(ScreeningJob)
+            .filter(ScreeningJob.id.in_(latest_ids))
+            .order_by(ScreeningJob.id.asc())
+            .all()
+        )
+
+    jobs: list[ScreeningJob] = []
+    for parent in parents:
+        if parent.job_type == JOB_TYPE_DELTA:
+            raise ValueError(f"screening_job id={parent.id} is a delta job")
+        job = ScreeningJob(
+            batch_id=parent.batch_id,
+            status="PENDING",
+            threshold_name_score=parent.threshold_name_score,
+            threshold_score=parent.threshold_score,
+            created_at=datetime.now(timezone.utc),
+            created_by=created_by,
+            job_type=JOB_TYPE_DELTA,
+            since_snapshot_id=int(since_snapshot_id),
+            parent_job_id=parent.id,
+        )
+        db.add(job)
+        jobs.append(job)
+    db.commit()
+    return jobs
+
+
+DISTINCT_NAME_CHUNK = 1000
+
+
+def match_distinct_party_names(
+    db,
+    batch_id: int,
+    matcher,
+    match_cache: MatchCache,
+    to_norm: Callable[[str | None, str | None], str | None],
+    after_id: int = 0,
+    upto_id: int | None = None,
+    on_chunk: Callable[[int, int], bool] | None = None,
+    party_names: list[tuple[str | None, str | None]] | None = None,
+) -> dict[str, list[dict[str, Any]]] | None:
+    """
+    Match setiap nama unik di batch tepat satu kali.
+
+    `to_norm(name, name_normalized)` -> nama query (None/"" = dilewati), harus
+    sama dengan normalisasi yang dipakai saat fan-out per transaksi.
+    `on_chunk(names_done, names_total)` dipanggil setelah tiap
+    `DISTINCT_NAME_CHUNK` nama (cek cancel / update progress); return False
+    = berhenti dan fungsi ini return None. `party_names` = hasil
+    `distinct_party_names` yang sudah di-query caller (None = query di sini).
+    Return {nama query: list hit (maks `match_cache.top_k`, terbaik dulu)}
+    hanya untuk nama yang punya hit di atas threshold.
+    """
+    norms: dict[str, None] = {}
+    if party_names is None:
+        party_names = distinct_party_names(db, batch_id, after_id=after_id, upto_id=upto_id)
+    for name, name_normalized in party_names:
+        q_norm = to_norm(name, name_normalized)
+        if q_norm:
+            norms[q_norm] = None
+
+    names = list(norms)
+    hits_by_name: dict[str, list[dict[str, Any]]] = {}
+    for start in range(0, len(names), DISTINCT_NAME_CHUNK):
+        part = names[start : start + DISTINCT_NAME_CHUNK]
+        for q_norm, hits in zip(part, match_cache.top_matches(matcher, part)):
+            if hits:
+                hits_by_name[q_norm] = hits
+        if on_chunk is not None and not on_chunk(start + len(part), len(names)):
+            return None
+    return hits_by_name
+
+
+def _stage_name_matches(
+    db,
+    job_id: int,
+    party_names: list[tuple[str | None, str | None]],
+    name_matches: dict[str, list[tuple[dict[str, Any], dict[str, Any]]]],
+) -> int:
+    """
+    Tulis match per pasangan (nama, nama_normalized) unik ke `screening_name_match`
+    (commit). NULL disimpan sebagai "" agar join fan-out bisa memakai equality.
+    """
+    _clear_name_matches(db, job_id)
+    rows = []
+    seen: set[tuple[str, str]] = set()
+    for name, name_normalized in party_names:
+        key = (name or "", name_normalized or "")
+        matches = name_matches.get(_normalize_name(name or name_normalized or ""))
+        if not matches or key in seen:
+            continue
+        seen.add(key)
+        for s_data, match in matches:
+            rows.append(
+                (
+                    job_id,
+                    *key,
+                    match["sanction_id"],
+                    s_data.get("source_id"),
+                    match["name_score"],
+                    match["dob_score"],
+                    match["citizenship_score"],
+                    match["final_score"],
+                    match["geographic_insights"],
+                )
+            )
+    written = bulk_insert_rows(
+        db,
+        ScreeningNameMatch.__table__,
+        (
+            "job_id",
+            "party_name",
+            "party_name_normalized",
+            "sanction_entity_id",
+            "sanction_source_id",
+            "name_score",
+            "dob_score",
+            "citizenship_score",
+            "final_score",
+            "geographic_insights",
+        ),
+        rows,
+    )
+    db.commit()
+    return written
+
+
+def _clear_name_matches(db, job_id: int) -> None:
+    db.query(ScreeningNameMatch).filter(ScreeningNameMatch.job_id == job_id).delete(synchronize_session=False)
+    db.commit()
+
+
+_FANOUT_COLUMNS = (
+    "job_id",
+    "delta_job_id",
+    "transaction_id",
+    "sanction_entity_id",
+    "sanction_source_id",
+    "target_role",
+    "name_score",
+    "dob_score",
+    "citizenship_score",
+    "final_score",
+    "geographic_insights",
+)
+
+
+def _fan_out_name_matches(
+    db,
+    job_id: int,
+    batch_id: int,
+    result_job_id: int,
+    delta_job_id: int | None,
+    after_id: int,
+    upto_id: int,
+) -> int:
+    """
+    `INSERT ... SELECT` hasil staging job ke `screening_result` untuk setiap
+    transaksi batch di (after_id, upto_id] yang membawa pasangan nama tsb
+    (sender & receiver). Tanpa commit; return jumlah baris hasil.
+    """
+    m = ScreeningNameMatch
+    written = 0
+    for role, name_col, norm_col in (
+        ("sender", Transaction.sender_name, Transaction.sender_name_normalized),
+        ("receiver", Transaction.receiver_name, Transaction.receiver_name_normalized),
+    ):
+        rows = (
+            select(
+                literal(result_job_id, Integer),
+                literal(delta_job_id, Integer),
+                Transaction.id,
+                m.sanction_entity_id,
+                m.sanction_source_id,
+                literal(role, String),
+                m.name_score,
+                m.dob_score,
+                m.citizenship_score,
+                m.final_score,
+                m.geographic_insights,
+            )
+            .join_from(
+                Transaction,
+                m,
+                and_(
+                    m.job_id == job_id,
+                    m.party_name == func.coalesce(name_col, ""),
+                    m.party_name_normalized == func.coalesce(norm_col, ""),
+                ),
+            )
+            .where(Transaction.batch_id == batch_id, Transaction.id > after_id, Transaction.id <= upto_id)
+            .order_by(Transaction.id.asc(), m.id.asc())
+        )
+        written += db.execute(insert(ScreeningResult).from_select(_FANOUT_COLUMNS, rows)).rowcount
+    return written
+
+
 # Engine utama 
 def run_screening_for_job(db, job_id: int) -> None:
     job: ScreeningJob | None = db.query(ScreeningJob).get(job_id)
@@ -234,15 +525,16 @@ def run_screening_for_job(db, job_id: int) -> None:
         db.add(job)
         db.commit()
         
-        sanctions_query = db.query(SanctionEntity).filter(SanctionEntity.is_active.is_(True))
-        if DEV_FAST_MODE:
-            sanctions_query = sanctions_query.limit(DEV_MAX_SANCTIONS)
-        sanctions: List[SanctionEntity] = sanctions_query.all()
+        if DEV_FAST_MODE and job.job_type != JOB_TYPE_DELTA:
+            sanction_index = SanctionIndex.from_db(db, limit=DEV_MAX_SANCTIONS)
+        else:
+            sanction_index = get_job_sanction_index(db, job)
+        result_job_id, delta_job_id = result_job_ids(job)
 
-        raw_sanction_count = len(sanctions)
+        raw_sanction_count = len(sanction_index)
         # total_transactions already set from count()
         
-        if total_transactions <= 0 or not sanctions:
+        if total_transactions <= 0 or not raw_sanction_count:
             job.total_sanctions = raw_sanction_count
             job.status = "DONE"
             job.total_matches = 0
@@ -258,134 +550,104 @@ def run_screening_for_job(db, job_id: int) -> None:
             "final": job.threshold_score or 60.0
         }
 
-        # OPTIMASI DEDUPLIKASI
-        unique_sanction_map = {} 
-        for s in sanctions:
-            sanction_name = get_sanction_name(s)
-            if not sanction_name: continue
-            
-            norm_name = _normalize_name(sanction_name)
-            
-            if norm_name not in unique_sanction_map:
-                unique_sanction_map[norm_name] = {
-                    "id": s.id,
-                    "source_id": s.source_id,
-                    "name": sanction_name,
-                    "name_norm": norm_name,
-                    "dob_raw": s.date_of_birth_raw,
-                    "cit_raw": s.citizenship,
-                    "cit_norm": _normalize_country(s.citizenship),
-                    "source": s.source.code if s.source else "UNKNOWN"
-                }
-
-        sanction_list_data = list(unique_sanction_map.values())
-
-        matcher = HybridMatcher(sanction_list_data, name_key="primary_name")
+        # Deduplikasi nama sudah dihitung di index (first_idx)
+        matcher = sanction_index.matcher
+        unique_count = sanction_index.unique_count
         
-        job.total_sanctions = len(sanction_list_data)
+        job.total_sanctions = unique_count
         db.add(job)
         db.commit()
 
-        logger.info(f"Deduplikasi Sanksi: {raw_sanction_count} raw -> {len(sanction_list_data)} unique.")
+        logger.info(f"Deduplikasi Sanksi: {raw_sanction_count} raw -> {unique_count} unique.")
 
-        results_to_insert: List[ScreeningResult] = []
+        match_cache = MatchCache(sanction_index.key, float(thresholds["name"]), top_k=JOB_TOP_K)
         total_matches = 0
         processed_count = 0
 
-        BATCH_SIZE = 500
-        offset = 0
-        update_frequency = 10 if total_transactions < 200 else 50
+        # Nama unik di-match sekali; tanpa DOB/citizenship di sisi query, hasil
+        # match per nama berlaku sama untuk semua transaksi dengan nama tsb.
+        name_matches: dict[str, list[tuple[dict[str, Any], dict[str, Any]]]] = {}
+        party_names = distinct_party_names(db, job.batch_id)
 
-        while True:
-            # Allow cancellation
+        def _not_canceled(names_done: int, names_total: int) -> bool:
+            db.expire(job)
+            return job.status != "CANCELED"
+
+        with parallel_matcher(matcher) as scoring_matcher:
+            name_hits = match_distinct_party_names(
+                db,
+                job.batch_id,
+                scoring_matcher,
+                match_cache,
+                lambda name, name_normalized: _normalize_name(name or name_normalized or ""),
+                on_chunk=_not_canceled,
+                party_names=party_names,
+            )
+        if name_hits is None:
+            logger.info("Job %s dibatalkan saat match nama unik", job.id)
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+            return
+        for q_norm, hits in name_hits.items():
+            entity_matches: dict[int, tuple[dict[str, Any], dict[str, Any]]] = {}
+            for hit in hits:
+                idx = int(sanction_index.first_idx[int(hit["index"])])
+                if idx in entity_matches:
+                    continue
+                s_data = _sanction_data_from_index(sanction_index, idx)
+                match = _match_single_entity(
+                    {"name_norm": q_norm, "dob": None, "cit_raw": None, "cit_norm": None},
+                    s_data,
+                    thresholds,
+                    precomputed_name_score=float(hit["scores"]["final"]),
+                )
+                if match:
+                    entity_matches[idx] = (s_data, match)
+            if entity_matches:
+                name_matches[q_norm] = list(entity_matches.values())
+        logger.info(
+            "Job %s: %s nama unik cocok, match_cache=%s", job.id, len(name_matches), match_cache.stats()
+        )
+
+        # Fan-out set-based: match per pasangan nama di-stage, lalu INSERT ... SELECT
+        # join ke transaksi per range id (cek cancel + progress per range)
+        _stage_name_matches(db, job.id, party_names, name_matches)
+        after_id = 0
+        while processed_count < total_transactions:
             db.expire(job)
             if job.status == "CANCELED":
+                _clear_name_matches(db, job.id)
                 job.finished_at = job.finished_at or datetime.now(timezone.utc)
                 db.add(job)
                 db.commit()
                 return
 
-            tx_chunk = tx_query_base.limit(BATCH_SIZE).offset(offset).all()
-            if not tx_chunk:
+            page = (
+                select(Transaction.id)
+                .where(Transaction.batch_id == job.batch_id, Transaction.id > after_id)
+                .order_by(Transaction.id.asc())
+                .limit(min(FANOUT_CHUNK_SIZE, total_transactions - processed_count))
+                .subquery()
+            )
+            upto_id, chunk_count = db.execute(select(func.max(page.c.id), func.count())).one()
+            if not chunk_count:
                 break
-
-            for tx in tx_chunk:
-                processed_count += 1
-
-                parties = [
-                    ("sender", get_transaction_name(tx, "sender")),
-                    ("receiver", get_transaction_name(tx, "receiver")),
-                ]
-
-                for role, party_name in parties:
-                    if not party_name:
-                        continue
-
-                    q_norm = _normalize_name(party_name)
-                    if not q_norm:
-                        continue
-
-                    query_data = {
-                        "name_norm": q_norm,
-                        "dob": None,
-                        "cit_raw": None,
-                        "cit_norm": None,
-                    }
-
-                    best = matcher.best_match_normed(q_norm, threshold=float(thresholds["name"]))
-                    if not best:
-                        continue
-
-                    idx = int(best["index"])
-                    s_data = sanction_list_data[idx]
-
-                    match = _match_single_entity(
-                        query_data,
-                        s_data,
-                        thresholds,
-                        precomputed_name_score=float(best["scores"]["final"]),
-                    )
-                    if not match:
-                        continue
-
-                    res = ScreeningResult(
-                        job_id=job.id,
-                        transaction_id=tx.id,
-                        sanction_entity_id=match["sanction_id"],
-                        sanction_source_id=s_data.get("source_id"),
-                        target_role=role,
-                        name_score=match["name_score"],
-                        dob_score=match["dob_score"],
-                        citizenship_score=match["citizenship_score"],
-                        final_score=match["final_score"],
-                        geographic_insights=match["geographic_insights"],
-                    )
-                    results_to_insert.append(res)
-                    total_matches += 1
-
-            # Flush Batch Insert
-            if len(results_to_insert) >= 1000:
-                db.bulk_save_objects(results_to_insert)
-                db.commit()
-                logger.info("Flushed 1000 screening results ke DB")
-                results_to_insert.clear()
+            total_matches += _fan_out_name_matches(
+                db, job.id, job.batch_id, result_job_id, delta_job_id, after_id, upto_id
+            )
+            processed_count += chunk_count
+            after_id = upto_id
 
             # Persist progress for UI polling (DB-backed)
-            if processed_count % update_frequency == 0 or processed_count == total_transactions:
-                job.processed_transactions = processed_count
-                safe_total = total_transactions if total_transactions > 0 else 1
-                job.progress_percentage = float((processed_count / safe_total) * 100)
-                job.total_matches = total_matches
-                db.add(job)
-                db.commit()
-
-            offset += BATCH_SIZE
-
-        # Final Flush
-        if results_to_insert:
-            db.bulk_save_objects(results_to_insert)
+            job.processed_transactions = processed_count
+            safe_total = total_transactions if total_transactions > 0 else 1
+            job.progress_percentage = float((processed_count / safe_total) * 100)
+            job.total_matches = total_matches
+            db.add(job)
             db.commit()
 
+        _clear_name_matches(db, job.id)
+
         # Summary
         job.processed_transactions = processed_count
         job.total_matches = total_matches
@@ -393,13 +655,15 @@ def run_screening_for_job(db, job_id: int) -> None:
         job.finished_at = datetime.now(timezone.utc)
         job.progress_percentage = 100.0
         db.add(job)
+        add_delta_matches_to_parent(db, job, total_matches)
         db.commit()
 
-        logger.info(f"Job {job.id} selesai: total_matches={total_matches}")
+        logger.info(f"Job {job.id} selesai: total_matches={total_matches}, match_cache={match_cache.stats()}")
 
     except Exception:
         logger.exception("Error saat menjalankan screening job_id=%s", job_id)
         db.rollback()
+        _clear_name_matches(db, job_id)
         job = db.get(ScreeningJob, job_id)
         if job:
             if job.status != "CANCELED":
@@ -409,6 +673,141 @@ def run_screening_for_job(db, job_id: int) -> None:
             db.commit()
 
 
+# Bobot (name, dob, citizenship) per kode skema `SCHEME_NAMES` (sama dengan `combine_scores`)
+_COMBINE_WEIGHTS = (
+    (1.0, 0.0, 0.0),
+    (0.7, 0.0, 0.3),
+    (0.7, 0.3, 0.0),
+    (0.5, 0.3, 0.2),
+)
+
+
+def _final_scores_columnar(
+    sanction_index: SanctionIndex,
+    query_data: Dict[str, Any],
+    entity_idxs: np.ndarray,
+    name_scores: np.ndarray,
+) -> np.ndarray:
+    """
+    `combine_scores` untuk satu query terhadap array baris entity index:
+    skor DOB dari kolom dob_year/month/day, citizenship dari kode integer.
+    Hanya baris sumber Australia (daftar/rentang tahun) yang dinilai per baris.
+    """
+    columns = sanction_index.columns
+    n = len(entity_idxs)
+
+    dob_scores = np.zeros(n, dtype=np.float64)
+    q_dob = query_data.get("dob")
+    if q_dob:
+        has_dob = sanction_index.has_dob_raw(entity_idxs)
+        customer_dob = parse_dob_parts(str(q_dob) if isinstance(q_dob, date) else q_dob)
+        dob_scores = dob_scores_columnar(
+            customer_dob,
+            columns["dob_year"][entity_idxs],
+            columns["dob_month"][entity_idxs],
+            columns["dob_day"][entity_idxs],
+        )
+        flexible = np.flatnonzero(has_dob & columns["dob_flexible"][entity_idxs])
+        for row in flexible.tolist():
+            idx = int(entity_idxs[row])
+            score, _ = calculate_dob_score_parsed(customer_dob, NO_DOB, sanction_index.dob_years(idx), True)
+            dob_scores[row] = float(score)
+    else:
+        has_dob = np.zeros(n, dtype=bool)
+
+    q_cit = query_data.get("cit_norm")
+    codes = columns["citizenship_code"][entity_idxs]
+    has_cit = (codes > 0) if q_cit else np.zeros(n, dtype=bool)
+    cit_scores = np.where(has_cit & (codes == sanction_index.citizenship_code(q_cit)), 100.0, 0.0)
+
+    return weighted_final_scores(
+        name_scores, dob_scores, cit_scores, scheme_codes(has_dob, has_cit), _COMBINE_WEIGHTS
+    )
+
+
+def _entity_name_scores(
+    sanction_index: SanctionIndex,
+    q_norm: str,
+    name_threshold: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Entity (baris pertama per entity) yang lolos threshold nama untuk satu
+    nama query: (index entity terurut, skor nama = alias terbaiknya).
+
+    Skor nama semua kandidat stage-1 (nama utama + alias) dihitung sekaligus
+    (satu `cdist`, nilai identik dengan `compute_name_score`).
+    """
+    matcher = sanction_index.matcher
+    # Kandidat stage-1 = index nama (nama utama / alias); dedup entity via first_idx pemiliknya
+    name_idxs = [
+        idx for idx in matcher.stage1_gpu_filter(q_norm) if sanction_index.is_first(matcher.owner_of(idx))
+    ]
+    if not name_idxs or not q_norm:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+
+    name_scores = calculate_advanced_name_score_cdist(
+        [q_norm],
+        [matcher.sanction_norms[idx] for idx in name_idxs],
+        score_cutoff=float(name_threshold),
+    )[0]
+
+    # Skor nama entity = alias terbaiknya (seri -> nama dengan index terkecil, yaitu nama utama)
+    entity_scores: dict[int, float] = {}
+    for idx, name_score in zip(name_idxs, name_scores.tolist()):
+        entity_idx = matcher.owner_of(idx)
+        if name_score > entity_scores.get(entity_idx, -1.0):
+            entity_scores[entity_idx] = name_score
+
+    entity_idxs = np.fromiter(sorted(entity_scores), dtype=np.int64, count=len(entity_scores))
+    entity_name_scores = np.array([entity_scores[i] for i in entity_idxs.tolist()], dtype=np.float64)
+    keep = entity_name_scores >= name_threshold
+    return entity_idxs[keep], entity_name_scores[keep]
+
+
+def _search_sanction_index(
+    sanction_index: SanctionIndex,
+    query_data: Dict[str, Any],
+    thresholds: Dict[str, float],
+    limit: int,
+    name_hits: Dict[str, tuple[np.ndarray, np.ndarray]] | None = None,
+) -> tuple[list[dict], int]:
+    """
+    Match satu query ke seluruh entity (baris pertama per entity) di index.
+
+    Entity yang lolos threshold nama dari `_entity_name_scores` (di-cache per
+    nama di `name_hits` bila diberikan); skor DOB/citizenship/final dihitung
+    kolumnar (`_final_scores_columnar`); dict hasil hanya dibangun untuk
+    `limit` teratas. Return (`limit` match teratas menurut final_score lewat
+    heap, urutan sama dengan sort stabil; total match).
+    """
+    q_norm = query_data["name_norm"]
+    hits = name_hits.get(q_norm) if name_hits is not None else None
+    if hits is None:
+        hits = _entity_name_scores(sanction_index, q_norm, thresholds["name"])
+        if name_hits is not None:
+            name_hits[q_norm] = hits
+    entity_idxs, entity_name_scores = hits
+    if not len(entity_idxs):
+        return [], 0
+
+    final_scores = _final_scores_columnar(sanction_index, query_data, entity_idxs, entity_name_scores)
+    passed = np.flatnonzero(final_scores >= thresholds["final"])
+    rounded = [round(v, 2) for v in final_scores[passed].tolist()]
+    top_positions = heapq.nlargest(max(int(limit), 0), range(len(passed)), key=rounded.__getitem__)
+
+    # Dict hasil (DOB desc, geo insights, dst.) hanya untuk `limit` teratas
+    top = []
+    for pos in top_positions:
+        row = int(passed[pos])
+        s_data = _sanction_data_from_index(sanction_index, int(entity_idxs[row]))
+        top.append(
+            _match_single_entity(
+                query_data, s_data, thresholds, precomputed_name_score=float(entity_name_scores[row])
+            )
+        )
+    return top, len(passed)
+
+
 def search_single_entity(
     db, name: str, dob: Optional[str] = None, citizenship: Optional[str] = None,
     limit: int = 50, name_threshold: float = 40.0, final_threshold: float = 50.0,
@@ -417,29 +816,8 @@ def search_single_entity(
     query_name = (name or "").strip()
     if not query_name: return []
 
-    sanctions = db.query(SanctionEntity).filter(SanctionEntity.is_active.is_(True)).all()
-    if not sanctions: return []
-
-    # Optimasi Deduplikasi
-    unique_sanction_map = {}
-    for s in sanctions:
-        s_name = get_sanction_name(s)
-        if not s_name: continue
-        norm = _normalize_name(s_name)
-        if norm not in unique_sanction_map:
-            unique_sanction_map[norm] = {
-                "id": s.id,
-                "name": s_name,
-                "name_norm": norm,
-                "dob_raw": s.date_of_birth_raw,
-                "cit_raw": s.citizenship,
-                "cit_norm": _normalize_country(s.citizenship),
-                "source": s.source.code if s.source else "UNKNOWN"
-            }
-            
-    sanction_list_data = list(unique_sanction_map.values())
-
-    matcher = HybridMatcher(sanction_list_data, name_key="name")
+    sanction_index = get_sanction_index(db)
+    if not len(sanction_index): return []
 
     query_data = {
         "name_norm": _normalize_name(query_name),
@@ -449,17 +827,51 @@ def search_single_entity(
     }
     
     thresholds = {"name": name_threshold, "final": final_threshold}
-    matches = []
+    matches, _ = _search_sanction_index(sanction_index, query_data, thresholds, limit)
+    return matches
 
-    candidate_idxs = matcher.stage1_gpu_filter(query_data["name_norm"])
-    for idx in candidate_idxs:
-        s_data = sanction_list_data[idx]
-        match = _match_single_entity(query_data, s_data, thresholds)
-        if match:
-            matches.append(match)
+def search_bulk_query(
+    sanction_index: SanctionIndex, q: Dict[str, Any], thresholds: Dict[str, float], limit: int,
+    name_hits: Dict[str, tuple[np.ndarray, np.ndarray]] | None = None,
+) -> Dict[str, Any]:
+    """
+    Hasil satu query bulk (`{"id", "name", "dob", "citizenship"}`) terhadap index yang sudah di-load.
+    `name_hits` = cache tahap nama per nama ter-normalisasi (lihat `search_bulk_queries`).
+    """
+    req_id = q.get("id")
+    req_name = q.get("name", "")
+
+    if not req_name:
+        return {"request_id": req_id, "matches": [], "error": "Name required"}
+
+    query_data = {
+        "name_norm": _normalize_name(req_name),
+        "dob": q.get("dob"),
+        "cit_raw": q.get("citizenship"),
+        "cit_norm": _normalize_country(q.get("citizenship"))
+    }
+
+    matches, match_count = _search_sanction_index(sanction_index, query_data, thresholds, limit, name_hits)
+
+    return {
+        "request_id": req_id,
+        "query_data": q,
+        "matches": matches,
+        "match_count": match_count
+    }
+
+
+def search_bulk_queries(
+    sanction_index: SanctionIndex, queries: List[Dict[str, Any]], thresholds: Dict[str, float], limit: int,
+) -> List[Dict[str, Any]]:
+    """
+    `search_bulk_query` untuk satu batch query (urutan hasil = urutan query).
+    Tahap nama (stage-1 + `cdist`) dihitung sekali per nama unik di batch;
+    hanya DOB/citizenship/final yang dihitung per query.
+    """
+    name_hits: Dict[str, tuple[np.ndarray, np.ndarray]] = {}
+    return [search_bulk_query(sanction_index, q, thresholds, limit, name_hits) for q in queries]
 
-    matches.sort(key=lambda m: m["final_score"], reverse=True)
-    return matches[:limit]
 
 def search_entities_bulk(
     db, queries: List[Dict[str, Any]], limit: int = 20,
@@ -468,61 +880,7 @@ def search_entities_bulk(
     
     if not queries: return []
 
-    # Optimasi Deduplikasi
-    sanctions_orm = db.query(SanctionEntity).filter(SanctionEntity.is_active.is_(True)).all()
-    unique_sanction_map = {}
-    
-    for s in sanctions_orm:
-        s_name = s.primary_name_normalized or _normalize_name(s.primary_name)
-        if s_name not in unique_sanction_map:
-            unique_sanction_map[s_name] = {
-                "id": s.id,
-                "name": s.primary_name,
-                "name_norm": s_name,
-                "dob_raw": s.date_of_birth_raw,
-                "cit_raw": s.citizenship,
-                "cit_norm": _normalize_country(s.citizenship),
-                "source": s.source.code if s.source else "UNKNOWN"
-            }
-            
-    sanction_list_data = list(unique_sanction_map.values())
-
-    matcher = HybridMatcher(sanction_list_data, name_key="name")
+    sanction_index = get_sanction_index(db)
 
     thresholds = {"name": name_threshold, "final": final_threshold}
-    bulk_results = []
-
-    for q in queries:
-        req_id = q.get("id")
-        req_name = q.get("name", "")
-        
-        if not req_name:
-            bulk_results.append({"request_id": req_id, "matches": [], "error": "Name required"})
-            continue
-
-        query_data = {
-            "name_norm": _normalize_name(req_name),
-            "dob": q.get("dob"),
-            "cit_raw": q.get("citizenship"),
-            "cit_norm": _normalize_country(q.get("citizenship"))
-        }
-        
-        matches = []
-
-        candidate_idxs = matcher.stage1_gpu_filter(query_data["name_norm"])
-        for idx in candidate_idxs:
-            s_data = sanction_list_data[idx]
-            match = _match_single_entity(query_data, s_data, thresholds)
-            if match:
-                matches.append(match)
-
-        matches.sort(key=lambda x: x["final_score"], reverse=True)
-        
-        bulk_results.append({
-            "request_id": req_id,
-            "query_data": q,
-            "matches": matches[:limit],
-            "match_count": len(matches)
-        })
-
-    return bulk_results
\ No newline at end of file
+    return search_bulk_queries(sanction_index, queries, thresholds, limit)
@@ -1,16 +1,137 @@
 from __future__ import annotations
 
+import codecs
+import os
 from datetime import datetime, timezone
-from typing import IO, Any
+from typing import IO, Any, Iterator, Sequence
 
 import pandas as pd
+from sqlalchemy import func, select, union
 
 from slis.models import UploadBatch, Transaction
-from slis.matching import normalize_name
+from slis.matching.geo import canonicalize_country_series
+from slis.matching.names import normalize_name_series
+from slis.services.bulk import bulk_insert_rows
 
 import io
 
 
+# Kolom yang dibutuhkan matcher saat screening (tanpa load ORM object penuh).
+SCREENING_TX_COLUMNS = (
+    Transaction.id,
+    Transaction.sender_name,
+    Transaction.sender_name_normalized,
+    Transaction.sender_dob,
+    Transaction.sender_country,
+    Transaction.sender_country_iso2,
+    Transaction.receiver_name,
+    Transaction.receiver_name_normalized,
+    Transaction.receiver_dob,
+    Transaction.receiver_country,
+    Transaction.receiver_country_iso2,
+    Transaction.destination_country,
+    Transaction.destination_country_iso2,
+)
+
+
+def iter_transaction_chunks(
+    db,
+    batch_id: int,
+    columns: Sequence[Any] = SCREENING_TX_COLUMNS,
+    chunk_size: int = 500,
+    after_id: int = 0,
+    upto_id: int | None = None,
+    limit: int | None = None,
+) -> Iterator[list[Any]]:
+    """
+    Stream transaksi satu batch per chunk dengan keyset pagination (`id > last_id`).
+
+    - Selalu ORDER BY id -> deterministik, dan tiap chunk memakai index PK
+      (tidak ada OFFSET yang makin mahal di batch besar).
+    - Hanya kolom `columns` yang di-fetch; hasil berupa Row (tuple) bukan ORM object.
+    - `after_id` / `upto_id` membatasi range id (eksklusif / inklusif).
+    """
+    cols = list(columns)
+    if Transaction.id not in cols:
+        cols.insert(0, Transaction.id)
+
+    last_id = after_id
+    remaining = limit
+    while True:
+        size = chunk_size if remaining is None else min(chunk_size, remaining)
+        if size <= 0:
+            return
+
+        stmt = (
+            select(*cols)
+            .where(Transaction.batch_id == batch_id, Transaction.id > last_id)
+            .order_by(Transaction.id.asc())
+            .limit(size)
+        )
+        if upto_id is not None:
+            stmt = stmt.where(Transaction.id <= upto_id)
+
+        rows = db.execute(stmt).all()
+        if not rows:
+            return
+
+        yield rows
+
+        last_id = rows[-1].id
+        if remaining is not None:
+            remaining -= len(rows)
+        if len(rows) < size:
+            return
+
+
+def distinct_party_names(
+    db,
+    batch_id: int,
+    after_id: int = 0,
+    upto_id: int | None = None,
+) -> list[tuple[str | None, str | None]]:
+    """
+    Pasangan (nama, nama_normalized) unik dari sender + receiver satu batch.
+
+    Satu `SELECT ... UNION SELECT ...` (UNION = DISTINCT) di database, sehingga
+    matcher cukup dipanggil sekali per nama, bukan per transaksi per role.
+    `after_id` / `upto_id` membatasi range id transaksi (eksklusif / inklusif).
+    """
+    conds = [Transaction.batch_id == batch_id, Transaction.id > after_id]
+    if upto_id is not None:
+        conds.append(Transaction.id <= upto_id)
+    sender = select(
+        Transaction.sender_name.label("name"),
+        Transaction.sender_name_normalized.label("name_normalized"),
+    ).where(*conds)
+    receiver = select(
+        Transaction.receiver_name.label("name"),
+        Transaction.receiver_name_normalized.label("name_normalized"),
+    ).where(*conds)
+    return [tuple(row) for row in db.execute(union(sender, receiver))]
+
+
+def plan_transaction_shards(db, batch_id: int, shard_count: int) -> list[tuple[int, int]]:
+    """
+    Bagi transaksi satu batch menjadi `shard_count` range id yang kira-kira sama besar.
+
+    Memakai window function `ntile` (satu query); hasil berupa list
+    (after_id, upto_id) untuk `iter_transaction_chunks`.
+    """
+    bucket = func.ntile(max(1, int(shard_count))).over(order_by=Transaction.id).label("bucket")
+    ranked = select(Transaction.id.label("id"), bucket).where(Transaction.batch_id == batch_id).subquery()
+    bounds = db.execute(
+        select(func.max(ranked.c.id)).group_by(ranked.c.bucket).order_by(func.max(ranked.c.id))
+    ).scalars().all()
+
+    shards: list[tuple[int, int]] = []
+    after_id = 0
+    for upto_id in bounds:
+        shards.append((after_id, int(upto_id)))
+        after_id = int(upto_id)
+    return shards
+
+
 def _clean_str(val: Any) -> str | None:
 
     if val is None:
@@ -61,6 +182,88 @@ def _parse_datetime_safe(val: Any, fmt: str = "%d-%m-%Y %H:%M:%S") -> datetime |
         return None
 
 
+# Kolom TXT -> kolom tabel `transaction` (nilai di-clean dengan `_clean_str_series`).
+TXT_COLUMN_MAP = (
+    ("FORM_NO", "form_no"),
+    ("SANDI_PELAPOR", "reporter_code"),
+    ("FORM_PERIOD", "form_period_raw"),
+    ("RECORD_NO", "record_no"),
+    ("KOTA_ASAL", "origin_city_code"),
+    ("NEGARA_TUJUAN", "destination_country"),
+    ("NAMA_PENGIRIM", "sender_name"),
+    ("NAMA_PENERIMA", "receiver_name"),
+    ("FREKUENSI", "frequency_raw"),
+    ("NOMINAL_TRX", "amount_raw"),
+    ("TUJUAN", "purpose_code"),
+    ("CREATED_DATE", "created_at_raw"),
+)
+
+TRANSACTION_INSERT_COLUMNS = (
+    "batch_id",
+    *(col for _, col in TXT_COLUMN_MAP),
+    "sender_name_normalized",
+    "receiver_name_normalized",
+    "amount",
+    "destination_country_iso2",
+)
+
+TXT_CHUNK_SIZE = int(os.getenv("SLIS_TXT_CHUNK_SIZE", "50000"))
+
+_INT_RE = r"^[+-]?\d+$"
+
+
+def _detect_encoding(raw_bytes: bytes, encodings: Sequence[str] = ("utf-8", "utf-16", "latin-1")) -> str | None:
+    """Encoding pertama yang bisa men-decode `raw_bytes` (hasil decode tidak disimpan)."""
+    for enc in encodings:
+        try:
+            decoder = codecs.getincrementaldecoder(enc)()
+            view = memoryview(raw_bytes)
+            step = 1 << 20
+            for pos in range(0, len(view), step):
+                decoder.decode(view[pos : pos + step])
+            decoder.decode(b"", final=True)
+            return enc
+        except UnicodeError:
+            continue
+    return None
+
+
+def _clean_str_series(col: pd.Series) -> pd.Series:
+    """Versi vektor dari `_clean_str` untuk satu kolom (NaN / "" -> None)."""
+    s = col.fillna("").astype(str).str.strip()
+    quoted = s.str.startswith('"') & s.str.endswith('"') & (s.str.len() >= 2)
+    if quoted.any():
+        s = s.where(~quoted, s.str[1:-1].str.strip())
+    return s.astype(object).where(s != "", None)
+
+
+def _parse_int_series(col: pd.Series) -> pd.Series:
+    """Versi vektor dari `_parse_int_safe` (input sudah di-clean); gagal -> None."""
+    s = col.fillna("")
+    ok = s.str.match(_INT_RE)
+    out = pd.Series([None] * len(s), index=s.index, dtype=object)
+    if ok.any():
+        out[ok] = [float(int(v)) for v in s[ok]]
+    return out
+
+
+def _transaction_frame(df: pd.DataFrame, batch_id: int) -> pd.DataFrame:
+    """Bangun frame siap-insert (urut `TRANSACTION_INSERT_COLUMNS`) dari satu chunk TXT."""
+    out = pd.DataFrame(index=df.index)
+    out["batch_id"] = batch_id
+    for txt_col, col in TXT_COLUMN_MAP:
+        if txt_col in df.columns:
+            out[col] = _clean_str_series(df[txt_col])
+        else:
+            out[col] = None
+    out["sender_name_normalized"] = normalize_name_series(out["sender_name"])
+    out["receiver_name_normalized"] = normalize_name_series(out["receiver_name"])
+    out["amount"] = _parse_int_series(out["amount_raw"])
+    # ISO-2 kanonik dihitung sekali di sini, bukan per pasangan saat screening
+    out["destination_country_iso2"] = canonicalize_country_series(out["destination_country"])
+    return out[list(TRANSACTION_INSERT_COLUMNS)]
+
+
 def create_transaction_batch(
     db,
     file_obj: IO[bytes] | IO[str],
@@ -75,8 +278,12 @@ def create_transaction_batch(
     KOTA_ASAL|NEGARA_TUJUAN|NAMA_PENERIMA|NAMA_PENGIRIM|
     FREKUENSI|NOMINAL_TRX|TUJUAN|CREATED_DATE
 
-    - Menggunakan pandas.read_csv untuk parsing cepat dan tahan terhadap bytes.
-    - Menyimpan data mentah + beberapa field yang sudah dinormalisasi.
+    - File dibaca per chunk (`SLIS_TXT_CHUNK_SIZE` baris) dengan parser C pandas.
+    - Clean / normalisasi nama / parse nominal dilakukan per kolom (vektor),
+      bukan per baris.
+    - Tiap chunk di-insert dengan COPY (PostgreSQL); batch + semua chunk
+      di-commit sekali di akhir, jadi file yang gagal di tengah tidak
+      meninggalkan transaksi parsial.
     """
 
     
@@ -88,102 +295,50 @@ def create_transaction_batch(
         row_count=0,
     )
     db.add(batch)
-    db.commit()
-    db.refresh(batch)
+    db.flush()
 
     
     if hasattr(file_obj, "seek"):
         file_obj.seek(0)
 
     raw_bytes = file_obj.read()
+    if isinstance(raw_bytes, str):
+        raw_bytes = raw_bytes.encode("utf-8")
     
     if not raw_bytes:
         batch.row_count = 0
         db.commit()
         return batch
     
-    content_str = ""
-    encodings = ['utf-8', 'utf-16', 'latin-1']
-    
-    for enc in encodings:
-        try:
-            content_str = raw_bytes.decode(enc)
-            break 
-        except ( UnicodeError):
-            continue
-    
-    if not content_str:
+    encoding = _detect_encoding(raw_bytes)
+    if not encoding:
+        db.rollback()
         raise ValueError("File encoding tidak didukung. Harap gunakan format UTF-8 atau UTF-16.")
 
-    
-    # raw_stream = getattr(file_obj, "stream", file_obj)
-
-    
+    row_count = 0
     try:
-        df = pd.read_csv(
-            io.StringIO(content_str),
+        reader = pd.read_csv(
+            io.BytesIO(raw_bytes),
             sep="|",
             dtype=str,
-            engine="python",
+            engine="c",
+            encoding=encoding,
+            chunksize=TXT_CHUNK_SIZE,
         )
-        df = df.fillna("")
-    except Exception as e:
+        for chunk in reader:
+            frame = _transaction_frame(chunk, batch.id)
+            row_count += bulk_insert_rows(
+                db,
+                Transaction.__table__,
+                TRANSACTION_INSERT_COLUMNS,
+                frame.itertuples(index=False, name=None),
+            )
+    except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeError) as e:
+        db.rollback()
         raise ValueError(f"Gagal memproses struktur file: {str(e)}")
-
-    rows_to_insert: list[Transaction] = []
-    row_count = 0
-
-    
-    for _, row in df.iterrows():
-        form_no = _clean_str(row.get("FORM_NO"))
-        sandi_pelapor = _clean_str(row.get("SANDI_PELAPOR"))
-        form_period_raw = _clean_str(row.get("FORM_PERIOD"))
-        record_no = _clean_str(row.get("RECORD_NO"))
-        kota_asal = _clean_str(row.get("KOTA_ASAL"))
-        negara_tujuan = _clean_str(row.get("NEGARA_TUJUAN"))
-        nama_penerima = _clean_str(row.get("NAMA_PENERIMA"))
-        nama_pengirim = _clean_str(row.get("NAMA_PENGIRIM"))
-        frekuensi_raw = _clean_str(row.get("FREKUENSI"))
-        nominal_trx_raw = _clean_str(row.get("NOMINAL_TRX"))
-        tujuan = _clean_str(row.get("TUJUAN"))
-        created_date_raw = _clean_str(row.get("CREATED_DATE"))
-
-        amount = _parse_int_safe(nominal_trx_raw)
-
-        sender_norm = normalize_name(nama_pengirim)
-        receiver_norm = normalize_name(nama_penerima)
-
-        tx = Transaction(
-            batch_id=batch.id,
-            form_no=form_no,
-            reporter_code=sandi_pelapor,
-            form_period_raw=form_period_raw,
-            record_no=record_no,
-            origin_city_code=kota_asal,
-            destination_country=negara_tujuan,
-            sender_name=nama_pengirim,
-            sender_name_normalized=sender_norm,
-            receiver_name=nama_penerima,
-            receiver_name_normalized=receiver_norm,
-            frequency_raw=frekuensi_raw,
-            amount_raw=nominal_trx_raw,
-            amount=amount,
-            purpose_code=tujuan,
-            created_at_raw=created_date_raw,
-        )
-
-        rows_to_insert.append(tx)
-        row_count += 1
-
-        if len(rows_to_insert) >= 1000:
-            db.bulk_save_objects(rows_to_insert)
-            db.commit()
-            rows_to_insert.clear()
-
-    
-    if rows_to_insert:
-        db.bulk_save_objects(rows_to_insert)
-        db.commit()
+    except BaseException:
+        db.rollback()
+        raise
 
     
     batch.row_count = row_count
@@ -1,27 +1,51 @@
 from __future__ import annotations
 
+import math
+import os
+import time
 from datetime import datetime, timezone
+from celery import chord, group
+from celery.utils import uuid
 from celery.utils.log import get_task_logger
+from sqlalchemy import func
 
 # Import Celery app dengan alias
 from slis.celery_app import celery_app as celery
 from slis.db import SessionLocal
 from slis.models import (
     ScreeningJob,
-    Transaction,
-    SanctionEntity,
+    ScreeningJobShard,
     ScreeningResult,
+    Transaction,
 )
 from slis.matching.names import (
     normalize_name,
     calculate_advanced_name_score_normed,
-    HybridMatcher,
 )
-from slis.matching.geo import generate_geographic_insights
-from slis.matching.dob import calculate_dob_score_flexible
+from slis.matching.geo import country_code, geographic_insights_for_codes
+from slis.matching.dob import (
+    calculate_dob_score_parsed,
+    is_flexible_year_source,
+    parse_dob_parts,
+)
+from slis.matching.parallel import parallel_matcher
+from slis.services.sanction_index import get_job_sanction_index
+from slis.services.screening import (
+    JOB_TOP_K,
+    add_delta_matches_to_parent,
+    match_distinct_party_names,
+    result_job_ids,
+)
+from slis.services.pipeline import open_result_sink, open_transaction_chunks
+from slis.services.transactions import plan_transaction_shards
+from slis.services.match_cache import MatchCache
 
 logger = get_task_logger(__name__)
 
+# Sharding job besar: jumlah transaksi per shard (0 = nonaktif) dan batas jumlah shard.
+SHARD_SIZE = int(os.getenv("SLIS_SHARD_SIZE", "0"))
+MAX_SHARDS = int(os.getenv("SLIS_MAX_SHARDS", "32"))
+
 def compute_component_weights(has_dob: bool, has_citizenship: bool) -> tuple[float, float, float]:
     if has_dob and has_citizenship:
         return 0.50, 0.35, 0.15
@@ -53,92 +77,172 @@ def determine_scheme_name(has_dob: bool, has_citizenship: bool) -> str:
     else:
         return "NAME_ONLY"
     
-def normalize_country_code(val: str | None) -> str | None:
-    """Helper sederhana untuk normalisasi kode negara (lowercasing)."""
-    if not val: return None
-    return str(val).lower().strip()
-
-@celery.task(bind=True, name="slis.run_screening_task")
-def run_screening_task(self, job_id: int) -> dict:
-    """
-    Screening job utama dengan batch processing manual (tanpa yield_per).
-    """
-    db = SessionLocal()
+def _mark_job_failed(db, job_id: int, e: Exception) -> None:
+    db.rollback()
+    logger.exception(f"[job={job_id}] Failed: {e}")
     try:
         job = db.get(ScreeningJob, job_id)
-        if not job:
-            raise ValueError(f"screening_job id={job_id} not found")
-
-        logger.info(f"[job={job_id}] Starting screening task")
-
-        # 1. Update status awal
-        job.celery_task_id = self.request.id
-        job.status = "RUNNING"
-        job.started_at = datetime.now(timezone.utc)
-        db.commit()
-
-        # Threshold settings
-        name_threshold = job.threshold_name_score or 70.0
-        final_threshold = job.threshold_score or 60.0
-
-        # 2. Hitung Total Transaksi
-        tx_query_base = db.query(Transaction).filter(Transaction.batch_id == job.batch_id)
-        total_transactions = tx_query_base.count()
-
-        # 3. Load Sanctions ke Memory (Optimasi)
-        sanctions_orm = db.query(SanctionEntity).filter(SanctionEntity.is_active.is_(True)).all()
-        
-        sanction_rows = []
-        for s in sanctions_orm:
-            norm_name = s.primary_name_normalized or normalize_name(s.primary_name)
-            sanction_rows.append({
-                "id": s.id,
-                "source_id": s.source_id,
-                "snapshot_id": s.snapshot_id,
-                "primary_name": s.primary_name,
-                "name": s.primary_name,
-                "name_norm": norm_name,
-                "dob_raw": s.date_of_birth_raw,
-                "citizenship": s.citizenship,
-                "citizenship_norm": s.citizenship_normalized or normalize_country_code(s.citizenship),
-                "source_code": s.source.code if getattr(s, "source", None) else "UNKNOWN",
-            })
-
-        matcher = HybridMatcher(sanction_rows, name_key="primary_name")
-
-        # Update info job
-        job.total_transactions = total_transactions
-        job.total_sanctions = len(sanction_rows)
-        db.commit()
+        if job:
+            job.status = "FAILURE"
+            job.error_message = str(e)
+            job.finished_at = datetime.now(timezone.utc)
+            db.commit()
+    except Exception:
+        pass
+
+
+def _add_job_progress(db, job_id: int, processed: int, matches: int) -> None:
+    """Tambah progress job secara atomik di DB (tanpa commit)."""
+    (
+        db.query(ScreeningJob)
+        .filter(ScreeningJob.id == job_id)
+        .update(
+            {
+                ScreeningJob.processed_transactions: func.coalesce(ScreeningJob.processed_transactions, 0) + processed,
+                ScreeningJob.total_matches: func.coalesce(ScreeningJob.total_matches, 0) + matches,
+                ScreeningJob.progress_percentage: (
+                    (func.coalesce(ScreeningJob.processed_transactions, 0) + processed) * 100.0
+                    / func.coalesce(func.nullif(ScreeningJob.total_transactions, 0), 1)
+                ),
+            },
+            synchronize_session=False,
+        )
+    )
+
+
+def _add_shard_progress(db, shard_id: int, job_id: int, processed: int, matches: int) -> None:
+    """Tambah progress shard + job induk secara atomik di DB (tanpa commit)."""
+    (
+        db.query(ScreeningJobShard)
+        .filter(ScreeningJobShard.id == shard_id)
+        .update(
+            {
+                ScreeningJobShard.processed_transactions: func.coalesce(ScreeningJobShard.processed_transactions, 0) + processed,
+                ScreeningJobShard.total_matches: func.coalesce(ScreeningJobShard.total_matches, 0) + matches,
+            },
+            synchronize_session=False,
+        )
+    )
+    _add_job_progress(db, job_id, processed, matches)
+
+
+def _save_checkpoint(db, job_id: int, last_transaction_id: int, processed: int, matches: int, total: int) -> None:
+    """Simpan checkpoint + progress absolut job (tanpa commit; ikut transaksi flush hasil)."""
+    (
+        db.query(ScreeningJob)
+        .filter(ScreeningJob.id == job_id)
+        .update(
+            {
+                ScreeningJob.checkpoint_transaction_id: last_transaction_id,
+                ScreeningJob.processed_transactions: processed,
+                ScreeningJob.total_matches: matches,
+                ScreeningJob.progress_percentage: processed * 100.0 / (total or 1),
+            },
+            synchronize_session=False,
+        )
+    )
+
+
+def _discard_results_after(
+    db, job: ScreeningJob, after_transaction_id: int, upto_transaction_id: int | None = None
+) -> int:
+    """Hapus hasil job untuk transaksi di (after, upto] (sisa run yang terputus)."""
+    result_job_id, delta_job_id = result_job_ids(job)
+    q = db.query(ScreeningResult).filter(
+        ScreeningResult.job_id == result_job_id,
+        ScreeningResult.transaction_id > after_transaction_id,
+    )
+    if upto_transaction_id is not None:
+        q = q.filter(ScreeningResult.transaction_id <= upto_transaction_id)
+    if delta_job_id is None:
+        q = q.filter(ScreeningResult.delta_job_id.is_(None))
+    else:
+        q = q.filter(ScreeningResult.delta_job_id == delta_job_id)
+    return q.delete(synchronize_session=False)
+
+
+def _screen_transaction_range(
+    task,
+    db,
+    job: ScreeningJob,
+    sanction_index,
+    match_cache: MatchCache,
+    total_transactions: int,
+    after_id: int = 0,
+    upto_id: int | None = None,
+    processed_count: int = 0,
+    total_matches: int = 0,
+    shard_id: int | None = None,
+) -> dict:
+    """
+    Screening transaksi batch `job` dengan id di (after_id, upto_id].
+
+    `task` = task Celery untuk progress di Redis (job tunggal); None untuk
+    shard (`shard_id`), yang progress-nya di-increment langsung ke baris
+    `screening_job_shard` dan `screening_job`.
+    Hasil di-commit per chunk; job tunggal juga menyimpan checkpoint di commit
+    yang sama. `processed_count`/`total_matches` = counter awal saat resume.
+    Return {"status", "processed", "matches"}.
+    """
+    job_id = job.id
+    matcher = sanction_index.matcher
+    result_job_id, delta_job_id = result_job_ids(job)
+    name_threshold = job.threshold_name_score or 70.0
+    final_threshold = job.threshold_score or 60.0
 
-        # Inisialisasi State di Redis (0%)
-        self.update_state(state='PROGRESS', meta={
-            'current': 0,
+    def _progress_meta(**extra) -> dict:
+        return {
+            'current': processed_count,
             'total': total_transactions,
-            'percent': 0,
-            'matches': 0
-        })
-
-        logger.info(f"[job={job_id}] Loaded {total_transactions} tx, {len(sanction_rows)} sanctions")
-
-        # 4. LOOP PROCESS (MANUAL BATCHING)
-        # Menggantikan yield_per yang error
-        BATCH_SIZE = 100
-        offset = 0
-        
-        processed_count = 0
-        total_matches = 0
-        results_bulk = []
-        
-        # Logic frekuensi update progress bar
-        update_frequency = 1 if total_transactions < 100 else 50
-
-        while True:
-            # Ambil chunk data (Pagination)
-            tx_chunk = tx_query_base.limit(BATCH_SIZE).offset(offset).all()
-            
-            if not tx_chunk: break
+            'percent': int((processed_count / (total_transactions or 1)) * 100),
+            'matches': total_matches,
+            **extra,
+        }
 
+    def _on_name_chunk(names_done: int, names_total: int) -> bool:
+        # Pass nama unik bisa makan hampir seluruh durasi job: cek cancel + laporkan progress per chunk
+        db.expire(job)
+        if job.status == "CANCELED":
+            return False
+        if task is not None:
+            task.update_state(state='PROGRESS', meta=_progress_meta(
+                phase='matching_names', names_done=names_done, names_total=names_total
+            ))
+        return True
+
+    # Match setiap nama unik di range sekali (SELECT DISTINCT), lalu fan-out per transaksi
+    with parallel_matcher(matcher) as scoring_matcher:
+        name_hits = match_distinct_party_names(
+            db,
+            job.batch_id,
+            scoring_matcher,
+            match_cache,
+            lambda name, name_normalized: (name_normalized or normalize_name(name)) if name else None,
+            after_id=after_id,
+            upto_id=upto_id,
+            on_chunk=_on_name_chunk,
+        )
+    if name_hits is None:
+        logger.info(f"[job={job_id}] Canceled by user (match nama unik)")
+        if task is not None:
+            task.update_state(state='REVOKED', meta=_progress_meta())
+        return {"status": "CANCELED", "processed": processed_count, "matches": total_matches}
+    logger.info(f"[job={job_id}] {len(name_hits)} nama unik lolos threshold nama, match_cache={match_cache.stats()}")
+
+    # LOOP PROCESS (keyset pagination, hanya kolom yang dibutuhkan)
+    BATCH_SIZE = 100
+
+    # Logic frekuensi update progress bar
+    update_frequency = 1 if total_transactions < 100 else 50
+
+    # Pipeline (SLIS_PIPELINE_DEPTH > 0): reader thread -> scoring (thread ini) -> writer thread
+    tx_chunks = open_transaction_chunks(
+        db, SessionLocal, job.batch_id, chunk_size=BATCH_SIZE, after_id=after_id, upto_id=upto_id
+    )
+    results_sink = open_result_sink(db, SessionLocal)
+    try:
+        for tx_chunk in tx_chunks:
+            chunk_matches_before = total_matches
             for tx in tx_chunk:
                 processed_count += 1
 
@@ -147,14 +251,11 @@ def run_screening_task(self, job_id: int) -> dict:
                     db.expire(job)
                     if job.status == "CANCELED":
                         logger.info(f"[job={job_id}] Canceled by user")
-                        self.update_state(state='REVOKED', meta={
-                            'current': processed_count,
-                            'total': total_transactions,
-                            'percent': int((processed_count / (total_transactions or 1)) * 100),
-                            'matches': total_matches
-                        })
-                        return {"job_id": job_id, "status": "CANCELED"}
-                
+                        if task is not None:
+                            task.update_state(state='REVOKED', meta=_progress_meta())
+                        results_sink.close()
+                        return {"status": "CANCELED", "processed": processed_count, "matches": total_matches}
+
                 # Cek Sender dan Receiver
                 parties = [
                     {
@@ -162,137 +263,265 @@ def run_screening_task(self, job_id: int) -> dict:
                         "raw_name": tx.sender_name,
                         "norm_name": tx.sender_name_normalized,
                         "dob": tx.sender_dob,
-                        "country": tx.sender_country
+                        "country": tx.sender_country,
+                        "country_iso2": tx.sender_country_iso2,
                     },
                     {
                         "role": "receiver",
                         "raw_name": tx.receiver_name,
                         "norm_name": tx.receiver_name_normalized,
                         "dob": tx.receiver_dob,
-                        "country": tx.receiver_country
+                        "country": tx.receiver_country,
+                        "country_iso2": tx.receiver_country_iso2,
                     }
                 ]
 
                 for p in parties:
                     raw_name = p["raw_name"]
                     norm_name = p["norm_name"]
-                    
+
                     if not raw_name: continue
                     target_norm = norm_name or normalize_name(raw_name)
                     if not target_norm: continue
 
                     # Data Transaksi untuk Matching
                     tx_dob_val = p["dob"]
-                    tx_country_norm = normalize_country_code(p["country"])
-
-                    best = matcher.best_match_normed(target_norm, threshold=float(name_threshold))
-                    if not best:
-                        continue
-
-                    idx = int(best["index"])
-                    s = sanction_rows[idx]
-                    name_score = float(best["scores"]["final"])
-
-                    # 2. DOB Score Logic
-                    dob_score = 0.0
-                    has_dob = False
-                    dob_match_type = None
-
-                    # Hanya hitung jika kedua pihak punya data DOB
-                    if tx_dob_val and s["dob_raw"]:
-                        score, desc = calculate_dob_score_flexible(
-                            str(tx_dob_val),
-                            str(s["dob_raw"]),
-                            s["source_code"],
+                    # Kode citizenship index (ISO-2 kanonik); 0 = kosong, -1 = tidak ada di index
+                    tx_cit_code = sanction_index.citizenship_code(p["country"], p["country_iso2"])
+
+                    for best in name_hits.get(target_norm, ()):
+                        idx = int(best["index"])
+                        s = sanction_index.row(idx)
+                        name_score = float(best["scores"]["final"])
+
+                        # 2. DOB Score Logic
+                        dob_score = 0.0
+                        has_dob = False
+                        dob_match_type = None
+
+                        # Hanya hitung jika kedua pihak punya data DOB
+                        # (DOB sanksi sudah ter-parse di index; DOB transaksi lewat parser ter-memoize)
+                        if tx_dob_val and s["dob_raw"]:
+                            flexible_years = is_flexible_year_source(s["source_code"])
+                            score, desc = calculate_dob_score_parsed(
+                                parse_dob_parts(str(tx_dob_val)),
+                                sanction_index.dob_parts(idx),
+                                sanction_index.dob_years(idx) if flexible_years else (),
+                                flexible_years,
+                            )
+                            dob_score = float(score)
+                            dob_match_type = desc
+                            has_dob = True
+
+                        # 3. Citizenship Score Logic
+                        citizenship_score = 0.0
+                        has_cit = False
+                        matched_citizenship_val = None
+
+                        # Hanya hitung jika kedua pihak punya data Country
+                        s_cit_code = int(sanction_index.columns["citizenship_code"][idx])
+                        if tx_cit_code and s_cit_code:
+                            # Exact match pada kode negara kanonik (ISO-2) sebagai integer
+                            if tx_cit_code == s_cit_code:
+                                citizenship_score = 100.0
+                                matched_citizenship_val = s["citizenship"]  # Simpan nilai asli
+                            has_cit = True
+
+                        # 4. Final Score & Scheme Dynamic
+                        final_score = compute_final_score(
+                            name_score, dob_score, citizenship_score, has_dob, has_cit
+                        )
+
+                        scheme_name = determine_scheme_name(has_dob, has_cit)
+
+                        if final_score < final_threshold:
+                            continue
+
+                        # 5. Geographic Insights (ISO-2 tersimpan dipakai bila ada)
+                        geo_insights = list(
+                            geographic_insights_for_codes(
+                                country_code(p["country_iso2"] or p["country"]),
+                                country_code(tx.destination_country_iso2 or tx.destination_country),
+                                0,
+                                country_code(s["citizenship"]),
+                            )
+                        )
+
+                        total_matches += 1
+
+                        results_sink.add(
+                            job_id=result_job_id,
+                            delta_job_id=delta_job_id,
+                            transaction_id=tx.id,
+                            sanction_entity_id=s["id"],
+                            sanction_source_id=s["source_id"],
+                            sanction_snapshot_id=s["snapshot_id"],
+
+                            target_role=p["role"],
+                            target_name=raw_name,
+                            target_name_normalized=target_norm,
+                            target_country=tx.destination_country,
+
+                            sanction_name=s["name"],
+                            sanction_name_normalized=s["name_norm"],
+                            sanction_dob_raw=s["dob_raw"],
+                            sanction_citizenship=s["citizenship"],
+
+                            name_score=name_score,
+                            dob_score=dob_score,
+                            citizenship_score=citizenship_score,
+                            final_score=final_score,
+
+                            # Simpan metadata dinamis
+                            dob_match_type=dob_match_type,
+                            matched_dob_text=tx_dob_val if has_dob else None,
+                            matched_citizenship=matched_citizenship_val,
+                            weighting_scheme=scheme_name,  # <--- INI SEKARANG DINAMIS
+                            geographic_insights=geo_insights,
                         )
-                        dob_score = float(score)
-                        dob_match_type = desc
-                        has_dob = True
-
-                    # 3. Citizenship Score Logic
-                    citizenship_score = 0.0
-                    has_cit = False
-                    matched_citizenship_val = None
-
-                    # Hanya hitung jika kedua pihak punya data Country
-                    if tx_country_norm and s["citizenship_norm"]:
-                        # Exact match pada kode negara yang sudah dinormalisasi (iso2/lower)
-                        if tx_country_norm == s["citizenship_norm"]:
-                            citizenship_score = 100.0
-                            matched_citizenship_val = s["citizenship"]  # Simpan nilai asli
-                        has_cit = True
-
-                    # 4. Final Score & Scheme Dynamic
-                    final_score = compute_final_score(
-                        name_score, dob_score, citizenship_score, has_dob, has_cit
-                    )
-
-                    scheme_name = determine_scheme_name(has_dob, has_cit)
-
-                    if final_score < final_threshold:
-                        continue
-
-                    # 5. Geographic Insights
-                    customer_geo = {
-                        "Citizenship": p["country"],
-                        "Country_of_Residence": tx.destination_country,
-                        "Place_of_Birth": None,
-                    }
-                    sanction_geo = {"Citizenship": s["citizenship"]}
-                    geo_insights = generate_geographic_insights(customer_geo, sanction_geo)
-
-                    total_matches += 1
-
-                    sr = ScreeningResult(
-                        job_id=job.id,
-                        transaction_id=tx.id,
-                        sanction_entity_id=s["id"],
-                        sanction_source_id=s["source_id"],
-                        sanction_snapshot_id=s["snapshot_id"],
-
-                        target_role=p["role"],
-                        target_name=raw_name,
-                        target_name_normalized=target_norm,
-                        target_country=tx.destination_country,
-
-                        sanction_name=s["name"],
-                        sanction_name_normalized=s["name_norm"],
-                        sanction_dob_raw=s["dob_raw"],
-                        sanction_citizenship=s["citizenship"],
-
-                        name_score=name_score,
-                        dob_score=dob_score,
-                        citizenship_score=citizenship_score,
-                        final_score=final_score,
-
-                        # Simpan metadata dinamis
-                        dob_match_type=dob_match_type,
-                        matched_dob_text=tx_dob_val if has_dob else None,
-                        matched_citizenship=matched_citizenship_val,
-                        weighting_scheme=scheme_name,  # <--- INI SEKARANG DINAMIS
-                        geographic_insights=geo_insights,
-                    )
-                    results_bulk.append(sr)
 
                 # Update Progress ke Redis
-                if processed_count % update_frequency == 0 or processed_count == total_transactions:
-                    safe_total = total_transactions if total_transactions > 0 else 1
-                    percent = int((processed_count / safe_total) * 100)
-                    self.update_state(state='PROGRESS', meta={
-                        'current': processed_count,
-                        'total': total_transactions,
-                        'percent': percent,
-                        'matches': total_matches
-                    })
-
-            # Flush DB per batch
-            if len(results_bulk) > 0:
-                db.bulk_save_objects(results_bulk)
-                db.commit()
-                results_bulk = [] # Kosongkan list untuk batch berikutnya
-            
-            # Geser offset untuk batch selanjutnya
-            offset += BATCH_SIZE
+                if task is not None and (processed_count % update_frequency == 0 or processed_count == total_transactions):
+                    task.update_state(state='PROGRESS', meta=_progress_meta(match_cache=match_cache.stats()))
+
+            # Flush DB per chunk (COPY); progress shard di-increment atomik / checkpoint
+            # job tunggal disimpan di transaksi yang sama dengan hasil chunk ini
+            if task is None:
+                chunk_processed = len(tx_chunk)
+                chunk_matches = total_matches - chunk_matches_before
+                on_commit = lambda session, n=chunk_processed, m=chunk_matches: _add_shard_progress(
+                    session, shard_id, job_id, n, m
+                )
+            else:
+                on_commit = lambda session, last_id=tx_chunk[-1].id, n=processed_count, m=total_matches: _save_checkpoint(
+                    session, job_id, last_id, n, m, total_transactions
+                )
+            results_sink.commit_chunk(on_commit)
+
+        results_sink.close()
+    except BaseException:
+        results_sink.abort()
+        raise
+    finally:
+        tx_chunks.close()
+
+    return {"status": "SUCCESS", "processed": processed_count, "matches": total_matches}
+
+
+@celery.task(bind=True, name="slis.run_screening_task", acks_late=True, reject_on_worker_lost=True)
+def run_screening_task(self, job_id: int) -> dict:
+    """
+    Screening job utama dengan batch processing manual (tanpa yield_per).
+
+    acks_late: bila worker mati di tengah job, message dikirim ulang dan task
+    melanjutkan dari `checkpoint_transaction_id` (paling banyak satu chunk diulang).
+    """
+    db = SessionLocal()
+    try:
+        job = db.get(ScreeningJob, job_id)
+        if not job:
+            raise ValueError(f"screening_job id={job_id} not found")
+        if job.status in ("SUCCESS", "CANCELED"):
+            logger.info(f"[job={job_id}] Already {job.status}, skipping redelivered task")
+            return {"job_id": job_id, "status": job.status}
+
+        # Job sudah dipecah ke chord shard (baris shard ditulis sebelum chord dikirim):
+        # shard di-resume sendiri (acks_late), jangan buang hasil / kirim chord kedua
+        shard_total = db.query(ScreeningJobShard).filter(ScreeningJobShard.job_id == job_id).count()
+        if job.status == "RUNNING" and shard_total:
+            logger.info(
+                f"[job={job_id}] Already dispatched as chord {job.celery_task_id} ({shard_total} shards), "
+                f"skipping redelivered task"
+            )
+            return {"job_id": job_id, "status": "SHARDED", "shards": shard_total}
+
+        # Status masih RUNNING = run sebelumnya terputus (worker mati) -> resume dari checkpoint
+        resume_after_id = 0
+        resume_processed = 0
+        resume_matches = 0
+        if job.status == "RUNNING":
+            resume_after_id = job.checkpoint_transaction_id or 0
+            if resume_after_id:
+                resume_processed = job.processed_transactions or 0
+                resume_matches = job.total_matches or 0
+            discarded = _discard_results_after(db, job, resume_after_id)
+            logger.info(
+                f"[job={job_id}] Resuming after tx {resume_after_id} "
+                f"(processed={resume_processed}, matches={resume_matches}, discarded {discarded} partial results)"
+            )
+        else:
+            logger.info(f"[job={job_id}] Starting screening task")
+            job.checkpoint_transaction_id = None
+            db.query(ScreeningJobShard).filter(ScreeningJobShard.job_id == job_id).delete(synchronize_session=False)
+            job.started_at = datetime.now(timezone.utc)
+
+        # 1. Update status awal
+        job.celery_task_id = self.request.id
+        job.status = "RUNNING"
+        db.commit()
+
+        # Threshold settings
+        name_threshold = job.threshold_name_score or 70.0
+
+        # 2. Hitung Total Transaksi
+        tx_query_base = db.query(Transaction).filter(Transaction.batch_id == job.batch_id)
+        total_transactions = tx_query_base.count()
+
+        # 3. Load Sanctions: index ter-mmap bersama (build sekali per snapshot set aktif),
+        #    atau index kecil berisi entity baru saja untuk delta job
+        sanction_index = get_job_sanction_index(db, job)
+        match_cache = MatchCache(sanction_index.key, float(name_threshold), top_k=JOB_TOP_K)
+
+        # Update info job
+        job.total_transactions = total_transactions
+        job.total_sanctions = len(sanction_index)
+        db.commit()
+
+        # Job besar: pecah per range id dan jalankan paralel (chord shard -> finalize)
+        shard_count = min(MAX_SHARDS, math.ceil(total_transactions / SHARD_SIZE)) if SHARD_SIZE > 0 else 1
+        if shard_count > 1 and not resume_after_id:
+            shards = plan_transaction_shards(db, job.batch_id, shard_count)
+            job.processed_transactions = 0
+            job.total_matches = 0
+            job.progress_percentage = 0.0
+            # Baris shard + id task finalize di-commit sebelum chord dikirim: task ini
+            # yang dikirim ulang melihat penanda ini dan tidak mengirim chord kedua.
+            # Progress dibaca dari task finalize (PENDING -> fallback ke kolom DB).
+            db.add_all(ScreeningJobShard(job_id=job_id, after_id=a, upto_id=u) for a, u in shards)
+            job.celery_task_id = uuid()
+            db.commit()
+
+            header = group(run_screening_shard.s(job_id, after_id, upto_id) for after_id, upto_id in shards)
+            chord(header)(finalize_screening_job.s(job_id).set(task_id=job.celery_task_id))
+            logger.info(f"[job={job_id}] Dispatched {len(shards)} shards for {total_transactions} tx")
+            return {"job_id": job_id, "status": "SHARDED", "shards": len(shards)}
+
+        # Inisialisasi State di Redis (0% / posisi checkpoint)
+        self.update_state(state='PROGRESS', meta={
+            'current': resume_processed,
+            'total': total_transactions,
+            'percent': int((resume_processed / (total_transactions or 1)) * 100),
+            'matches': resume_matches
+        })
+
+        logger.info(f"[job={job_id}] Loaded {total_transactions} tx, {len(sanction_index)} sanctions (index {sanction_index.key})")
+
+        # 4. Screening seluruh batch di task ini
+        outcome = _screen_transaction_range(
+            self,
+            db,
+            job,
+            sanction_index,
+            match_cache,
+            total_transactions,
+            after_id=resume_after_id,
+            processed_count=resume_processed,
+            total_matches=resume_matches,
+        )
+        if outcome["status"] == "CANCELED":
+            return {"job_id": job_id, "status": "CANCELED"}
+        processed_count = outcome["processed"]
+        total_matches = outcome["matches"]
 
         # 5. Update Status Akhir
         # Refresh object job agar session sync
@@ -303,29 +532,163 @@ def run_screening_task(self, job_id: int) -> dict:
         job.status = "SUCCESS"
         job.finished_at = datetime.now(timezone.utc)
         job.progress_percentage = 100.0
+        add_delta_matches_to_parent(db, job, total_matches)
         db.commit()
 
         logger.info(f"[job={job_id}] Finished. Tx={total_transactions}, Matches={total_matches}")
+        logger.info(f"[job={job_id}] Match cache: {match_cache.stats()}")
 
         return {
             "job_id": job_id,
             "status": "SUCCESS",
-            "matches": total_matches
+            "matches": total_matches,
+            "match_cache": match_cache.stats(),
+        }
+
+    except Exception as e:
+        _mark_job_failed(db, job_id, e)
+        raise e
+
+    finally:
+        db.close()
+
+
+def _start_shard(db, job: ScreeningJob, after_id: int, upto_id: int) -> ScreeningJobShard:
+    """
+    Ambil baris shard dan tandai RUNNING. Bila shard sudah pernah jalan
+    (message dikirim ulang), hasil di range-nya dihapus dan kontribusi
+    progress-nya ditarik dari job sebelum range di-screening ulang; shard
+    yang sudah DONE dikembalikan apa adanya.
+    """
+    shard = (
+        db.query(ScreeningJobShard)
+        .filter(ScreeningJobShard.job_id == job.id, ScreeningJobShard.after_id == after_id)
+        .one_or_none()
+    )
+    if shard is None:
+        shard = ScreeningJobShard(job_id=job.id, after_id=after_id, upto_id=upto_id)
+        db.add(shard)
+    elif shard.status == "DONE":
+        return shard
+    elif shard.status != "PENDING":
+        discarded = _discard_results_after(db, job, after_id, upto_id)
+        _add_job_progress(db, job.id, -(shard.processed_transactions or 0), -(shard.total_matches or 0))
+        logger.info(
+            f"[job={job.id}] Shard ({after_id}, {upto_id}] redelivered: discarded {discarded} results, "
+            f"processed={shard.processed_transactions}, matches={shard.total_matches}"
+        )
+    shard.status = "RUNNING"
+    shard.processed_transactions = 0
+    shard.total_matches = 0
+    db.commit()
+    return shard
+
+
+@celery.task(
+    bind=True, name="slis.run_screening_shard", acks_late=True, reject_on_worker_lost=True
+)
+def run_screening_shard(self, job_id: int, after_id: int, upto_id: int) -> dict:
+    """
+    Satu shard job: screening transaksi batch dengan id di (after_id, upto_id].
+
+    Index sanction di-load dari cache/mmap bersama; hasil ditulis langsung
+    (COPY) dan progress di-increment ke `screening_job_shard`/`screening_job`.
+    acks_late: shard yang terputus dikirim ulang dan men-screening ulang
+    seluruh range-nya (sisa run sebelumnya dibuang dulu, lihat `_start_shard`).
+    """
+    db = SessionLocal()
+    started = time.monotonic()
+    try:
+        job = db.get(ScreeningJob, job_id)
+        if not job:
+            raise ValueError(f"screening_job id={job_id} not found")
+        if job.status == "CANCELED":
+            return {"status": "CANCELED", "processed": 0, "matches": 0}
+
+        shard = _start_shard(db, job, after_id, upto_id)
+        if shard.status == "DONE":
+            logger.info(f"[job={job_id}] Shard ({after_id}, {upto_id}] already done, skipping redelivered task")
+            return {
+                "status": "SUCCESS",
+                "processed": shard.processed_transactions or 0,
+                "matches": shard.total_matches or 0,
+                "after_id": after_id,
+                "upto_id": upto_id,
+            }
+
+        sanction_index = get_job_sanction_index(db, job)
+        match_cache = MatchCache(sanction_index.key, float(job.threshold_name_score or 70.0), top_k=JOB_TOP_K)
+        outcome = _screen_transaction_range(
+            None,
+            db,
+            job,
+            sanction_index,
+            match_cache,
+            job.total_transactions or 0,
+            after_id=after_id,
+            upto_id=upto_id,
+            shard_id=shard.id,
+        )
+        shard.status = "DONE" if outcome["status"] == "SUCCESS" else outcome["status"]
+        db.commit()
+        outcome.update(
+            after_id=after_id,
+            upto_id=upto_id,
+            seconds=round(time.monotonic() - started, 3),
+            match_cache=match_cache.stats(),
+        )
+        logger.info(f"[job={job_id}] Shard ({after_id}, {upto_id}] done: {outcome}")
+        return outcome
+
+    except Exception as e:
+        _mark_job_failed(db, job_id, e)
+        raise e
+
+    finally:
+        db.close()
+
+
+@celery.task(name="slis.finalize_screening_job")
+def finalize_screening_job(shard_results: list[dict], job_id: int) -> dict:
+    """Callback chord: agregasi hasil semua shard ke `screening_job`."""
+    processed_count = sum(int(r.get("processed", 0)) for r in shard_results)
+    total_matches = sum(int(r.get("matches", 0)) for r in shard_results)
+    shard_seconds = [float(r.get("seconds", 0.0)) for r in shard_results]
+
+    db = SessionLocal()
+    try:
+        job = db.get(ScreeningJob, job_id)
+        if not job:
+            raise ValueError(f"screening_job id={job_id} not found")
+
+        canceled = job.status == "CANCELED" or any(r.get("status") == "CANCELED" for r in shard_results)
+        job.processed_transactions = processed_count
+        job.total_matches = total_matches
+        if canceled:
+            job.status = "CANCELED"
+            job.finished_at = job.finished_at or datetime.now(timezone.utc)
+        else:
+            job.status = "SUCCESS"
+            job.finished_at = datetime.now(timezone.utc)
+            job.progress_percentage = 100.0
+            add_delta_matches_to_parent(db, job, total_matches)
+        db.commit()
+
+        logger.info(
+            f"[job={job_id}] Finalized {len(shard_results)} shards: status={job.status}, "
+            f"Tx={processed_count}, Matches={total_matches}, "
+            f"slowest shard={max(shard_seconds, default=0.0):.1f}s, total shard time={sum(shard_seconds):.1f}s"
+        )
+        return {
+            "job_id": job_id,
+            "status": job.status,
+            "matches": total_matches,
+            "shards": len(shard_results),
         }
 
     except Exception as e:
-        db.rollback()
-        logger.exception(f"[job={job_id}] Failed: {e}")
-        try:
-            job = db.get(ScreeningJob, job_id)
-            if job:
-                job.status = "FAILURE"
-                job.error_message = str(e)
-                job.finished_at = datetime.now(timezone.utc)
-                db.commit()
-        except Exception:
-            pass
+        _mark_job_failed(db, job_id, e)
         raise e
 
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,15 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Ensure repo root is on sys.path so `import slis` works when running `pytest`
+REPO_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(REPO_ROOT))
+
+# Env harus di-set sebelum `slis` di-import (engine & Celery dibuat saat import)
+_TMP_DIR = tempfile.mkdtemp(prefix="slis-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP_DIR}/slis.db"
+os.environ["SLIS_SANCTION_INDEX_DIR"] = os.path.join(_TMP_DIR, "sanction_index")
+os.environ["CELERY_BROKER_URL"] = "memory://"
+os.environ["CELERY_RESULT_BACKEND"] = "cache+memory://"
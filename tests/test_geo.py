@@ -0,0 +1,49 @@
+import pytest
+
+from slis.matching.geo import canonicalize_country
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("Dominica", "DM"),
+        ("Dominican Republic", "DO"),
+        ("Niger", "NE"),
+        ("Nigeria", "NG"),
+        ("Guinea", "GN"),
+        ("Guinea-Bissau", "GW"),
+        ("Austria", "AT"),
+        ("Australia", "AU"),
+    ],
+)
+def test_exact_country_names(value, expected):
+    assert canonicalize_country(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        ("Guinea Bisau", "GW"),
+        ("Australa", "AU"),
+        ("Malaysa", "MY"),
+        ("Untied States", "US"),
+    ],
+)
+def test_fuzzy_fallback_fixes_typos(value, expected):
+    assert canonicalize_country(value) == expected
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        # Perpanjangan nama negara lain, bukan typo ("dominica" + "n")
+        "Dominican",
+        # Terpotong di antara dua negara
+        "Nigeri",
+        "Guinea Bissa",
+        # Runner-up negara lain terlalu dekat (Australia vs Austria)
+        "Austrlia",
+    ],
+)
+def test_fuzzy_fallback_rejects_ambiguous_names(value):
+    assert canonicalize_country(value) is None
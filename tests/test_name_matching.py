@@ -0,0 +1,66 @@
+import random
+
+import pytest
+
+from slis.matching.names import HybridMatcher, HybridNameIndex
+
+SYLLABLES = ["mu", "ha", "mad", "ab", "dul", "lah", "ah", "med", "ali", "sa", "ri", "to", "jo", "ko", "wi", "do", "an", "ya"]
+
+
+def _random_names(rng: random.Random, count: int) -> list[str]:
+    return [
+        " ".join("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(1, 3)))
+        for _ in range(count)
+    ]
+
+
+@pytest.fixture(scope="module")
+def name_indexes():
+    rng = random.Random(11)
+    names = _random_names(rng, 3000)
+    queries = _random_names(rng, 200) + ["", "a b", "mu ha"]
+    return (
+        HybridNameIndex(names, backend="ngram"),
+        HybridNameIndex(names, backend="pandas"),
+        queries,
+    )
+
+
+@pytest.mark.parametrize("length_ratio", [None, 0.3])
+def test_ngram_filter_matches_str_contains(name_indexes, length_ratio):
+    ngram, pandas_index, queries = name_indexes
+    for query in queries:
+        expected = pandas_index.filter_indices(query, max_candidates=0, length_ratio=length_ratio)
+        assert ngram.filter_indices(query, max_candidates=0, length_ratio=length_ratio) == expected, query
+
+
+@pytest.mark.parametrize("max_candidates", [5, 50])
+@pytest.mark.parametrize("length_ratio", [None, 0.3])
+def test_ngram_top_candidates_match_pandas(name_indexes, max_candidates, length_ratio):
+    ngram, pandas_index, queries = name_indexes
+    for query in queries:
+        expected = pandas_index.filter_indices(query, max_candidates=max_candidates, length_ratio=length_ratio)
+        got = ngram.filter_indices(query, max_candidates=max_candidates, length_ratio=length_ratio)
+        assert got == expected, query
+
+
+def _typo(rng: random.Random, name: str) -> str:
+    pos = rng.randrange(len(name))
+    return name[:pos] + rng.choice("aeioumhd") + name[pos + 1 :]
+
+
+@pytest.mark.parametrize("threshold", [0.0, 70.0, 90.0])
+def test_best_match_bounded_matches_full_scan(threshold):
+    rng = random.Random(18)
+    names = _random_names(rng, 2000)
+    matcher = HybridMatcher.from_normed(names)
+    queries = [_typo(rng, rng.choice(names)) for _ in range(150)] + _random_names(rng, 50)
+    for query in queries:
+        bounded = matcher.best_match_normed(query, threshold=threshold, bounded=True)
+        full = matcher.best_match_normed(query, threshold=threshold, bounded=False)
+        if full is None:
+            assert bounded is None, query
+            continue
+        assert bounded is not None, query
+        assert bounded["index"] == full["index"], query
+        assert bounded["scores"]["final"] == pytest.approx(full["scores"]["final"]), query
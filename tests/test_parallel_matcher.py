@@ -0,0 +1,163 @@
+import os
+import random
+import time
+
+import pytest
+from celery.contrib.testing.worker import start_worker
+
+from slis import models
+from slis.db import SessionLocal, engine
+from slis.matching import parallel
+from slis.matching.names import normalize_name
+from slis.services.match_cache import clear_match_cache
+from slis.models import (
+    SanctionEntity,
+    SanctionSnapshot,
+    SanctionSource,
+    ScreeningJob,
+    ScreeningResult,
+    Transaction,
+    UploadBatch,
+)
+from slis.tasks.db_job import celery, run_screening_task
+
+SYLLABLES = ["mu", "ha", "mad", "ab", "dul", "lah", "ah", "med", "ali", "sa", "ri", "to", "jo", "ko", "wi", "do"]
+# File berisi pid proses yang menjalankan chunk scoring (lihat `_recording_match_chunk`)
+CHUNK_PID_LOG = os.path.join(os.path.dirname(os.environ["DATABASE_URL"].split("///", 1)[1]), "chunk_pids.log")
+_original_match_chunk = parallel._match_chunk
+_original_top_k_chunk = parallel._top_k_chunk
+
+
+def _record_chunk_pid() -> None:
+    with open(CHUNK_PID_LOG, "a") as fh:
+        fh.write(f"{os.getpid()}\n")
+
+
+def _recording_match_chunk(args):
+    _record_chunk_pid()
+    return _original_match_chunk(args)
+
+
+def _recording_top_k_chunk(args):
+    _record_chunk_pid()
+    return _original_top_k_chunk(args)
+
+
+def _random_name(rng: random.Random) -> str:
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(2, 3))
+    )
+
+
+@pytest.fixture(scope="module")
+def batch_id():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(7)
+    db = SessionLocal()
+    try:
+        db.add(SanctionSource(id=1, code="DTTOT", name="DTTOT"))
+        db.add(SanctionSnapshot(id=1, source_id=1, is_active=True))
+        for i in range(1, 1001):
+            name = _random_name(rng)
+            db.add(
+                SanctionEntity(
+                    id=i,
+                    source_id=1,
+                    snapshot_id=1,
+                    primary_name=name.title(),
+                    primary_name_normalized=normalize_name(name),
+                )
+            )
+        db.add(UploadBatch(id=1, filename="tx.txt", type="TXT"))
+        # > PARALLEL_CHUNK_SIZE nama unik supaya scoring benar-benar dipecah ke pool
+        for i in range(1, 1501):
+            sender, receiver = _random_name(rng), _random_name(rng)
+            db.add(
+                Transaction(
+                    id=i,
+                    batch_id=1,
+                    sender_name=sender,
+                    sender_name_normalized=normalize_name(sender),
+                    receiver_name=receiver,
+                    receiver_name_normalized=normalize_name(receiver),
+                )
+            )
+        db.commit()
+    finally:
+        db.close()
+    return 1
+
+
+def _create_job(batch_id: int) -> int:
+    db = SessionLocal()
+    try:
+        job = ScreeningJob(batch_id=batch_id, status="PENDING", threshold_name_score=80, threshold_score=60)
+        db.add(job)
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _job_results(job_id: int) -> tuple[str, list[tuple]]:
+    db = SessionLocal()
+    try:
+        job = db.get(ScreeningJob, job_id)
+        rows = (
+            db.query(
+                ScreeningResult.transaction_id,
+                ScreeningResult.target_role,
+                ScreeningResult.sanction_entity_id,
+                ScreeningResult.final_score,
+            )
+            .filter(ScreeningResult.job_id == job_id)
+            .order_by(ScreeningResult.transaction_id, ScreeningResult.target_role, ScreeningResult.sanction_entity_id)
+            .all()
+        )
+        return job.status, [tuple(r) for r in rows]
+    finally:
+        db.close()
+
+
+def _wait_for_job(job_id: int, timeout: float = 120.0) -> str:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status, _ = _job_results(job_id)
+        if status in ("SUCCESS", "FAILURE", "CANCELED"):
+            return status
+        time.sleep(0.2)
+    raise TimeoutError(f"screening job {job_id} belum selesai setelah {timeout}s")
+
+
+def test_parallel_matcher_runs_inside_prefork_worker(batch_id, monkeypatch):
+    # Referensi: screening serial di proses test
+    monkeypatch.setattr(parallel, "MATCHER_PROCESSES", 0)
+    serial_job = _create_job(batch_id)
+    run_screening_task.apply(args=(serial_job,))
+    serial_status, serial_rows = _job_results(serial_job)
+    assert serial_status == "SUCCESS"
+    assert serial_rows
+
+    # Worker prefork (proses pool daemonic) dengan SLIS_MATCHER_PROCESSES=2
+    monkeypatch.setattr(parallel, "MATCHER_PROCESSES", 2)
+    monkeypatch.setattr(parallel, "_match_chunk", _recording_match_chunk)
+    monkeypatch.setattr(parallel, "_top_k_chunk", _recording_top_k_chunk)
+    if os.path.exists(CHUNK_PID_LOG):
+        os.remove(CHUNK_PID_LOG)
+
+    # Cache match proses ini ikut ter-fork ke worker; kosongkan agar nama di-score ulang
+    clear_match_cache()
+    parallel_job = _create_job(batch_id)
+    with start_worker(celery, pool="prefork", concurrency=1, perform_ping_check=False, shutdown_timeout=30.0):
+        run_screening_task.delay(parallel_job)
+        assert _wait_for_job(parallel_job) == "SUCCESS"
+
+    with open(CHUNK_PID_LOG) as fh:
+        chunk_pids = {int(line) for line in fh if line.strip()}
+    # Chunk di-score di proses anak worker, bukan di proses test
+    assert chunk_pids and os.getpid() not in chunk_pids
+
+    parallel_status, parallel_rows = _job_results(parallel_job)
+    assert parallel_status == "SUCCESS"
+    assert parallel_rows == serial_rows
@@ -0,0 +1,21 @@
+import pandas as pd
+
+from slis.services.bulk import _copy_text_value
+from slis.services.sanctions import _build_entity_frame
+
+
+def test_missing_dob_is_copied_as_null_integer():
+    df = pd.DataFrame(
+        {
+            "Name": ["Ali Mahmud", "Budi Santoso", "Chandra Wijaya"],
+            "DOB": ["1980-01-02", "", "1975"],
+            "Remarks": ["a", "", "c"],
+        }
+    )
+    entities = _build_entity_frame(df, {"full_name": "Name", "dob": "DOB"})
+
+    years = [_copy_text_value(v) for v in entities["dob_year"]]
+    assert years == ["1980", "\\N", "1975"]
+    for column in ("dob_month", "dob_day"):
+        assert _copy_text_value(entities[column].iloc[1]) == "\\N"
+        assert "." not in _copy_text_value(entities[column].iloc[0])
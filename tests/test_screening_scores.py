@@ -0,0 +1,77 @@
+import random
+from datetime import date
+
+import numpy as np
+import pytest
+
+from slis import models
+from slis.db import SessionLocal, engine
+from slis.matching.names import normalize_name
+from slis.models import SanctionEntity, SanctionSnapshot, SanctionSource
+from slis.services.sanction_index import SanctionIndex
+from slis.services.screening import (
+    _final_scores_columnar,
+    _match_single_entity,
+    _normalize_country,
+    _sanction_data_from_index,
+)
+
+SYLLABLES = ["mu", "ha", "mad", "ab", "dul", "lah", "ah", "med", "ali", "sa", "ri", "to", "jo", "ko", "wi", "do"]
+DOB_RAWS = [None, "", "1980-01-02", "1980", "02/01/1980", "12 Juli 1980", "1975, 1980", "1980-1985", "xx"]
+CITIZENSHIPS = [None, "", "Indonesia", "I.D.", "Iran", "Malaysia"]
+
+
+@pytest.fixture(scope="module")
+def sanction_index():
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    rng = random.Random(22)
+    db = SessionLocal()
+    try:
+        # Sumber Australia = DOB daftar/rentang tahun (jalur per baris di versi kolumnar)
+        for source_id, code in ((1, "DTTOT"), (2, "Australia DFAT")):
+            db.add(SanctionSource(id=source_id, code=code, name=code))
+            db.add(SanctionSnapshot(id=source_id, source_id=source_id, is_active=True))
+        for i in range(1, 501):
+            name = " ".join("".join(rng.choice(SYLLABLES) for _ in range(2)) for _ in range(2))
+            db.add(
+                SanctionEntity(
+                    id=i,
+                    source_id=rng.choice((1, 2)),
+                    snapshot_id=1,
+                    primary_name=name.title(),
+                    primary_name_normalized=normalize_name(name),
+                    date_of_birth_raw=rng.choice(DOB_RAWS),
+                    citizenship=rng.choice(CITIZENSHIPS),
+                )
+            )
+        db.commit()
+        return SanctionIndex.from_db(db)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("dob", [None, "1980-01-02", "1980", "1982-05-05", "1975", date(1980, 1, 2)])
+@pytest.mark.parametrize("citizenship", [None, "Indonesia", "ID", "iran", "Japan"])
+def test_final_scores_columnar_matches_scalar_scorer(sanction_index, dob, citizenship):
+    rng = np.random.default_rng(22)
+    entity_idxs = np.arange(len(sanction_index), dtype=np.int64)
+    name_scores = np.round(rng.uniform(0.0, 100.0, len(entity_idxs)), 2)
+    query_data = {
+        "name_norm": "muha madali",
+        "dob": dob,
+        "cit_raw": citizenship,
+        "cit_norm": _normalize_country(citizenship) if citizenship else "",
+    }
+
+    got = _final_scores_columnar(sanction_index, query_data, entity_idxs, name_scores)
+
+    thresholds = {"name": 0.0, "final": 0.0}
+    for idx, name_score, final_score in zip(entity_idxs.tolist(), name_scores.tolist(), got.tolist()):
+        expected = _match_single_entity(
+            query_data,
+            _sanction_data_from_index(sanction_index, idx),
+            thresholds,
+            precomputed_name_score=name_score,
+        )
+        assert round(final_score, 2) == pytest.approx(expected["final_score"], abs=0.01), idx
@@ -0,0 +1,51 @@
+import io
+
+import pytest
+
+from slis import models
+from slis.db import SessionLocal, engine
+from slis.models import Transaction, UploadBatch
+from slis.services import transactions
+
+HEADER = (
+    "FORM_NO|SANDI_PELAPOR|FORM_PERIOD|RECORD_NO|KOTA_ASAL|NEGARA_TUJUAN|"
+    "NAMA_PENERIMA|NAMA_PENGIRIM|FREKUENSI|NOMINAL_TRX|TUJUAN|CREATED_DATE\n"
+)
+
+
+def _row(i: int, extra_field: bool = False) -> str:
+    row = f"F{i}|001|202401|{i}|Jakarta|Malaysia|Ali Mahmud|Budi Santoso|1|1000|Keluarga|2024-01-01"
+    return row + ("|x" if extra_field else "") + "\n"
+
+
+@pytest.fixture
+def db():
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def test_parse_error_in_later_chunk_leaves_no_partial_batch(db, monkeypatch):
+    monkeypatch.setattr(transactions, "TXT_CHUNK_SIZE", 2)
+    batches_before = db.query(UploadBatch).count()
+    tx_before = db.query(Transaction).count()
+    content = HEADER + _row(1) + _row(2) + _row(3) + _row(4, extra_field=True)
+
+    with pytest.raises(ValueError):
+        transactions.create_transaction_batch(db, io.BytesIO(content.encode("utf-8")), "broken.txt")
+
+    assert db.query(UploadBatch).count() == batches_before
+    assert db.query(Transaction).count() == tx_before
+
+
+def test_import_commits_all_chunks(db, monkeypatch):
+    monkeypatch.setattr(transactions, "TXT_CHUNK_SIZE", 2)
+    content = HEADER + "".join(_row(i) for i in range(1, 6))
+
+    batch = transactions.create_transaction_batch(db, io.BytesIO(content.encode("utf-8")), "ok.txt")
+
+    assert batch.row_count == 5
+    assert db.query(Transaction).filter(Transaction.batch_id == batch.id).count() == 5